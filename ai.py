@@ -0,0 +1,272 @@
+"""Computer controlled drivers.
+
+A Guide is made once per track (and cached with the compiled track). It holds a racing line through
+the checkpoints, pulled away from the grass and the obstacles and smoothed, and a grid over the track
+where each cell knows the direction to steer in to follow the line, and how far the cell is from it.
+A Pilot decides the controls of a car from a single lookup in that grid, so it costs next to nothing per frame.
+"""
+
+#Imports
+
+##External
+import math
+from array import array
+from collections import deque
+
+##Classes and global constants
+from physics import Controls
+from shapes import *
+
+NOWHERE = -1            #Heading of the cells that can't reach the racing line (e.g. inside obstacles)
+UNREACHABLE = 0xFFFF    #Distance of those cells
+
+#Neighbours of a cell in the grid (including diagonals)
+NEIGHBOURS = ((-1, -1), (0, -1), (1, -1), (-1, 0), (1, 0), (-1, 1), (0, 1), (1, 1))
+
+class Guide(object):
+    """A racing line, and a grid telling the direction of the line (and the distance to it) from anywhere on a track."""
+
+    def __init__(self, cellsize, cols, rows, line, headings, distances):
+        """Create a guide (see makeGuide).
+
+        cellsize:   The width and height of a cell of the grid.
+        cols, rows: The number of columns and rows of the grid.
+        line:       A list of points (x, y) along the racing line, in the order they are driven.
+        headings:   An array with a direction in degrees for each cell (row by row), or NOWHERE.
+        distances:  An array with the distance in cells from each cell to the racing line (row by row),
+                    or UNREACHABLE.
+        """
+
+        self._cellsize = cellsize
+        self._cols = cols
+        self._rows = rows
+        self._line = line
+        self._headings = headings
+        self._distances = distances
+
+    def getCellSize(self):
+        """Getter for _cellsize."""
+        return self._cellsize
+
+    def getShape(self):
+        """Returns a tuple with the number of columns and rows of the grid."""
+        return (self._cols, self._rows)
+
+    def getLine(self):
+        """Getter for _line."""
+        return self._line
+
+    def getHeadings(self):
+        """Getter for _headings."""
+        return self._headings
+
+    def getDistances(self):
+        """Getter for _distances."""
+        return self._distances
+
+    def _cell(self, x, y):
+        """Returns the index of the cell containing a point, or None if the point is outside the grid."""
+
+        col = int(x // self._cellsize)
+        row = int(y // self._cellsize)
+        if col < 0 or row < 0 or col >= self._cols or row >= self._rows:
+            return None
+        return row * self._cols + col
+
+    def headingAt(self, x, y):
+        """Looks up the direction to steer in at a point to follow the racing line.
+
+        x, y: The coordinates of the point.
+
+        Returns the direction in degrees (0 means right, clockwise is positive), or None if there is none.
+        """
+
+        cell = self._cell(x, y)
+        if cell is None or self._headings[cell] == NOWHERE:
+            return None
+        return self._headings[cell]
+
+    def distanceAt(self, x, y):
+        """Looks up how far a point is from the racing line.
+
+        x, y: The coordinates of the point.
+
+        Returns the distance in pixels (along the grid), or None if the point is outside the grid
+        or can't reach the racing line.
+        """
+
+        cell = self._cell(x, y)
+        if cell is None or self._distances[cell] == UNREACHABLE:
+            return None
+        return self._distances[cell] * self._cellsize
+
+class Pilot(object):
+    """Drives a car by following the Guide of a track."""
+
+    def __init__(self, track, anglespeed, thrustangle = 90, deadband = None, cornerspeed = None):
+        """Create a pilot (see training for tuning the settings).
+
+        track:          The track. Its Guide is asked for every frame, as it is remade when the track is changed.
+        anglespeed:     Number of degrees the car turns when turning left or right.
+        thrustangle:    The car only thrusts if it points less than this many degrees away from where it should go.
+        deadband:       The car only turns if it points more than this many degrees away from where it should go.
+                        Half of anglespeed if not given.
+        cornerspeed:    The car doesn't thrust while turning if it is faster than this. No limit if not given.
+        """
+
+        self._track = track
+        self._anglespeed = anglespeed
+        self._thrustangle = thrustangle
+        self._deadband = anglespeed / 2 if deadband is None else deadband
+        self._cornerspeed = cornerspeed
+
+    def controls(self, car):
+        """Decides the controls of a car for the next frame.
+
+        car: The car being driven.
+
+        Returns a Controls tuple.
+        """
+
+        heading = self._track.getGuide().headingAt(car._pos.x + car._w / 2, car._pos.y + car._h / 2)
+        if heading is None:
+            return Controls(False, False, True)
+
+        diff = (heading - car._rotation + 180) % 360 - 180
+        left = diff < -self._deadband
+        right = diff > self._deadband
+        thrust = abs(diff) < self._thrustangle
+        if thrust and (left or right) and self._cornerspeed is not None:
+            thrust = car._velocity.x ** 2 + car._velocity.y ** 2 < self._cornerspeed ** 2
+        return Controls(left, right, thrust)
+
+def _midpoint(line):
+    """Returns the middle of a Line as a tuple (x, y)."""
+
+    seg = line.getSegment()
+    return ((seg.x0 + seg.x1) / 2, (seg.y0 + seg.y1) / 2)
+
+def _blocked(obstacles, x, y):
+    """Tests if a point is inside an obstacle (a Circle or a Rectangle)."""
+
+    for thing in obstacles:
+        if isinstance(thing, Circle):
+            if (x - thing._pos.x) ** 2 + (y - thing._pos.y) ** 2 < thing._radius ** 2:
+                return True
+        elif isinstance(thing, Rectangle):
+            if thing._pos.x <= x < thing._pos.x + thing._w and thing._pos.y <= y < thing._pos.y + thing._h:
+                return True
+    return False
+
+def _bfs(cols, rows, sources, passable):
+    """Breadth-first search over a grid from a number of cells at once.
+
+    cols, rows: The size of the grid.
+    sources:    A list of tuples (cell, label). The cells start with distance 0 and their label.
+    passable:   A list telling which cells the search can enter.
+
+    Returns a tuple (distances, labels) with an array each (-1 for the cells that weren't reached).
+    Every cell gets the label of the source it was reached from.
+    """
+
+    distances = array('i', [-1]) * (cols * rows)
+    labels = array('i', [-1]) * (cols * rows)
+    queue = deque()
+    for cell, label in sources:
+        if distances[cell] < 0:
+            distances[cell] = 0
+            labels[cell] = label
+            queue.append(cell)
+
+    while queue:
+        cell = queue.popleft()
+        row, col = divmod(cell, cols)
+        for dc, dr in NEIGHBOURS:
+            c = col + dc
+            r = row + dr
+            if 0 <= c < cols and 0 <= r < rows:
+                other = r * cols + c
+                if distances[other] < 0 and passable[other]:
+                    distances[other] = distances[cell] + 1
+                    labels[other] = labels[cell]
+                    queue.append(other)
+
+    return distances, labels
+
+def makeGuide(terrain, obstacles, checkpoints, cellsize, clearance, lookahead, smoothing = 20):
+    """Makes the Guide of a track.
+
+    terrain:        The track's Terrain (the racing line keeps to the road).
+    obstacles:      The track's obstacles.
+    checkpoints:    The track's checkpoints, in the order they are crossed. The racing line goes through the
+                    middle of each (before being smoothed).
+    cellsize:       The width and height of a cell of the grid.
+    clearance:      How far (in pixels) the racing line should keep from the grass and the obstacles.
+    lookahead:      How far ahead on the racing line (in pixels) the cars steer towards.
+    smoothing:      The number of rounds of smoothing the racing line.
+
+    Returns the Guide.
+    """
+
+    w, h = terrain.getSize()
+    cols = int(math.ceil(w / float(cellsize)))
+    rows = int(math.ceil(h / float(cellsize)))
+
+    #Cells whose centers are inside obstacles are impassable, and those off the road are to be avoided
+    centers = [((i % cols + 0.5) * cellsize, (i // cols + 0.5) * cellsize) for i in range(cols * rows)]
+    passable = [not _blocked(obstacles, x, y) for x, y in centers]
+    free = [passable[i] and not terrain.isOffroad(*centers[i]) for i in range(cols * rows)]
+
+    #Distance from every cell to the nearest cell that isn't free
+    edges = [(i, 0) for i in range(cols * rows) if not free[i]]
+    room = _bfs(cols, rows, edges, [True] * (cols * rows))[0]
+
+    #A line through the middle of the checkpoints, with a point about every cell
+    points = []
+    marks = [_midpoint(line) for line in checkpoints]
+    for (x0, y0), (x1, y1) in zip(marks, marks[1:] + marks[:1]):
+        steps = max(1, int(math.hypot(x1 - x0, y1 - y0) // cellsize))
+        for i in range(steps):
+            points.append((x0 + (x1 - x0) * i / steps, y0 + (y1 - y0) * i / steps))
+
+    def roomAt(x, y):
+        col = min(max(int(x // cellsize), 0), cols - 1)
+        row = min(max(int(y // cellsize), 0), rows - 1)
+        return room[row * cols + col] * cellsize
+
+    #Smooth the line (which cuts the corners), but push it back towards the middle of the road where it gets too close
+    count = len(points)
+    for i in range(smoothing):
+        smoothed = []
+        for j in range(count):
+            (px, py), (x, y), (nx, ny) = points[j - 1], points[j], points[(j + 1) % count]
+            x = (px + 2 * x + nx) / 4
+            y = (py + 2 * y + ny) / 4
+            for k in range(4):
+                if roomAt(x, y) >= clearance:
+                    break
+                best = max(((x + dx * cellsize, y + dy * cellsize) for dx, dy in NEIGHBOURS), key = lambda p: roomAt(*p))
+                if roomAt(*best) <= roomAt(x, y):
+                    break
+                x, y = best
+            smoothed.append((x, y))
+        points = smoothed
+
+    #Every cell steers towards a point a bit ahead of the nearest (reachable) point of the line
+    sources = []
+    for j, (x, y) in enumerate(points):
+        col = min(max(int(x // cellsize), 0), cols - 1)
+        row = min(max(int(y // cellsize), 0), rows - 1)
+        sources.append((row * cols + col, j))
+    distances, nearest = _bfs(cols, rows, sources, passable)
+
+    ahead = max(1, int(round(lookahead / float(cellsize))))
+    headings = array('h', [NOWHERE]) * (cols * rows)
+    for i in range(cols * rows):
+        if nearest[i] >= 0:
+            tx, ty = points[(nearest[i] + ahead) % count]
+            x, y = centers[i]
+            headings[i] = int(round(math.degrees(math.atan2(ty - y, tx - x)))) % 360
+
+    return Guide(cellsize, cols, rows, points, headings,
+                 array('H', [d if d >= 0 else UNREACHABLE for d in distances]))
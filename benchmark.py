@@ -0,0 +1,436 @@
+"""Benchmarks for the geometry and physics of the game.
+
+Run from terminal by typing: python benchmark.py
+
+Each benchmark reports the number of operations per second, the number of Vector2D objects made
+per operation, and a checksum of the results of its operations. The results can be saved as a baseline
+(python benchmark.py --save), and later runs are compared against it: a benchmark is flagged
+if it has become slower or makes more vectors than the threshold allows, or if its results have changed.
+The exit status is 1 if anything is flagged.
+"""
+
+#Imports
+
+##External
+import timeit, json, math, random, hashlib, argparse, platform, sys
+import pygame
+from precode import *
+
+##General methods
+from library import rotate_center, _rotate_center
+
+##Classes and global constants
+from physics import Car, Controls
+from track import loadTrack, trackPath
+from drawable import *
+from config import *
+
+FRAMES = 1000       #Number of frames per run of the car_step benchmark
+CASES = 1000        #Number of cases per run of the geometry benchmarks
+FLEET = 100         #Number of cars in the fleet_step benchmark
+REPEAT = 5          #Number of runs per benchmark. The fastest run is used.
+BASELINE = 'benchmark.json'     #Where the baseline is saved
+THRESHOLD = 0.10    #Allowed slowdown (as a fraction of the baseline's operations per second)
+
+CONTROLS = Controls(True, False, True)     #Thrust and a left turn every frame
+
+#Angles of lines covering every branch of intersect_rectangle_line
+ANGLES = (0, math.pi / 4, math.pi / 2, 3 * math.pi / 4, math.pi, 5 * math.pi / 4, 3 * math.pi / 2, 7 * math.pi / 4)
+
+def _makeCar(track, laps = LAPS):
+    """Returns a car placed on the start line of a track."""
+
+    x, y, rotation = track.getStart()
+    return Car(Vector2D(x, y),
+               Vector2D(0, 0), SPEEDLIMIT, WIDTH, LENGTH, Rectangle(RES_X, RES_Y, TRANSPARENT), rotation,
+               laps, OFFROAD_SPEEDLIMIT, SWEPT_COLLISION)
+
+def drive(track, laps = LAPS, frames = 20000):
+    """Drives a car around a track by steering towards the middle of the next checkpoint at full thrust.
+
+    track:  The Track to drive on.
+    laps:   The number of laps to drive.
+    frames: The maximum number of frames to drive.
+
+    Returns a list with the Controls tuple of each frame.
+    """
+
+    car = _makeCar(track, laps)
+    obstacles = track.getObstacleIndex()
+    checkpoints = track.getCheckpoints()
+    terrain = track.getTerrain()
+    inputs = []
+
+    for i in range(frames):
+        target = 0 if car._lastCP < 0 or car._lastCP == len(checkpoints) - 1 else car._lastCP + 1
+        seg = checkpoints[target].getSegment()
+        dx = (seg.x0 + seg.x1) / 2 - (car._pos.x + car._w / 2)
+        dy = (seg.y0 + seg.y1) / 2 - (car._pos.y + car._h / 2)
+        diff = (math.degrees(math.atan2(dy, dx)) - car._rotation + 180) % 360 - 180
+
+        controls = Controls(diff < -ROTATION_STEP / 2, diff > ROTATION_STEP / 2, True)
+        inputs.append(controls)
+        if not car.step(controls, ROTATION_STEP, obstacles, checkpoints, terrain):
+            break
+
+    return inputs
+
+#The benchmarks. Each one prepares its input, and returns a tuple (run, ops) where run is a function
+#performing ops operations and returning their results.
+
+def benchVectors(rng, track):
+    """Vector2D arithmetic: addition, subtraction, scaling, magnitude and normalization."""
+
+    pairs = [(Vector2D(rng.uniform(-10, 10), rng.uniform(-10, 10)), Vector2D(rng.uniform(-10, 10), rng.uniform(-10, 10)))
+             for i in range(CASES)]
+
+    def run():
+        total = 0.0
+        for a, b in pairs:
+            c = (a + b) - b * 0.5
+            total += c.magnitude() + c.normalized().x
+        return round(total, 6)
+
+    return run, CASES
+
+def benchRectangleCircle(rng, track):
+    """intersect_rectangle_circle with circles around a rectangle."""
+
+    rec = Vector2D(100, 100)
+    cases = [(Vector2D(rng.uniform(50, 200), rng.uniform(50, 200)), rng.uniform(5, 30),
+              Vector2D(rng.uniform(-5, 5), rng.uniform(-5, 5))) for i in range(CASES)]
+
+    def run():
+        results = []
+        for pos, radius, speed in cases:
+            hit = intersect_rectangle_circle(rec, 50, 50, pos, radius, speed)
+            results.append(hit and (round(hit.x, 9), round(hit.y, 9)))
+        return results
+
+    return run, CASES
+
+def benchCircles(rng, track):
+    """intersect_circles with circles around a circle."""
+
+    a = Vector2D(100, 100)
+    cases = [(Vector2D(rng.uniform(0, 200), rng.uniform(0, 200)), rng.uniform(5, 50)) for i in range(CASES)]
+
+    def run():
+        results = []
+        for pos, radius in cases:
+            hit = intersect_circles(a, 30, pos, radius)
+            results.append(hit and (round(hit.x, 9), round(hit.y, 9)))
+        return results
+
+    return run, CASES
+
+def benchRectangles(rng, track):
+    """intersect_rectangles with rectangles around a rectangle."""
+
+    a = Vector2D(100, 100)
+    cases = [(Vector2D(rng.uniform(0, 200), rng.uniform(0, 200)), rng.uniform(5, 80), rng.uniform(5, 80))
+             for i in range(CASES)]
+
+    def run():
+        return [intersect_rectangles(a, 50, 50, pos, w, h) for pos, w, h in cases]
+
+    return run, CASES
+
+def _lineCases(rng):
+    """Returns a list of rectangles and lines (pos, sx, sy, l_pos, l_len, l_angle), with every angle in ANGLES."""
+
+    return [(Vector2D(rng.uniform(0, 200), rng.uniform(0, 200)), 50, 50,
+             Vector2D(rng.uniform(50, 150), rng.uniform(50, 150)), rng.uniform(20, 150), ANGLES[i % len(ANGLES)])
+            for i in range(CASES)]
+
+def benchRectangleLine(rng, track):
+    """intersect_rectangle_line with lines at every angle branch."""
+
+    cases = _lineCases(rng)
+
+    def run():
+        return [intersect_rectangle_line(*case) for case in cases]
+
+    return run, CASES
+
+def benchRectangleSegment(rng, track):
+    """intersect_rectangle_segment with the same cases as intersect_rectangle_line (precompiled lines)."""
+
+    cases = [(pos, sx, sy, compile_line(l_pos, l_len, l_angle)) for pos, sx, sy, l_pos, l_len, l_angle in _lineCases(rng)]
+
+    def run():
+        return [intersect_rectangle_segment(*case) for case in cases]
+
+    return run, CASES
+
+def _carSprite():
+    """Returns a surface the size of a car, for the rotation benchmarks."""
+
+    layer = pygame.Surface((LENGTH, LENGTH), pygame.SRCALPHA)
+    layer.fill(RED, (0, (LENGTH - WIDTH) // 2, LENGTH, WIDTH))
+    return layer
+
+def benchRotateCenter(rng, track):
+    """rotate_center of a car sprite to every angle (cached after the first run)."""
+
+    layer = _carSprite()
+
+    def run():
+        return [rotate_center(layer, angle).get_size() for angle in range(360)]
+
+    return run, 360
+
+def benchRotateUncached(rng, track):
+    """Rotation of a car sprite to every angle, without the cache."""
+
+    layer = _carSprite()
+
+    def run():
+        return [_rotate_center(layer, angle).get_size() for angle in range(360)]
+
+    return run, 360
+
+def benchCollide(rng, track):
+    """Car.collide against the track's obstacles (the list, not the index), from positions all over the track."""
+
+    car = _makeCar(track)
+    obstacles = track.getObstacles()
+    cases = [(rng.uniform(0, RES_X - LENGTH), rng.uniform(0, RES_Y - LENGTH), rng.uniform(-10, 10), rng.uniform(-10, 10))
+             for i in range(CASES)]
+
+    def run():
+        results = []
+        for x, y, vx, vy in cases:
+            car._pos.x = x
+            car._pos.y = y
+            car._velocity.x = vx
+            car._velocity.y = vy
+            car.collide(obstacles)
+            results.append((car._pos.x, car._pos.y, car._velocity.x, car._velocity.y))
+        return results
+
+    return run, CASES
+
+def benchBounce(rng, track):
+    """MovingObject.bounce of a car near the walls of its room."""
+
+    car = _makeCar(track)
+    room = car._room
+    cases = [(rng.uniform(-20, RES_X - LENGTH + 20), rng.uniform(-20, RES_Y - LENGTH + 20), rng.uniform(-10, 10),
+              rng.uniform(-10, 10)) for i in range(CASES)]
+
+    def run():
+        results = []
+        for x, y, vx, vy in cases:
+            car._pos.x = x
+            car._pos.y = y
+            car._velocity.x = vx
+            car._velocity.y = vy
+            results.append(car.bounce(room))
+            results.append((car._pos.x, car._pos.y))
+        return results
+
+    return run, CASES
+
+def benchStep(rng, track):
+    """Car.step, driving in circles with thrust and a left turn (the obstacle list, not the index)."""
+
+    obstacles = track.getObstacles()
+    checkpoints = track.getCheckpoints()
+    terrain = track.getTerrain()
+
+    def run():
+        car = _makeCar(track)
+        for i in range(FRAMES):
+            car.step(CONTROLS, ROTATION_STEP, obstacles, checkpoints, terrain)
+        return (car._pos.x, car._pos.y, car._velocity.x, car._velocity.y)
+
+    return run, FRAMES
+
+def benchRace(rng, track):
+    """A whole race of LAPS laps, simulated without rendering (one operation is a frame)."""
+
+    inputs = drive(track)
+    obstacles = track.getObstacleIndex()
+    checkpoints = track.getCheckpoints()
+    terrain = track.getTerrain()
+
+    def run():
+        car = _makeCar(track)
+        for controls in inputs:
+            if not car.step(controls, ROTATION_STEP, obstacles, checkpoints, terrain):
+                break
+        return (car.getLatestLap(), car.getFastestLap(), car.getTotalLap(), car._laps)
+
+    return run, len(inputs)
+
+def benchRayCast(rng, track):
+    """Occupancy.cast of every sensor of CASES cars in one call (one operation is a ray)."""
+
+    occupancy = track.getOccupancy()
+    w, h = track.getSize()
+    xs = [rng.uniform(0, w) for i in range(CASES)]
+    ys = [rng.uniform(0, h) for i in range(CASES)]
+    angles = [[rng.uniform(0, 360) + angle for angle in SENSOR_ANGLES] for i in range(CASES)]
+
+    def run():
+        return occupancy.cast(xs, ys, angles, SENSOR_RANGE).tolist()
+
+    return run, CASES * len(SENSOR_ANGLES)
+
+def benchFleet(rng, track):
+    """Fleet.step of FLEET cars at once, with random controls (one operation is a frame of a single car)."""
+
+    import numpy as np          #Only this benchmark and ray_cast need numpy
+    from fleet import Fleet
+    obstacles = track.getObstacleIndex()
+    checkpoints = track.getCheckpoints()
+    terrain = track.getTerrain()
+    x, y, rotation = track.getStart()
+    controls = [[np.array([rng.random() < chance for i in range(FLEET)]) for chance in (0.3, 0.1, 0.9)]
+                for frame in range(FRAMES)]
+
+    def run():
+        fleet = Fleet([(x, y)] * FLEET, SPEEDLIMIT, WIDTH, LENGTH, Rectangle(RES_X, RES_Y, TRANSPARENT), rotation,
+                      LAPS, OFFROAD_SPEEDLIMIT)
+        for left, right, thrust in controls:
+            fleet.step(left, right, thrust, ROTATION_STEP, obstacles, checkpoints, terrain)
+        return fleet.getPositions().tolist()
+
+    return run, FLEET * FRAMES
+
+BENCHMARKS = (('vector_arithmetic', benchVectors),
+              ('intersect_rectangle_circle', benchRectangleCircle),
+              ('intersect_circles', benchCircles),
+              ('intersect_rectangles', benchRectangles),
+              ('intersect_rectangle_line', benchRectangleLine),
+              ('intersect_rectangle_segment', benchRectangleSegment),
+              ('rotate_center', benchRotateCenter),
+              ('rotate_uncached', benchRotateUncached),
+              ('car_collide', benchCollide),
+              ('moving_bounce', benchBounce),
+              ('car_step', benchStep),
+              ('race', benchRace),
+              ('fleet_step', benchFleet),
+              ('ray_cast', benchRayCast))
+
+def countVectors(run):
+    """Counts the number of Vector2D objects made by a function.
+
+    run: The function.
+
+    Returns a tuple with the number of vectors and the function's return value.
+    """
+
+    count = [0]
+    init = Vector2D.__init__
+
+    def countingInit(self, x, y):
+        count[0] += 1
+        init(self, x, y)
+
+    Vector2D.__init__ = countingInit
+    try:
+        result = run()
+    finally:
+        Vector2D.__init__ = init
+
+    return count[0], result
+
+def checksum(result):
+    """Returns a short hash of the results of a benchmark, to tell if they have changed."""
+    return hashlib.sha1(repr(result).encode('utf-8')).hexdigest()[:16]
+
+def measure(name, factory, track, repeat = REPEAT):
+    """Runs a single benchmark.
+
+    name:       The name of the benchmark.
+    factory:    The function preparing the benchmark (see BENCHMARKS).
+    track:      The Track used by the benchmarks.
+    repeat:     Number of runs. The fastest run is used.
+
+    Returns a dictionary with the operations per second, the vectors made per operation and the checksum.
+    """
+
+    run, ops = factory(random.Random(name), track)     #The same input every time
+    run()                                               #Warm up (e.g. fill the caches)
+    vectors, result = countVectors(run)
+    best = min(timeit.repeat(run, number = 1, repeat = repeat))
+
+    return {'ops_per_sec': ops / best, 'vectors_per_op': vectors / float(ops), 'output': checksum(result)}
+
+def compare(results, baseline, threshold = THRESHOLD):
+    """Compares results against a baseline.
+
+    results:    A dictionary of results, keyed by benchmark name (see measure).
+    baseline:   A dictionary of results from an earlier run.
+    threshold:  The allowed slowdown, as a fraction of the baseline's operations per second.
+
+    Returns a dictionary with a list of problems (strings) for each benchmark. The lists are empty if all is well.
+    """
+
+    problems = dict()
+    for name, result in results.items():
+        problems[name] = []
+        old = baseline.get(name)
+        if old is None:
+            continue
+        if result['ops_per_sec'] < old['ops_per_sec'] * (1 - threshold):
+            problems[name].append('slower')
+        if result['vectors_per_op'] > old['vectors_per_op'] + 1e-9:
+            problems[name].append('more vectors')
+        if result['output'] != old['output']:
+            problems[name].append('output changed')
+    return problems
+
+def main(argv = None):
+    """Runs the benchmarks, prints the results and compares them against the baseline.
+
+    Returns the exit status: 1 if any benchmark was flagged, 0 otherwise.
+    """
+
+    parser = argparse.ArgumentParser(description = "Benchmarks for the geometry and physics of the game.")
+    parser.add_argument('names', nargs = '*', help = "benchmarks to run (all if none are given)")
+    parser.add_argument('--save', action = 'store_true', help = "save the results as the baseline")
+    parser.add_argument('--baseline', default = BASELINE, help = "path of the baseline (default: %(default)s)")
+    parser.add_argument('--threshold', type = float, default = THRESHOLD,
+                        help = "allowed slowdown as a fraction (default: %(default)s)")
+    parser.add_argument('--repeat', type = int, default = REPEAT, help = "runs per benchmark (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    try:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['benchmarks']
+    except (IOError, ValueError, KeyError):
+        baseline = dict()
+
+    track = loadTrack(trackPath(TRACK))
+    results = dict()
+    print("%-28s %14s %10s %10s  %s" % ('benchmark', 'ops/sec', 'vectors', 'change', 'flags'))
+
+    for name, factory in BENCHMARKS:
+        if args.names and name not in args.names:
+            continue
+        results[name] = result = measure(name, factory, track, args.repeat)
+        problems = compare({name: result}, baseline, args.threshold)[name]
+        change = ''
+        if name in baseline:
+            change = '%+.1f%%' % ((result['ops_per_sec'] / baseline[name]['ops_per_sec'] - 1) * 100)
+        print("%-28s %14.0f %10.2f %10s  %s" % (name, result['ops_per_sec'], result['vectors_per_op'], change,
+                                                ', '.join(problems)))
+
+    flagged = [name for name, problems in compare(results, baseline, args.threshold).items() if problems]
+
+    if args.save:
+        baseline.update(results)
+        with open(args.baseline, 'w') as f:
+            json.dump({'python': platform.python_version(), 'benchmarks': baseline}, f, indent = 2, sort_keys = True)
+        print("Saved the baseline to " + args.baseline)
+
+    if flagged:
+        print("Regressions: " + ', '.join(flagged))
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -11,6 +11,7 @@ CAPTION = 'Supercars'
 FONT = 'arial'
 FONTSIZE = 16
 BIGSIZE = 32
+TEXT_CACHE_SIZE = 64    #Number of rendered textboxes to keep
 
 #Menu
 
@@ -32,18 +33,95 @@ IMAGE = 0
 #Supercar
 
 SPEEDLIMIT = 10
+OFFROAD_SPEEDLIMIT = SPEEDLIMIT     #Speed limit when the center of the car is off the road
+SWEPT_COLLISION = False     #Find collisions along the cars' movement, so that higher speed limits are safe
 WIDTH = 40
 LENGTH = 50
 CAR_ROTATION = 180
 ROTATION_STEP = 10  #Degrees per cycle of player input
+LAPS = 10           #Number of laps in a race
 
 #Tracks
 
+TRACK = 'oval'          #Name of the track (the file tracks/<name>.json, stored in replays)
+TRACK_DIR = 'tracks'    #Folder holding the track files
+TRACK_CACHE = '.trackcache'     #Folder where compiled tracks are cached
+OBSTACLE_CELL = 100     #Cell size of the grid used to find obstacles near a car
 MARK_COLOR = WHITE
 MARK_WIDTH = 4
 ROAD_WIDTH = 200
 
 #Animation
 
-FPS = 30        #Frames per second during driving
+FPS = 30        #Physics steps (ticks) per second during driving. Lap times are counted in ticks.
+RENDER_FPS = 60 #Maximum number of frames drawn per second (the cars are interpolated between ticks)
+MAX_TICKS = 5   #Maximum number of ticks per drawn frame (the game slows down if it can't keep up with this)
+THREADED = False    #Run the physics on a thread of their own, so that slow frames never delay them (see simulation.py)
 QPS = 1.0 / 10  #FPS after finishing the race
+REPLAY_DIR = 'replays'  #Folder where a replay of every race is saved
+GHOST_DIR = 'ghosts'    #Folder where the fastest laps are saved as ghosts
+GHOSTS = 1              #Number of ghosts (of the fastest laps) to race against
+GHOST_ALPHA = 100       #Opacity of the ghosts (0-255)
+DIRTY_RECTS = True  #Only push the changed parts of the window to the display (False updates the whole window every frame)
+
+#Profiling
+
+PROFILE = True          #Save the frame times of every race in PROFILE_DIR
+PROFILE_DIR = 'profiles'
+PROFILE_FORMAT = 'json' #'json' (percentiles and the times of every frame) or 'csv' (the times of every frame)
+PROFILE_WINDOW = 120    #Number of frames the percentiles in the overlay are based on
+PROFILE_REFRESH = RENDER_FPS    #Number of frames between updates of the overlay
+PROFILE_KEY = 'f3'      #Key that shows or hides the overlay
+PROFILE_X = 10          #Position of the overlay
+PROFILE_Y = 10
+
+#Opponents
+
+OPPONENTS = 3           #Number of computer controlled cars
+OPPONENT_COLORS = [YELLOW, BLUE, GRAY, WHITE]   #Colors of the opponents (repeated if there are more opponents)
+GRID_LANES = 3          #Number of cars side by side at the start
+GRID_SPACING = 60       #Distance between the cars at the start
+AI_CELL = 20            #Cell size of the grid the opponents steer by
+AI_CLEARANCE = 40       #How far the racing line keeps from the grass and the obstacles
+AI_LOOKAHEAD = 100      #How far ahead on the racing line the opponents steer towards
+AI_THRUST_ANGLE = 90    #The opponents only thrust when pointing less than this many degrees off their course
+AI_DEADBAND = None      #The opponents only turn when pointing more than this many degrees off (half of ROTATION_STEP if None)
+AI_CORNER_SPEED = None  #The opponents don't thrust while turning faster than this (None for no limit)
+AI_TRAINED = True       #Use the best settings saved by training.py for the track instead (if it has been trained)
+CAR_COLLISIONS = True   #The cars collide with each other (otherwise they drive through each other)
+
+#Services (see services.py)
+
+ASYNC_LOOP = False          #Run the game loop on asyncio, with the services as tasks beside it (ignored if THREADED)
+LAP_LOG = 'laps.jsonl'      #File every completed lap is appended to (None for no log)
+UPLOAD_HOST = None          #Host the laps and replays are uploaded to (None for no uploads)
+UPLOAD_PORT = 8765          #Port the laps and replays are uploaded to
+UPLOAD_RETRIES = 3          #Number of times an upload is retried before giving up on it
+SERVICE_TIMEOUT = 5.0       #Seconds the services get to finish their work when the game ends
+
+#Highscores (see highscores.py)
+
+HIGHSCORE_DB = 'highscores.db'  #The database of all the races
+HIGHSCORE_COUNT = 5         #Number of races shown on the leaderboard
+HIGHSCORE_BATCH = 100       #Most races stored in a single transaction
+HIGHSCORE_DELAY = 1.0       #Seconds a race may wait to be stored together with others
+HIGHSCORE_CACHE = 32        #Number of leaderboards kept in memory
+HIGHSCORE_X = MENU_X        #Position of the leaderboard shown after a race
+HIGHSCORE_Y = MENU_Y + MENU_H + 10
+
+#Sensors (see sensors.py)
+
+SENSOR_CELL = 4             #Cell size of the grid the sensors' rays are marched over
+SENSOR_OFFROAD = True       #The grass blocks the sensors, like the obstacles and the edges of the track
+SENSOR_RANGE = 300          #The longest distance a sensor measures
+SENSOR_ANGLES = (-90, -45, -20, 0, 20, 45, 90)     #Directions of the sensors, relative to the direction of a car
+
+#Training (see training.py)
+
+TRAIN_DIR = 'training'      #Folder of the saved generations (one file per track)
+TRAIN_POPULATION = 32       #Number of candidate settings per generation
+TRAIN_GENERATIONS = 20      #Number of generations per run
+TRAIN_ELITE = 2             #Number of the best candidates kept unchanged in the next generation
+TRAIN_MUTATION = 0.2        #Chance of each setting being changed in a new candidate
+TRAIN_LAPS = 2              #Number of laps driven by each candidate
+TRAIN_FRAMES = 3000         #Candidates that haven't finished after this many frames are stopped
@@ -0,0 +1,115 @@
+"""Fast-forward evaluation of recorded races.
+
+A race is replayed through the car physics without any rendering or waiting for the clock,
+so lap times can be checked as fast as the CPU allows. Many races can be evaluated in parallel
+on a pool of worker processes.
+"""
+
+#Imports
+
+##External
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from precode import Vector2D
+
+##Classes and global constants
+from physics import Car, UNPACKED
+from track import loadTrack, trackPath
+from traffic import Traffic
+from training import makePilot
+from drawable import *
+from config import *
+
+#The results of a race, in frames
+LapTimes = namedtuple('LapTimes', ['latest', 'fastest', 'total'])
+
+#The default track, loaded once per process (see defaultTrack)
+_track = None
+
+def defaultTrack():
+    """Returns the default track (the one given by TRACK in config)."""
+
+    global _track
+    if _track is None:
+        _track = loadTrack(trackPath(TRACK))
+    return _track
+
+def makeCar(track):
+    """Returns a car placed at the start of a track, like the player's car in the game.
+
+    track: The Track the race is driven on.
+    """
+
+    x, y, rotation = track.getStart()
+    return Car(Vector2D(x, y), Vector2D(0, 0), SPEEDLIMIT, WIDTH, LENGTH,
+               Rectangle(RES_X, RES_Y, TRANSPARENT), rotation, LAPS, OFFROAD_SPEEDLIMIT, SWEPT_COLLISION)
+
+def makeOpponents(track, count):
+    """Returns cars placed on the starting grid behind the player's car, like the opponents in the game.
+
+    track: The Track the race is driven on.
+    count: The number of opponents.
+    """
+
+    return [Car(Vector2D(x, y), Vector2D(0, 0), SPEEDLIMIT, WIDTH, LENGTH, Rectangle(RES_X, RES_Y, TRANSPARENT),
+                rotation, LAPS, OFFROAD_SPEEDLIMIT, SWEPT_COLLISION)
+            for x, y, rotation in track.getGrid(count + 1)[1:]]
+
+def evaluate(inputs, track = None, opponents = OPPONENTS):
+    """Replays a race without rendering it.
+
+    inputs:     The input for each frame of the race. Either a sequence of Controls tuples,
+                or a bytes-like object with one packed control byte per frame (see physics.packControls).
+    track:      The Track the race is driven on. Uses the default track if not given.
+    opponents:  The number of computer controlled opponents. They are only simulated if the cars
+                can collide (see CAR_COLLISIONS), since they can't affect the race otherwise.
+
+    The race is replayed until the input runs out or there are no laps to go.
+
+    Returns a LapTimes tuple with the latest, fastest and total lap times (in frames).
+    """
+
+    if track is None:
+        track = defaultTrack()
+    if isinstance(inputs, (bytes, bytearray, memoryview)):
+        inputs = [UNPACKED[b] for b in bytes(inputs)]
+
+    obstacles = track.getObstacleIndex()
+    checkpoints = track.getCheckpoints()
+    terrain = track.getTerrain()
+    car = makeCar(track)
+    step = car.step
+
+    if not (CAR_COLLISIONS and opponents):
+        for controls in inputs:
+            if not step(controls, ROTATION_STEP, obstacles, checkpoints, terrain):
+                break
+        return LapTimes(car.getLatestLap(), car.getFastestLap(), car.getTotalLap())
+
+    #Same order as in the game: the player, then the opponents (once the player has started), then the collisions
+    others = makeOpponents(track, opponents)
+    pilot = makePilot(track)
+    traffic = Traffic([car] + others)
+    for controls in inputs:
+        if not step(controls, ROTATION_STEP, obstacles, checkpoints, terrain):
+            break
+        if car._running:
+            for other in others:
+                if other._laps > 0:
+                    other.step(pilot.controls(other), ROTATION_STEP, obstacles, checkpoints, terrain)
+        traffic.update()
+
+    return LapTimes(car.getLatestLap(), car.getFastestLap(), car.getTotalLap())
+
+def evaluateMany(races, workers = None, chunksize = 1):
+    """Replays many races on the default track in parallel, using a pool of worker processes.
+
+    races:      A list of race inputs (see evaluate). Packed bytes are much cheaper to send to the workers.
+    workers:    The number of worker processes. Uses one per CPU if not given.
+    chunksize:  The number of races sent to a worker at a time.
+
+    Returns a list of LapTimes tuples, in the same order as races.
+    """
+
+    with ProcessPoolExecutor(workers) as executor:
+        return list(executor.map(evaluate, races, chunksize = chunksize))
@@ -0,0 +1,341 @@
+"""A vectorized physics engine for many cars at once.
+
+The state of all the cars is kept in NumPy arrays (one array per attribute, one element per car),
+and a single call to step advances every car a frame. The results match those of physics.Car
+(within floating point tolerance), but the cost per car is much lower when there are many cars.
+Only the default (not swept) collisions of physics.Car are implemented.
+
+This module requires NumPy, which the rest of the game does not.
+"""
+
+#Imports
+
+##External
+import math
+import numpy as np
+
+##Classes and global constants
+from shapes import *
+
+class Fleet(object):
+    """A number of cars that are simulated together. All the cars have the same size and speed limit."""
+
+    def __init__(self, positions, speedlimit, width, length, room, rotation = 0, laps = 10, offroadlimit = None):
+        """Create a fleet of cars.
+
+        positions:  A sequence of (x, y) pairs, one for the upper left corner of each car's square.
+        speedlimit: The maximum magnitude allowable for the cars' velocities.
+        width:      The width of the cars (must be less than length).
+        length:     The length of the cars (and dimension of their squares).
+        room:       A rectangle that is supposed to contain the cars.
+        rotation:   The initial direction of the cars in degrees (a single value or one per car).
+        laps:       The number of laps in the race.
+        offroadlimit: The speed limit when a car is off-road. Same as speedlimit if not given.
+        """
+
+        if not isinstance(room, Rectangle):
+            raise TypeError("Argument error. room must be an object of the Rectangle class.")
+
+        self._n = len(positions)
+        self._w = length
+        self._h = length
+        self._width = width
+        self._maxSpeed = speedlimit
+        self._offroadSpeed = speedlimit if offroadlimit is None else offroadlimit
+        self._room = room
+
+        self._x = np.array([p[0] for p in positions], dtype = float)
+        self._y = np.array([p[1] for p in positions], dtype = float)
+        self._vx = np.zeros(self._n)
+        self._vy = np.zeros(self._n)
+        self._rotation = np.empty(self._n)
+        self._rotation[:] = rotation
+        self._running = np.zeros(self._n, dtype = bool)
+        self._offroad = np.zeros(self._n, dtype = bool)
+
+        self._laps = np.full(self._n, laps)         #Laps to go
+        self._lastCP = np.full(self._n, -1)         #Index of latest checkpoint
+        self._frames = np.zeros(self._n, dtype = int)       #Number of frames for this lap
+        self._fastestLap = np.zeros(self._n, dtype = int)   #Fastest lap time
+        self._latestLap = np.zeros(self._n, dtype = int)    #Latest lap time
+        self._totalLap = np.zeros(self._n, dtype = int)     #Total lap time
+        self._segments = (None, None)               #The latest checkpoint segments and their arrays
+        self._bitmap = (None, None)                 #The latest terrain and its bytes as a 2D array
+
+    def __len__(self):
+        return self._n
+
+    def getPositions(self):
+        """Returns an (n, 2) array with the position of each car."""
+        return np.column_stack((self._x, self._y))
+
+    def getVelocities(self):
+        """Returns an (n, 2) array with the velocity of each car."""
+        return np.column_stack((self._vx, self._vy))
+
+    def getRotations(self):
+        """Getter for _rotation."""
+        return self._rotation
+
+    def getOffroad(self):
+        """Getter for _offroad."""
+        return self._offroad
+
+    def getLaps(self):
+        """Getter for _laps."""
+        return self._laps
+
+    def getFastestLap(self):
+        """Getter for _fastestLap."""
+        return self._fastestLap
+
+    def getLatestLap(self):
+        """Getter for _latestLap."""
+        return self._latestLap
+
+    def getTotalLap(self):
+        """Getter for _totalLap."""
+        return self._totalLap
+
+    def step(self, left, right, thrust, anglespeed, obstacles, checkpoints = None, terrain = None):
+        """Advances all the cars a single frame. Corresponds to Car.step.
+
+        left, right, thrust:    Boolean arrays with the controls of each car for this frame.
+        anglespeed:             Number of degrees a car turns when turning left or right.
+        obstacles:              A list of obstacles that the cars can collide with.
+        checkpoints:            A list of lines that the cars must cross in chronological order to finish a lap.
+                                Laps are not counted if not given.
+        terrain:                A Terrain telling where the track is off-road. The cars are always on the road if not given.
+
+        Returns a boolean array telling which cars have more laps to drive.
+        """
+
+        left = np.asarray(left, dtype = bool)
+        right = np.asarray(right, dtype = bool)
+        thrust = np.asarray(thrust, dtype = bool)
+
+        self._running |= left | right | thrust
+        active = self._running
+
+        #Handle interaction with other game objects
+        self.bounce(active)
+        self.collide(obstacles, active)
+        if checkpoints:
+            self.checkpoint(checkpoints, active)
+        if terrain is not None:
+            self.offroad(terrain, active)
+
+        #Update direction and velocity based on the controls (turning both ways cancels out)
+        turn = (right.astype(float) - left.astype(float)) * anglespeed
+        self._rotation += np.where(active, turn, 0)
+
+        push = active & thrust
+        angle = self._rotation * math.pi / 180
+        self._vx += np.where(push, np.cos(angle), 0)
+        self._vy += np.where(push, np.sin(angle), 0)
+
+        #Limit the velocity and move the cars
+        self.limit_velocity()
+        self._x += np.where(active, self._vx, 0)
+        self._y += np.where(active, self._vy, 0)
+        self._frames += active
+
+        return self._laps > 0
+
+    def bounce(self, active):
+        """Changes velocity and position of the cars that hit a wall of the room. Corresponds to MovingObject.bounce.
+
+        active: A boolean array telling which cars are affected.
+        """
+
+        room = self._room
+        left = room._pos.x
+        right = room._pos.x + room._w
+        top = room._pos.y
+        bottom = room._pos.y + room._h
+
+        low = active & (self._x <= left)
+        high = active & ~low & (self._x + self._w >= right)
+        self._vx[low | high] *= -1
+        self._x = np.where(low, 2 * left - self._x, self._x)
+        self._x = np.where(high, 2 * right - (self._x + 2 * self._w), self._x)
+
+        low = active & (self._y <= top)
+        high = active & ~low & (self._y + self._h >= bottom)
+        self._vy[low | high] *= -1
+        self._y = np.where(low, 2 * top - self._y, self._y)
+        self._y = np.where(high, 2 * bottom - (self._y + 2 * self._h), self._y)
+
+    def limit_velocity(self):
+        """Limits the velocity of each car based on _maxSpeed (or _offroadSpeed when off-road)."""
+
+        limit = np.where(self._offroad, self._offroadSpeed, self._maxSpeed)
+        speed_sq = self._vx * self._vx + self._vy * self._vy
+        fast = speed_sq > limit * limit
+        if fast.any():
+            scale = limit[fast] / np.sqrt(speed_sq[fast])
+            self._vx[fast] *= scale
+            self._vy[fast] *= scale
+
+    def collide(self, obstacles, active):
+        """Changes the velocity of the cars that hit an obstacle. Corresponds to Car.collide.
+
+        obstacles:  The list of obstacles that the cars can collide with (circles and rectangles).
+        active:     A boolean array telling which cars are affected.
+
+        The obstacles are handled one at a time (in order), but all the cars are handled together.
+        """
+
+        w = self._w
+        h = self._h
+        reach = math.sqrt(w * w + h * h) / 2
+
+        for thing in obstacles:
+            if isinstance(thing, Rectangle):
+                hit = active & _overlaps(self._x, w, thing._pos.x, thing._w) & _overlaps(self._y, h, thing._pos.y, thing._h)
+                self._x[hit] -= self._vx[hit]
+                self._y[hit] -= self._vy[hit]
+                self._vx[hit] *= -1
+                self._vy[hit] *= -1
+                continue
+            elif not isinstance(thing, Circle):
+                continue
+
+            dx = thing._pos.x - self._x
+            dy = thing._pos.y - self._y
+            r = thing._radius
+
+            #Cars that are close enough for a corner to hit the obstacle
+            near = active & ((dx - w / 2) ** 2 + (dy - h / 2) ** 2 < (r + reach) ** 2)
+            if not near.any():
+                continue
+
+            hit = np.zeros(self._n, dtype = bool)
+            for cx, cy in ((0, 0), (w, 0), (0, h), (w, h)):
+                hit |= (dx - cx) ** 2 + (dy - cy) ** 2 < r * r
+            hit &= near
+
+            self._x[hit] -= self._vx[hit]
+            self._y[hit] -= self._vy[hit]
+            self._vx[hit] *= -1
+            self._vy[hit] *= -1
+
+    def offroad(self, terrain, active):
+        """Looks up whether the center of each car is off-road. Corresponds to the terrain lookup in Car.step.
+
+        terrain:    A Terrain.
+        active:     A boolean array telling which cars are affected.
+        """
+
+        if terrain is not self._bitmap[0]:
+            w, h = terrain.getSize()
+            self._bitmap = (terrain, np.frombuffer(terrain.getBytes(), dtype = np.uint8).reshape(h, w))
+        bitmap = self._bitmap[1]
+        h, w = bitmap.shape
+
+        #Truncate like int() does, and treat the cars outside the track as off-road
+        cx = np.trunc(self._x + self._w / 2).astype(int)
+        cy = np.trunc(self._y + self._h / 2).astype(int)
+        inside = (cx >= 0) & (cy >= 0) & (cx < w) & (cy < h)
+        offroad = np.ones(self._n, dtype = bool)
+        offroad[inside] = bitmap[cy[inside], cx[inside]] != 0
+        self._offroad = np.where(active, offroad, self._offroad)
+
+    def _segmentArrays(self, checkpoints):
+        """Returns the checkpoints' segments as arrays (see segmentArrays). They are reused until a checkpoint changes.
+
+        checkpoints: A list of lines.
+        """
+
+        segments = tuple(line.getSegment() for line in checkpoints)
+        if segments != self._segments[0]:
+            self._segments = (segments, segmentArrays(segments))
+        return self._segments[1]
+
+    def checkpoint(self, checkpoints, active):
+        """Handles intersection between the cars and the checkpoints. Corresponds to Car.checkpoint.
+
+        checkpoints:    A list of lines that the cars must cross in chronological order on every lap.
+        active:         A boolean array telling which cars are affected.
+
+        All the cars are tested against all the checkpoints in a single call to intersect_rectangles_segments.
+        """
+
+        count = len(checkpoints)
+        hits = intersect_rectangles_segments(self._x, self._y, self._w, self._h, *self._segmentArrays(checkpoints))
+
+        #The checkpoint each car has to cross next (the first one when starting or finishing a lap)
+        target = np.where((self._lastCP < 0) | (self._lastCP == count - 1), 0, self._lastCP + 1)
+        hit = active & hits[np.arange(self._n), target]
+
+        start = hit & (self._lastCP < 0)
+        finish = hit & ~start & (self._lastCP == count - 1)
+        advance = hit & ~start & ~finish
+
+        self._totalLap[start] = self._frames[start]
+
+        self._laps[finish] -= 1
+        self._latestLap[finish] = self._frames[finish]
+        faster = finish & ((self._fastestLap <= 0) | (self._latestLap < self._fastestLap))
+        self._fastestLap[faster] = self._latestLap[faster]
+        self._totalLap[finish] += self._latestLap[finish]
+
+        self._lastCP[start | finish] = 0
+        self._frames[start | finish] = 0
+        self._lastCP[advance] += 1
+
+def _overlaps(a, a_len, b, b_len):
+    """Tests if intervals overlap along one axis, the same way as precode.intersect_rectangles.
+
+    a:      An array with the start of each interval.
+    a_len:  The length of the intervals in a.
+    b:      The start of another interval.
+    b_len:  The length of the other interval.
+
+    Returns a boolean array.
+    """
+
+    return (((a >= b) & (a + a_len <= b + b_len)) |
+            ((a < b) & (a + a_len > b)) |
+            ((a < b + b_len) & (a + a_len > b + b_len)))
+
+def segmentArrays(segments):
+    """Turns a list of Segments (from precode) into arrays.
+
+    segments: A sequence of Segments.
+
+    Returns a tuple of arrays (x0, y0, dx, dy, left, top, right, bottom) with one element per segment.
+    """
+
+    return tuple(np.array([getattr(seg, name) for seg in segments], dtype = float)
+                 for name in ('x0', 'y0', 'dx', 'dy', 'left', 'top', 'right', 'bottom'))
+
+def intersect_rectangles_segments(x, y, sx, sy, x0, y0, dx, dy, left, top, right, bottom):
+    """Tests many rectangles against many line segments. Vectorized version of precode.intersect_rectangle_segment.
+
+    x, y:       Arrays with the upper left corners of N rectangles.
+    sx, sy:     Width and height of the rectangles.
+    The rest:   Arrays describing M segments, as returned by segmentArrays.
+
+    Returns an (N, M) boolean array that is True where a rectangle intersects a segment.
+    """
+
+    rl = np.asarray(x, dtype = float)[:, None]
+    rt = np.asarray(y, dtype = float)[:, None]
+    rr = rl + sx
+    rb = rt + sy
+
+    hit = (rr > left) & (rl < right) & (rb > top) & (rt < bottom)
+    t0 = np.zeros(hit.shape)
+    t1 = np.ones(hit.shape)
+
+    #Clip the segments' parameter ranges against each side of the rectangles
+    with np.errstate(divide = 'ignore', invalid = 'ignore'):
+        for p, q in ((-dx, x0 - rl), (dx, rr - x0), (-dy, y0 - rt), (dy, rb - y0)):
+            p = np.broadcast_to(p, hit.shape)
+            t = q / p
+            hit &= (p != 0) | (q > 0)
+            t0 = np.where(p < 0, np.maximum(t0, t), t0)
+            t1 = np.where(p > 0, np.minimum(t1, t), t1)
+
+    return hit & (t0 < t1)
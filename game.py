@@ -1,7 +1,7 @@
 #Imports
 
 ##External
-import pygame, sys, os, math
+import pygame, sys, os, math, time, asyncio
 from pygame.locals import *
 from precode import Vector2D
 
@@ -11,6 +11,16 @@ from library import *
 ##Classes and global constants
 from supercar import *
 from drawable import *
+from track import *
+from replay import Recorder, Replay
+from physics import Controls
+from ghost import *
+from profiler import FrameProfiler
+from training import makePilot
+from traffic import Traffic
+from simulation import Simulation, Snapshot
+from services import Lap, Finish, makeServices
+from highscores import Highscores, Entry, configKey
 from drawconf import *
 from config import *
 
@@ -20,22 +30,69 @@ from config import *
 class Game(object):
     """A class for running the Supercars game."""
 
-    def __init__(self):
-        """Create a new game of Supercars."""
+    def __init__(self, dirty = DIRTY_RECTS, replay = None):
+        """Create a new game of Supercars.
+
+        dirty:  If True, only the parts of the window that have changed are updated each frame.
+                If False, the whole window is redrawn and updated every frame.
+        replay: The path of a replay file. If given, the recorded race is shown (in real time)
+                instead of letting the player drive.
+        """
+
+        self._dirty = dirty
+        self._track = loadTrack(trackPath(TRACK))  #Load the track (compiled the first time only)
+        self._replay = None if replay is None else Replay(replay, self._track).controls()
+        self._recorder = Recorder(self._track)      #Records the race, so that it can be replayed
+
+        #The leaderboard of the track (with the current settings), looked up in advance so that it is cached
+        self._highscores = Highscores(HIGHSCORE_DB, HIGHSCORE_BATCH, HIGHSCORE_DELAY, HIGHSCORE_CACHE)
+        self._configKey = configKey(self._track)
+        self._highscores.top(self._track.getName(), self._configKey, HIGHSCORE_COUNT)
+        self._entry = None          #The race's Entry in the highscores (once it has been added)
 
         self._screen = self._makeScreen()           #Initialize game window
         self._clock = pygame.time.Clock()           #Initialising game clock(used to make the animation run smoothly)
+
+        #Render the track now, and add it to the cache, so that neither happens during the first frame
+        self._track.getSurface()
+        self._track.updateCache()
         
-        self._ground = self._makeGround()           #Create background
-        self._obstacles = self._makeObstacles()     #Create obstacles
-        self._checkpoints = self._makeCheckpoints() #Create checkpoints
+        self._ground = self._track.getGround()
+        self._obstacles = self._track.getObstacles()
+        self._checkpoints = self._track.getCheckpoints()
+        self._obstacleIndex = self._track.getObstacleIndex()
+        self._terrain = self._track.getTerrain()
         self._font = makeFont(FONT, FONTSIZE)       #Create a standard font
+        self._textboxes = LRUCache(TEXT_CACHE_SIZE) #Rendered text, reused until it changes
 
         #Make a car for the player
         keys = self._makeControls()
-        self._car = Supercar(Vector2D(int(RES_X / 2 + WIDTH), int((ROAD_WIDTH - WIDTH) / 2)),
+        x, y, rotation = self._track.getStart()
+        self._car = Supercar(Vector2D(x, y),
                              Vector2D(0, 0), SPEEDLIMIT, RED, WIDTH, LENGTH, Rectangle(RES_X, RES_Y, TRANSPARENT),
-                             keys, CAR_ROTATION, bgcolor = WHITE)
+                             keys, rotation, bgcolor = WHITE, laps = LAPS, offroadlimit = OFFROAD_SPEEDLIMIT,
+                             swept = SWEPT_COLLISION)
+
+        #Computer controlled opponents, starting behind the player
+        self._pilot = makePilot(self._track)
+        self._opponents = self._makeOpponents(OPPONENTS)
+        self._traffic = Traffic([self._car] + self._opponents) if CAR_COLLISIONS else None
+
+        #Ghosts of the fastest laps so far, and a recorder for making new ones
+        self._ghosts = loadGhosts(bestGhosts(GHOST_DIR, TRACK, GHOSTS), self._car, GHOST_ALPHA)
+        self._ghostRecorder = GhostRecorder()
+        self._bestLap = min([len(ghost) for ghost in self._ghosts] or [0])  #0 if there are no ghosts
+
+        #Timing of each stage of the frames, and an overlay showing it
+        self._profiler = FrameProfiler(('input', 'physics', 'opponents', 'background', 'menu', 'ghosts', 'car',
+                                        'overlay', 'tick', 'display'), PROFILE_WINDOW)
+        self._profileKey = pygame.key.key_code(PROFILE_KEY)
+        self._showProfile = False
+        self._profileBox = None     #The rendered overlay
+        self._profileDrawn = None   #The part of the screen the overlay was drawn to last time
+
+        self._simulation = None     #The simulation thread (if THREADED)
+        self._services = []         #The services handling the game's events (if ASYNC_LOOP)
 
         self.run()  #Run the game
 
@@ -53,96 +110,244 @@ class Game(object):
   
         return gamescreen
 
-    def _makeGround(self):
-        """Makes a (default) track for the game.
-
-        Returns a list of the drawables that the track is made of.
-        """
-
-        areas = list()
-
-        #Make asphalt
-        areas.append(Circle(300, 300, 300, BLACK))
-        areas.append(Rectangle(RES_X - 600, 200, BLACK, 300, 0))
-        areas.append(Circle(300, RES_Y - 300, 300, BLACK))
-        areas.append(Rectangle(200, RES_Y - 600, BLACK, 0, 300))
-        areas.append(Circle(RES_X - 300, RES_Y - 300, 300, BLACK))
-        areas.append(Rectangle(RES_X - 600, 200, BLACK, 300, RES_Y - 200))
-        areas.append(Circle(RES_X - 300, 300, 300, BLACK))
-        areas.append(Rectangle(200, RES_Y - 600, BLACK, RES_X - 200, 300))
-
-        #Make markings
-        areas.append(Arc(300, 300, 200 + (MARK_WIDTH / 2), MARK_WIDTH, math.pi / 2, math.pi / 2, MARK_COLOR))
-        areas.append(Arc(300, RES_Y - 300, 200 + (MARK_WIDTH / 2), MARK_WIDTH, math.pi, math.pi / 2, MARK_COLOR))
-        areas.append(Arc(RES_X - 300, RES_Y - 300, 200 + (MARK_WIDTH / 2), MARK_WIDTH, math.pi * 3 / 2, math.pi / 2, MARK_COLOR))
-        areas.append(Arc(RES_X - 300, 300, 200 + (MARK_WIDTH / 2), MARK_WIDTH, 0, math.pi / 2, MARK_COLOR))
-        areas.append(Line(RES_X - 320, 100, RES_X - 640, MARK_WIDTH, math.pi, MARK_COLOR))
-        areas.append(Line(100, 320, RES_Y - 640, MARK_WIDTH, math.pi / 2, MARK_COLOR))
-        areas.append(Line(320, RES_Y - 100, RES_X - 640, MARK_WIDTH, 0, MARK_COLOR))
-        areas.append(Line(RES_X - 100, RES_Y - 320, RES_Y - 640, MARK_WIDTH, math.pi * 3 / 2, MARK_COLOR))
-
-        #Make grass
-        areas.append(Rectangle(RES_X - 600, RES_Y - 400, GREEN, 300, 200))
-        areas.append(Rectangle(RES_X - 400, RES_Y - 600, GREEN, 200, 300))
+    def _makeControls(self):
+        """Generates a list containing the keys the player can use (as a tuple).
+
+        First element is a surface supposed to hold a key image.
+        Second element is text to accompany the image.
+        Third element is a pygame key constant for the corresponding key.
         
-        return areas
+        Returns the list of tuples.
+        """
 
-    def _makeObstacles(self):
-        """Makes (default) obstacles for the game.
+        return ([(IMAGE, KEYTEXT[0], pygame.K_LEFT),
+                 (IMAGE, KEYTEXT[1], pygame.K_RIGHT),
+                 (IMAGE, KEYTEXT[2], pygame.K_UP)])
 
-        Returns a list of the drawables representing these obstacles.
+    def _makeOpponents(self, count):
+        """Makes computer controlled cars, placed on the grid behind the player's car.
+
+        count: The number of cars.
+
+        Returns a list of Supercars.
         """
 
-        obstacles = list()
+        opponents = []
+        for i, (x, y, rotation) in enumerate(self._track.getGrid(count + 1)[1:]):
+            opponents.append(Supercar(Vector2D(x, y), Vector2D(0, 0), SPEEDLIMIT,
+                                      OPPONENT_COLORS[i % len(OPPONENT_COLORS)], WIDTH, LENGTH,
+                                      Rectangle(RES_X, RES_Y, TRANSPARENT), None, rotation, bgcolor = WHITE, laps = LAPS,
+                                      offroadlimit = OFFROAD_SPEEDLIMIT, swept = SWEPT_COLLISION))
+        return opponents
+
+    def _stepOpponents(self):
+        """Advances the opponents a single frame. They start when the player does, and stop when they have finished.
+        The collisions between all the cars are handled afterwards.
+        """
 
-        obstacles.append(Circle(300, 300, 100, BLUE))
-        obstacles.append(Circle(300, RES_Y - 300, 100, BLUE))
-        obstacles.append(Circle(RES_X - 300, RES_Y - 300, 100, BLUE))
-        obstacles.append(Circle(RES_X - 300, 300, 100, BLUE))
+        if self._car._running:
+            for car in self._opponents:
+                if car._laps > 0:
+                    car.step(self._pilot.controls(car), ROTATION_STEP, self._obstacleIndex, self._checkpoints,
+                             self._terrain)
+        if self._traffic is not None:
+            self._traffic.update()
 
-        return obstacles
+    def _getEvents(self):
+        """Gets the events from pygame's event queue, and quits if the user has terminated the game.
 
-    def _makeCheckpoints(self):
-        """Generate the (default) checkpoints that cars have to cross on each lap.
+        Returns a list of the events.
+        """
 
-        Return a list of the checkpoint lines. The first element is supposed to be the start/finish line.
+        events = pygame.event.get()
+        for event in events:
+            if event.type == pygame.QUIT:
+                if self._simulation is not None:
+                    self._simulation.stop()     #Nothing may change while the replay is saved
+                self._finish()
+                self._highscores.close()
+                pygame.quit()
+                sys.exit()
+            elif event.type == pygame.KEYDOWN and event.key == self._profileKey:
+                self._showProfile = not self._showProfile
+                self._profileBox = None
+
+        return events
+
+    def _getControls(self):
+        """Gets the controls for the next tick, from the player or from the replay being shown. The player's controls
+        are those of the latest events read (see _frames), so the event queue isn't touched here.
+
+        Returns a Controls tuple, or None if the replay has no more frames (e.g. the race was quit before the end).
         """
 
-        cp = list()
+        controls = self._car.readControls(())
+        if self._replay is not None:
+            controls = next(self._replay, None)
+        return controls
 
-        cp.append(Line(RES_X / 2, 200, 200, 8, math.pi * 3 / 2, YELLOW))
-        cp.append(Line(300, 200, 200, 4, math.pi * 3 / 2, TRANSPARENT))
-        cp.append(Line(200, 300, 200, 4, math.pi, TRANSPARENT))
-        cp.append(Line(200, RES_Y - 300, 200, 4, math.pi, TRANSPARENT))
-        cp.append(Line(300, RES_Y - 200, 200, 4, math.pi / 2, TRANSPARENT))
-        cp.append(Line(RES_X - 300, RES_Y - 200, 200, 4, math.pi / 2, TRANSPARENT))
-        cp.append(Line(RES_X - 200, RES_Y - 300, 200, 4, 0, TRANSPARENT))
-        cp.append(Line(RES_X - 200, 300, 200, 4, 0, TRANSPARENT))
-        cp.append(Line(RES_X - 300, 200, 200, 4, math.pi * 3 / 2, TRANSPARENT))
+    def _tick(self, controls):
+        """Advances the race a single tick on the simulation thread (see _runThreaded).
 
-        return cp
+        controls: The latest controls of the player (ignored if a replay is shown).
 
-    def _makeControls(self):
-        """Generates a list containing the keys the player can use (as a tuple).
+        Returns True if there are more laps to drive (and frames of the replay to show). False otherwise.
+        """
 
-        First element is a surface supposed to hold a key image.
-        Second element is text to accompany the image.
-        Third element is a pygame key constant for the corresponding key.
-        
-        Returns the list of tuples.
+        if self._replay is not None:
+            controls = next(self._replay, None)
+            if controls is None:
+                return False
+        self._recorder.record(controls)
+        laps = self._car._laps
+        running = self._car.step(controls, ROTATION_STEP, self._obstacleIndex, self._checkpoints, self._terrain)
+        self._recordGhost(laps)
+        self._publishLap(laps)
+        self._stepOpponents()
+        return running
+
+    def _capture(self, due = 0.0, running = True):
+        """Takes a snapshot of everything needed to draw the race.
+
+        due:        When the latest tick was due (see simulation.Snapshot).
+        running:    False if the race has been stopped, even if there are laps to go (e.g. at the end of a replay).
+
+        Returns a Snapshot.
         """
 
-        return ([(IMAGE, KEYTEXT[0], pygame.K_LEFT),
-                 (IMAGE, KEYTEXT[1], pygame.K_RIGHT),
-                 (IMAGE, KEYTEXT[2], pygame.K_UP)])
+        car = self._car
+        cars = [car] + self._opponents
+        return Snapshot(due, tuple(other._previous for other in cars),
+                        tuple((other._pos.x, other._pos.y, other._rotation) for other in cars),
+                        car._frames if car._lastCP >= 0 else 0,
+                        (car._laps, car.getFastestLap(), car.getLatestLap(), car.getTotalLap()),
+                        running and car._laps > 0)
+
+    def _recordGhost(self, laps):
+        """Records the car's state for the current lap, and saves the previous lap as a ghost if it was the fastest.
+
+        laps: The number of laps to go before the car's latest step.
+        """
+
+        car = self._car
+        if car._laps != laps and self._replay is None:
+            lap = car.getLatestLap()
+            if self._bestLap <= 0 or lap < self._bestLap:
+                if not os.path.isdir(GHOST_DIR):
+                    os.makedirs(GHOST_DIR)
+                self._ghostRecorder.save(os.path.join(GHOST_DIR, ghostName(TRACK, lap)), lap)
+                self._bestLap = lap
+
+        if car._lastCP >= 0 and car._frames > 0:
+            self._ghostRecorder.record(car._frames, car._pos.x, car._pos.y, car._rotation)
+
+    def _publish(self, event):
+        """Hands an event to all the services (without waiting for them)."""
+
+        for service in self._services:
+            service.notify(event)
+
+    def _publishLap(self, laps):
+        """Tells the services about the latest lap, if the car's latest step completed one.
+
+        laps: The number of laps to go before the car's latest step.
+        """
+
+        car = self._car
+        if car._laps != laps and self._services:
+            self._publish(Lap(self._track.getName(), LAPS - car._laps, car.getLatestLap(), car.getFastestLap(),
+                              car.getTotalLap()))
+
+    def _saveReplay(self):
+        """Saves a replay of the race in REPLAY_DIR, unless the race is itself a replay or hasn't started.
+
+        Returns the path of the replay file, or None if it wasn't saved.
+        """
+
+        if self._replay is None and self._car._running:
+            path = newFile(REPLAY_DIR, 'rpl')
+            self._recorder.save(path)
+            return path
+        return None
+
+    def _saveProfile(self):
+        """Saves the frame times of the race in PROFILE_DIR (if PROFILE is True)."""
+
+        if PROFILE and len(self._profiler):
+            self._profiler.dump(newFile(PROFILE_DIR, PROFILE_FORMAT))
+
+    def _finish(self):
+        """Saves the replay, the frame times and the highscore of the race, and tells the services that the race is over.
+        Races that are replays or haven't completed a lap get no highscore.
+        """
 
-    def makeMenu(self):
-        """Make a menu near the center of the screen. Will overwrite previously drawn objects."""
+        path = self._saveReplay()
+        self._saveProfile()
+        car = self._car
+        if self._replay is None and car._laps < LAPS:
+            self._entry = Entry(self._track.getName(), self._configKey, car.getFastestLap(), car.getLatestLap(),
+                                car.getTotalLap(), LAPS - car._laps, time.time())
+            self._highscores.add(self._entry)
+        self._publish(Finish(self._track.getName(), path, LAPS - car._laps, car.getFastestLap(), car.getTotalLap()))
+
+    def drawProfile(self):
+        """Draws the profiler overlay if it is shown. The overlay is rendered again every PROFILE_REFRESH frames.
+
+        Returns a list of pygame Rects for the parts of the screen that have changed since the overlay was last drawn.
+        """
+
+        rects = [self._profileDrawn] if self._profileDrawn else []
+        if not self._showProfile:
+            self._profileDrawn = None
+            return rects
+
+        if self._profileBox is None or len(self._profiler) % PROFILE_REFRESH == 0:
+            self._profileBox = self._profiler.render(self._font, WHITE, BLACK)
+        self._profileDrawn = self._screen.blit(self._profileBox, (PROFILE_X, PROFILE_Y))
+        rects.append(self._profileDrawn)
+        return rects
+
+    def drawLeaderboard(self):
+        """Draws the fastest laps on the track (with the same settings) below the menu.
+        The race's own lap is highlighted if it is among them.
+
+        Returns a pygame Rect for the area drawn.
+        """
+
+        entries = self._highscores.top(self._track.getName(), self._configKey, HIGHSCORE_COUNT)
+        height = self._font.get_linesize()
+        area = pygame.Rect(HIGHSCORE_X, HIGHSCORE_Y, MENU_W, height * (len(entries) + 1) + 20)
+        pygame.draw.rect(self._screen, LGRAY, area)
+
+        item_posy = HIGHSCORE_Y + 10
+        self._screen.blit(self.makeTextbox('fastest laps:', BLACK), (MENU_COL_X, item_posy))
+        for i, entry in enumerate(entries):
+            item_posy += height
+            text = '%d.  %s' % (i + 1, framesToSec(entry.fastest, FPS))
+            if entry == self._entry:
+                textbox = self.makeTextbox(text, WHITE, BLACK)
+            else:
+                textbox = self.makeTextbox(text, BLACK)
+            self._screen.blit(textbox, (MENU_COL_X, item_posy))
+
+        return area
+
+    def makeMenu(self, times = None):
+        """Make a menu near the center of the screen. Will overwrite previously drawn objects.
+
+        times: A tuple with the laps to go, and the fastest, latest and total lap times (in ticks) to show.
+               Taken from the player's car if not given.
+
+        Returns a pygame Rect for the area containing the values (the only part of the menu that changes).
+        """
+
+        if times is None:
+            times = (self._car._laps, self._car.getFastestLap(), self._car.getLatestLap(), self._car.getTotalLap())
+        laps, fastest, latest, total = times
 
         #Lists of output
         i = [('laps to go:'), ('fastest:'), ('latest:'), ('total time:')]
-        j = [str(self._car._laps), str(framesToSec(self._car.getFastestLap(), FPS)),
-             str(framesToSec(self._car.getLatestLap(), FPS)), str(framesToSec(self._car.getTotalLap(), FPS))]
+        j = [str(laps), str(framesToSec(fastest, FPS)), str(framesToSec(latest, FPS)), str(framesToSec(total, FPS))]
 
         #Draw a background and a header for the menu
         pygame.draw.rect(self._screen, LGRAY, (MENU_X, MENU_Y, MENU_W, MENU_H))
@@ -161,11 +366,16 @@ class Game(object):
         #Right column
         item_posx += COLSPAN
         item_posy = MENU_COL_Y
+        values = pygame.Rect(item_posx, item_posy, 0, 0)
 
         for info in j:
             textbox = self.makeTextbox(info, WHITE, BLACK)
             item_posy += 2 * textbox.get_height()
-            self._screen.blit(textbox, (item_posx, item_posy))            
+            values.union_ip(self._screen.blit(textbox, (item_posx, item_posy)))
+
+        #The values can get shorter, so the whole width of the column is reported
+        values.width = MENU_X + MENU_W - values.x
+        return values
 
     def makeTextbox(self, message, color, bgcolor = None, font = None):
         """Make a textbox displaying message.
@@ -175,48 +385,220 @@ class Game(object):
         bgcolor: A color for the textbox. The textbox will be transparent if no color is given.
         font: A font to use in the textbox. Will use the default font for the class if no other font is given.
 
-        returns the textbox as a rendered pygame font.
+        returns the textbox as a rendered pygame font. The textbox is cached, so it should not be drawn onto.
         """
 
         if font == None:
             font = self._font
-        if bgcolor == None:
-            return font.render(message, True, color)
-        else:
-            return font.render(message, True, color, bgcolor)
+
+        key = (message, color, bgcolor, font)
+        textbox = self._textboxes.get(key)
+        if textbox is None:
+            if bgcolor == None:
+                textbox = font.render(message, True, color)
+            else:
+                textbox = font.render(message, True, color, bgcolor)
+            self._textboxes.put(key, textbox)
+
+        return textbox
         
+    def drawFrame(self, snapshot, alpha, full):
+        """Draws a frame of the race.
+
+        snapshot:   A Snapshot of the race (see _capture).
+        alpha:      How far the cars have come from their previous states to their current ones.
+        full:       If True, the whole window is drawn. Otherwise only what may have changed.
+
+        Returns a list of pygame Rects for the parts of the window that have changed, or None if all of it has.
+        """
+
+        profiler = self._profiler
+        cars = [self._car] + self._opponents
+        states = list(zip(cars, snapshot.previous, snapshot.current))
+
+        if full:
+            #Redrawing the background, obstacles and checkpoints (pre-rendered by the track)
+            self._track.draw(self._screen)
+            profiler.mark('background')
+            self.makeMenu(snapshot.times)
+            profiler.mark('menu')
+            for ghost in self._ghosts:
+                ghost.draw(self._screen, snapshot.frame, alpha)
+            profiler.mark('ghosts')
+            for car, previous, current in states[1:] + states[:1]:
+                car.drawState(self._screen, previous, current, alpha)
+            profiler.mark('car')
+            self.drawProfile()
+            profiler.mark('overlay')
+            return None
+
+        #Restoring the background behind the cars and the overlay, and redrawing what may have changed
+        sprites = self._ghosts + cars
+        drawn = [sprite.getDrawnRect() for sprite in sprites] + [self._profileDrawn]
+        for rect in drawn:
+            if rect:
+                self._track.draw(self._screen, rect)
+        profiler.mark('background')
+        rects = [self.makeMenu(snapshot.times)]
+        profiler.mark('menu')
+        for ghost in self._ghosts:
+            rects.extend(ghost.draw(self._screen, snapshot.frame, alpha))
+        profiler.mark('ghosts')
+        for car, previous, current in states[1:] + states[:1]:
+            rects.extend(car.drawState(self._screen, previous, current, alpha))
+        profiler.mark('car')
+        rects.extend(self.drawProfile())
+        profiler.mark('overlay')
+        return rects
+
     def run(self):
         """Runs the game until there are no laps to go or the user terminates it.
 
         At a later stage, it would be desirable if the user can decide when the game stops running.
         """
 
-        running = True
+        if THREADED:
+            self._runThreaded()
+            self._finish()
+        elif ASYNC_LOOP:
+            asyncio.run(self._runAsync())   #Finishes the race itself, while the services are still running
+        else:
+            self._runSingle()
+            self._finish()
 
-        while running:
-            running = self._car.update(ROTATION_STEP, self._obstacles, self._checkpoints)
- 
-            #clearing the layer and redrawing the background
-            pygame.draw.rect(self._screen, LGRAY, (0, 0, RES_X, RES_Y))
-
-            #Drawing the foreground/objects
-            for area in self._ground:
-                area.draw(self._screen)
-            for thing in self._obstacles:
-                thing.draw(self._screen)
-            for cp in self._checkpoints:
-                cp.draw(self._screen)
-
-            self.makeMenu()
-            self._car.draw(self._screen)
-
-            #Wait for a while before updating the display window.
-            self._clock.tick(FPS)
-            pygame.display.update()
-
-        #Make sure the user can see the final results
+        #Make sure the user can see the final results (and how they rank)
+        pygame.display.update(self.drawLeaderboard())
         self._clock.tick(QPS)
+        self._highscores.close()
         return
 
+    def _present(self, rects):
+        """Updates the display window with a frame drawn by drawFrame, and ends the frame's timing."""
+
+        profiler = self._profiler
+        profiler.mark('tick')
+        pygame.display.update(rects)
+        profiler.mark('display')
+        profiler.endFrame()
+
+    def _runSingle(self):
+        """Runs the physics and the drawing on the same thread, until there are no laps to go."""
+
+        for rects in self._frames():
+            #Wait for a while before updating the display window (limits the rate of drawing, not of the physics)
+            self._clock.tick(RENDER_FPS)
+            self._present(rects)
+
+    async def _runAsync(self):
+        """Runs the race like _runSingle, but awaits the time to show each frame instead of blocking in the clock,
+        so that the services (see services.py) get on with their work in the meantime.
+        """
+
+        self._services = makeServices()
+        for service in self._services:
+            service.start()
+
+        try:
+            period = 1.0 / RENDER_FPS
+            deadline = time.perf_counter()
+            for rects in self._frames():
+                #A late frame is shown at once (but the services still get their turn), and the next ones are due
+                #a whole period later
+                now = time.perf_counter()
+                deadline = max(deadline + period, now)
+                await asyncio.sleep(deadline - now)
+                self._present(rects)
+            self._finish()
+        finally:
+            for service in self._services:
+                await service.stop(SERVICE_TIMEOUT)
+            self._services = []
+
+    def _frames(self):
+        """Runs the race on this thread, a frame at a time. Every frame runs the ticks that are due, and draws the race.
+
+        Yields the parts of the window to update (see drawFrame) after drawing each frame, until there are no
+        laps to go. The frame is to be shown (see _present) when the caller has waited for its time.
+        """
+
+        running = True
+        full = True     #The whole window must be drawn the first time
+        profiler = self._profiler
+
+        #The physics advance in fixed ticks of 1 / FPS seconds, whatever the rate of drawing. The time that has passed
+        #is accumulated, and as many ticks as fit are run before each frame is drawn. Lap times are counted in ticks,
+        #so they don't depend on how fast the frames are drawn.
+        tick = 1.0 / FPS
+        accumulator = 0.0
+        previous = time.perf_counter()
+
+        while running:
+            profiler.startFrame()
+            now = time.perf_counter()
+            accumulator = min(accumulator + now - previous, MAX_TICKS * tick)
+            previous = now
+
+            #The events are read once per frame, whatever the number of ticks (the controls are kept until they change)
+            self._car.readControls(self._getEvents())
+            profiler.mark('input')
+
+            while running and accumulator >= tick:
+                controls = self._getControls()
+                if controls is None:
+                    running = False     #The replay is over
+                    break
+                self._recorder.record(controls)
+                profiler.mark('input')
+                laps = self._car._laps
+                running = self._car.step(controls, ROTATION_STEP, self._obstacleIndex, self._checkpoints, self._terrain)
+                self._recordGhost(laps)
+                self._publishLap(laps)
+                profiler.mark('physics')
+                self._stepOpponents()
+                accumulator -= tick
+                profiler.mark('opponents')
+
+            #How far the cars have come towards their next tick (the final state is shown when the race is over)
+            alpha = accumulator / tick if running else 1.0
+
+            rects = self.drawFrame(self._capture(), alpha, full or not self._dirty or self._track.isDirty())
+            full = False
+            yield rects
+
+    def _runThreaded(self):
+        """Runs the physics on a thread of their own (see simulation.py), and draws the latest Snapshot of the race
+        until there are no laps to go. The physics are timed by the simulation thread, so only the input and
+        the drawing are profiled.
+        """
+
+        full = True
+        profiler = self._profiler
+        self._simulation = simulation = Simulation(self._tick, self._capture, Controls(False, False, False), FPS,
+                                                   MAX_TICKS)
+        simulation.start()
+
+        running = True
+        while running:
+            profiler.startFrame()
+            simulation.setControls(self._car.readControls(self._getEvents()))
+            profiler.mark('input')
+
+            #The cars are interpolated from the time their latest tick was due (the final state is shown at the end)
+            snapshot = simulation.getSnapshot()
+            running = snapshot.running
+            alpha = min(max((time.perf_counter() - snapshot.time) * FPS, 0.0), 1.0) if running else 1.0
+
+            rects = self.drawFrame(snapshot, alpha, full or not self._dirty or self._track.isDirty())
+            full = False
+
+            self._clock.tick(RENDER_FPS)
+            self._present(rects)
+
+        simulation.stop()
+
 if __name__ == '__main__':
-    game = Game()
+    #python game.py <replay file> shows a replay instead of starting a race
+    if len(sys.argv) > 1:
+        game = Game(replay = sys.argv[1])
+    else:
+        game = Game()
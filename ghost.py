@@ -0,0 +1,207 @@
+"""Ghost cars, showing how a previous lap was driven.
+
+A ghost file holds the position and rotation of a car for every frame of a single lap.
+Ghosts read their states straight from a memory-mapped file, one frame at a time, and share
+a single semi-transparent sprite per color, so showing many ghosts costs little memory and CPU.
+"""
+
+#Imports
+
+##External
+import pygame, struct, mmap, os, time
+
+##General methods
+from library import *
+
+##Global constants
+from drawconf import *
+
+MAGIC = b'SCGH'     #Identifies a ghost file
+VERSION = 1
+HEADER = struct.Struct('<4sHI')     #magic, version and number of frames
+STATE = struct.Struct('<ffh')       #x, y and rotation (in degrees, modulo 360) of a frame
+
+#Semi-transparent sprites, keyed by (car color, alpha) so that ghosts of the same color share one
+_layers = dict()
+
+def _ghostLayer(car, alpha):
+    """Returns a semi-transparent copy of a car's sprite.
+
+    car:    A Supercar with the appearance the ghost should have.
+    alpha:  The opacity of the ghost (0-255).
+    """
+
+    key = (car.getColor(), alpha)
+    if key not in _layers:
+        layer = car._makeLayer()
+        layer.fill((255, 255, 255, alpha), special_flags = pygame.BLEND_RGBA_MULT)
+        _layers[key] = layer
+    return _layers[key]
+
+class GhostRecorder(object):
+    """Records the states of a car during a lap, so that the lap can be saved as a ghost.
+
+    The states are written into a preallocated buffer, indexed by the frame number of the lap.
+    """
+
+    def __init__(self, capacity = 3000):
+        """Create a recorder.
+
+        capacity: The number of frames to make room for in advance (the buffer grows if needed).
+        """
+
+        self._buffer = bytearray(capacity * STATE.size)
+        self._frames = 0
+
+    def record(self, frame, x, y, rotation):
+        """Records the state of the car in a frame of the lap.
+
+        frame:      The number of the frame in the lap (starting at 1).
+        x, y:       The position of the car.
+        rotation:   The rotation of the car in degrees.
+        """
+
+        offset = (frame - 1) * STATE.size
+        if offset + STATE.size > len(self._buffer):
+            self._buffer.extend(bytes(len(self._buffer)))
+        STATE.pack_into(self._buffer, offset, x, y, int(rotation) % 360)
+        self._frames = frame
+
+    def save(self, path, frames):
+        """Writes the first frames of the recorded lap to a ghost file.
+
+        path:   The path of the file.
+        frames: The number of frames in the lap.
+        """
+
+        atomicWrite(path, [HEADER.pack(MAGIC, VERSION, frames), memoryview(self._buffer)[:frames * STATE.size]])
+
+class Ghost(object):
+    """A ghost car, replaying a lap from a ghost file."""
+
+    def __init__(self, path, car, alpha = 100):
+        """Open a ghost file.
+
+        path:   The path of the file.
+        car:    A Supercar with the appearance the ghost should have (e.g. the player's car).
+        alpha:  The opacity of the ghost (0-255).
+
+        Raises a ValueError if the file isn't a ghost file (or is empty or cut short), and an OSError
+        if it can't be read.
+        """
+
+        with open(path, 'rb') as f:
+            self._data = mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ)   #A ValueError if the file is empty
+
+        if len(self._data) < HEADER.size:
+            self._data.close()
+            raise ValueError("The file is not a supported ghost file.")
+        magic, version, frames = HEADER.unpack_from(self._data)
+        if magic != MAGIC or version != VERSION or len(self._data) < HEADER.size + frames * STATE.size:
+            self._data.close()
+            raise ValueError("The file is not a supported ghost file.")
+
+        self._frames = frames
+        self._layer = _ghostLayer(car, alpha)
+        self._noRotation = car._noRotation
+        self._drawn = None      #The part of the screen the ghost was drawn to last time
+
+    def __len__(self):
+        return self._frames
+
+    def close(self):
+        """Closes the ghost file."""
+        self._data.close()
+
+    def getState(self, frame):
+        """Reads the state of a frame from the file.
+
+        frame: The number of the frame in the lap (starting at 1).
+
+        Returns a tuple (x, y, rotation), or None if the lap doesn't have that frame.
+        """
+
+        if frame < 1 or frame > self._frames:
+            return None
+        return STATE.unpack_from(self._data, HEADER.size + (frame - 1) * STATE.size)
+
+    def getDrawnRect(self):
+        """Getter for _drawn."""
+        return self._drawn
+
+    def draw(self, layer, frame, alpha = 1.0):
+        """Draws the ghost as it was in a frame of the lap. Nothing is drawn if the lap doesn't have the frame.
+
+        layer: Layer to draw the ghost onto.
+        frame: The number of the frame in the lap (starting at 1).
+        alpha: How far the ghost has come from the previous frame to this one (see Supercar.draw).
+
+        Returns a list of pygame Rects for the parts of the layer that have changed since the ghost was last drawn.
+        """
+
+        rects = [self._drawn] if self._drawn else []
+        state = self.getState(frame)
+        if state is None:
+            self._drawn = None
+        else:
+            x, y, rotation = state
+            previous = self.getState(frame - 1)
+            if previous is not None and alpha < 1:
+                px, py, protation = previous
+                x = px + (x - px) * alpha
+                y = py + (y - py) * alpha
+                rotation = protation + ((rotation - protation + 180) % 360 - 180) * alpha   #The rotations are modulo 360
+            self._drawn = layer.blit(rotate_center(self._layer, self._noRotation - rotation), (x, y))
+            rects.append(self._drawn)
+
+        return rects
+
+def ghostName(track, frames):
+    """Makes a file name for a ghost. Sorting the names puts the fastest laps of each track first.
+
+    track:  The name of the track.
+    frames: The number of frames in the lap.
+    """
+
+    return '%s-%06d-%s.ghost' % (track, frames, time.strftime('%Y%m%d-%H%M%S'))
+
+def bestGhosts(folder, track, count):
+    """Finds the ghost files of the fastest laps on a track.
+
+    folder: The folder holding the ghost files.
+    track:  The name of the track.
+    count:  The maximum number of files to return.
+
+    Returns a list of paths, fastest lap first.
+    """
+
+    if not os.path.isdir(folder):
+        return []
+
+    #The names are laid out as in ghostName, and the name of a track may hold dashes of its own
+    names = []
+    for name in os.listdir(folder):
+        parts = name.rsplit('-', 3)
+        if len(parts) == 4 and parts[0] == track and parts[1].isdigit() and name.endswith('.ghost'):
+            names.append(name)
+    names.sort()
+    return [os.path.join(folder, name) for name in names[:count]]
+
+def loadGhosts(paths, car, alpha = 100):
+    """Opens a number of ghost files. Files that can't be read are skipped (with a message), so that
+    a single bad file doesn't keep the game from starting.
+
+    paths:  The paths of the files (see bestGhosts).
+    car:    A Supercar with the appearance the ghosts should have.
+    alpha:  The opacity of the ghosts (0-255).
+
+    Returns a list of Ghosts.
+    """
+
+    ghosts = []
+    for path in paths:
+        try:
+            ghosts.append(Ghost(path, car, alpha))
+        except (ValueError, OSError) as error:
+            print("Skipping the ghost file %s: %s" % (path, error))
+    return ghosts
@@ -0,0 +1,227 @@
+"""A persistent leaderboard of the races, kept in an SQLite database.
+
+Every race is stored with its track and a key for the settings that affect lap times (see configKey),
+so that only comparable races are ranked together. The table is indexed on the track, the settings and
+the lap times, so the best races are found without scanning the whole table, however many there are.
+
+Saving never waits for the database: new races are queued, and a writer thread stores them in batches
+(one transaction per batch). The leaderboards are cached, and the cache is cleared whenever a batch
+is stored. Races that are queued but not yet stored are merged into the leaderboards, so a race shows
+up at once.
+
+Run from terminal by typing: python highscores.py [track]
+to print the leaderboard of a track.
+"""
+
+#Imports
+
+##External
+import sqlite3, threading, hashlib, time, sys
+from collections import namedtuple
+from queue import Queue, Empty
+
+##General methods
+from library import LRUCache
+
+##Classes and global constants
+from replay import settings
+from config import *
+
+#A race.
+#track:     The name of the track.
+#config:    The key of the settings the race was driven with (see configKey).
+#fastest:   The fastest lap time (in ticks).
+#latest:    The latest lap time.
+#total:     The total time of the completed laps.
+#laps:      The number of laps completed.
+#created:   When the race was driven (seconds since the epoch).
+Entry = namedtuple('Entry', ['track', 'config', 'fastest', 'latest', 'total', 'laps', 'created'])
+
+#The lap times a leaderboard can be ordered by
+ORDERS = ('fastest', 'total')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS races (
+    id INTEGER PRIMARY KEY,
+    track TEXT NOT NULL,
+    config TEXT NOT NULL,
+    fastest INTEGER NOT NULL,
+    latest INTEGER NOT NULL,
+    total INTEGER NOT NULL,
+    laps INTEGER NOT NULL,
+    created REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS races_fastest ON races (track, config, fastest);
+CREATE INDEX IF NOT EXISTS races_total ON races (track, config, laps, total);
+"""
+
+def configKey(track):
+    """Returns a short key for the settings that affect the lap times on a track (see replay.settings)."""
+    return hashlib.sha1(repr(settings(track)).encode('utf-8')).hexdigest()[:16]
+
+class Highscores(object):
+    """The leaderboards of all the tracks, stored in an SQLite database.
+
+    The methods can be called from any thread. The database is only used by one thread at a time.
+    """
+
+    def __init__(self, path, batch = 100, delay = 1.0, cachesize = 32):
+        """Open (or create) a database and start its writer thread.
+
+        path:       The path of the database file (':memory:' for a database that isn't saved).
+        batch:      The most races stored in a single transaction.
+        delay:      The longest time (in seconds) a race waits for others to be stored with it.
+        cachesize:  The number of leaderboards cached.
+        """
+
+        self._path = path
+        self._batch = batch
+        self._delay = delay
+        self._db = sqlite3.connect(path, check_same_thread = False)
+        self._db.executescript(SCHEMA)
+        self._lock = threading.Lock()   #Held while using the database, the cache or the pending races
+        self._cache = LRUCache(cachesize)
+        self._pending = []              #Races that are queued but not yet stored
+        self._queue = Queue()
+        self._writes = 0                #Number of batches stored
+        self._errors = []               #Batches that couldn't be stored, with the exceptions they caused
+        self._writer = threading.Thread(target = self._write, name = 'highscores')
+        self._writer.daemon = True
+        self._writer.start()
+
+    def getWrites(self):
+        """Getter for _writes."""
+        return self._writes
+
+    def getErrors(self):
+        """Getter for _errors."""
+        return self._errors
+
+    def add(self, entry):
+        """Queues a race to be stored. Returns at once.
+
+        entry: An Entry.
+        """
+
+        with self._lock:
+            self._pending.append(entry)
+        self._queue.put(entry)
+
+    def top(self, track, config, count, order = 'fastest'):
+        """Finds the best races on a track.
+
+        track:  The name of the track.
+        config: The key of the settings (see configKey).
+        count:  The most races to return.
+        order:  The lap time the races are ranked by (one of ORDERS). Only races with the most laps completed
+                are ranked by their total time.
+
+        Returns a list of Entry tuples, the best first.
+        """
+
+        if order not in ORDERS:
+            raise ValueError("order must be one of " + ', '.join(ORDERS))
+
+        with self._lock:
+            key = (track, config, count, order)
+            stored = self._cache.get(key)
+            if stored is None:
+                if order == 'fastest':
+                    query = ("SELECT track, config, fastest, latest, total, laps, created FROM races "
+                             "WHERE track = ? AND config = ? AND fastest > 0 ORDER BY fastest, id LIMIT ?")
+                else:
+                    query = ("SELECT track, config, fastest, latest, total, laps, created FROM races "
+                             "WHERE track = ? AND config = ? AND laps = (SELECT MAX(laps) FROM races "
+                             "WHERE track = ? AND config = ?) ORDER BY total, id LIMIT ?")
+                params = (track, config, count) if order == 'fastest' else (track, config, track, config, count)
+                stored = [Entry(*row) for row in self._db.execute(query, params)]
+                self._cache.put(key, stored)
+            pending = [entry for entry in self._pending if entry.track == track and entry.config == config]
+
+        if not pending:
+            return list(stored)
+        if order == 'fastest':
+            races = [entry for entry in stored + pending if entry.fastest > 0]
+            races.sort(key = lambda entry: entry.fastest)
+        else:
+            most = max(entry.laps for entry in stored + pending)
+            races = [entry for entry in stored + pending if entry.laps == most]
+            races.sort(key = lambda entry: entry.total)
+        return races[:count]
+
+    def count(self, track, config):
+        """Returns the number of races stored on a track with some settings (not counting the queued ones)."""
+
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM races WHERE track = ? AND config = ?",
+                                    (track, config)).fetchone()[0]
+
+    def flush(self):
+        """Waits until all the queued races are stored."""
+        self._queue.join()
+
+    def close(self):
+        """Stores the queued races, stops the writer thread and closes the database."""
+
+        if self._writer.is_alive():
+            self._queue.put(None)
+            self._writer.join()
+        with self._lock:
+            self._db.close()
+
+    def _write(self):
+        """The writer thread. Gathers the queued races into batches and stores each batch in a single transaction.
+
+        A batch that can't be stored (e.g. the disk is full or the database locked) is rolled back and kept in
+        _errors with the exception. Its races stay pending, so they are still shown on the leaderboards
+        (but aren't stored). The thread goes on with the next batch.
+        """
+
+        stopping = False
+        while not stopping:
+            entries = [self._queue.get()]
+            try:
+                deadline = time.perf_counter() + self._delay
+                while entries[-1] is not None and len(entries) < self._batch:
+                    try:
+                        entries.append(self._queue.get(timeout = max(deadline - time.perf_counter(), 0)))
+                    except Empty:
+                        break
+                if entries[-1] is None:
+                    stopping = True
+                    entries.pop()
+
+                if entries:
+                    with self._lock:
+                        try:
+                            with self._db:
+                                self._db.executemany("INSERT INTO races (track, config, fastest, latest, total, laps, "
+                                                     "created) VALUES (?, ?, ?, ?, ?, ?, ?)", entries)
+                        except sqlite3.Error as error:
+                            self._errors.append((entries, error))
+                            print("Could not store %d races in %s: %s" % (len(entries), self._path, error))
+                        else:
+                            stored = set(map(id, entries))
+                            self._pending = [entry for entry in self._pending if id(entry) not in stored]
+                            self._cache.clear()
+                            self._writes += 1
+            finally:
+                #Every item taken from the queue is marked as done, whatever happened, so flush never hangs
+                for i in range(len(entries) + stopping):
+                    self._queue.task_done()
+
+if __name__ == '__main__':
+    #python highscores.py <track> prints the leaderboard of a track (with the current settings)
+    from track import loadTrack, trackPath
+    from library import framesToSec
+
+    track = loadTrack(trackPath(sys.argv[1] if len(sys.argv) > 1 else TRACK))
+    scores = Highscores(HIGHSCORE_DB)
+    config = configKey(track)
+    print("%d races on %s" % (scores.count(track.getName(), config), track.getName()))
+    for order in ORDERS:
+        print("By %s lap time:" % order)
+        for i, entry in enumerate(scores.top(track.getName(), config, HIGHSCORE_COUNT, order)):
+            print("%3d. %8.2f s  (%d laps, %s)" % (i + 1, framesToSec(getattr(entry, order), FPS), entry.laps,
+                                                   time.strftime('%Y-%m-%d %H:%M', time.localtime(entry.created))))
+    scores.close()
@@ -6,20 +6,100 @@ Initial version dated 26 April 2013
 13.09.16: Added framesToSec (jsi)
 """
 
-import pygame
+import pygame, os, time, tempfile
+from collections import OrderedDict
+
+class LRUCache(object):
+    """A dictionary-like cache holding a limited number of items.
+
+    When the cache is full, the least recently used item is discarded to make room for a new one.
+    """
+
+    def __init__(self, maxsize):
+        """Create an empty cache.
+
+        maxsize: The maximum number of items in the cache.
+        """
+
+        self._maxsize = maxsize
+        self._items = OrderedDict()
+
+    def __len__(self):
+        return len(self._items)
+
+    def get(self, key, default = None):
+        """Look up an item and mark it as the most recently used.
+
+        key:        The key of the item.
+        default:    Value to return if the item isn't in the cache.
+
+        Returns the cached item, or default if there is no such item.
+        """
+
+        try:
+            self._items.move_to_end(key)
+        except KeyError:
+            return default
+        return self._items[key]
+
+    def put(self, key, value):
+        """Store an item, discarding the least recently used item if the cache is full.
+
+        key:    The key of the item.
+        value:  The item.
+        """
+
+        self._items[key] = value
+        self._items.move_to_end(key)
+        if len(self._items) > self._maxsize:
+            self._items.popitem(last = False)
+
+    def clear(self):
+        """Remove all items from the cache."""
+        self._items.clear()
+
+#Rotated surfaces, keyed by (surface, angle). The surfaces are used as keys (by identity),
+#so a layer is kept alive as long as any of its rotations are cached.
+#If the rotation step divides 360, each layer needs at most 360 / step entries.
+#Otherwise the number of angles is bounded by the quantization to whole degrees and by the size of the cache.
+ROTATION_CACHE_SIZE = 1024
+_rotations = LRUCache(ROTATION_CACHE_SIZE)
+
+#Fonts made by makeFont, keyed by (name, size)
+_fonts = dict()
 
 def makeFont(font, size):
-    """Generate a pygame font.
+    """Generate a pygame font. Looking up and loading a system font is slow,
+    so each font is only made once and then reused.
 
     Returns the font object.
     """
 
-    font = pygame.font.SysFont(font, size)
-    return font
+    key = (font, size)
+    if key not in _fonts:
+        _fonts[key] = pygame.font.SysFont(font, size)
+    return _fonts[key]
 
 def rotate_center(layer, angle):
     """Rotates a pygame surface while keeping its center and size
 
+    layer: The layer to be rotated. It should not be changed after being rotated, since the result is cached.
+    angle: The counter-clockwise rotation in degrees (rounded to whole degrees).
+
+    Returns the resulting surface. It is shared with other callers, so it should not be drawn onto.
+    """
+
+    angle = int(round(angle)) % 360
+    key = (layer, angle)
+    newlayer = _rotations.get(key)
+    if newlayer is None:
+        newlayer = _rotate_center(layer, angle)
+        _rotations.put(key, newlayer)
+    return newlayer
+
+def _rotate_center(layer, angle):
+    """Rotates a pygame surface while keeping its center and size, without using the cache.
+
     layer: The layer to be rotated
     angle: The counter-clockwise rotation in degrees
 
@@ -43,3 +123,57 @@ def framesToSec(frames, fps):
     """
 
     return round((frames / fps), 2)
+
+#The permissions new files get (temporary files are only readable by their owner, see atomicWrite)
+_umask = os.umask(0)
+os.umask(_umask)
+
+def atomicWrite(path, data):
+    """Writes a file, so that it is never seen half written: the data is written to a temporary file of its own
+    in the same folder, which then replaces the file. Processes writing the same file at once each write a
+    temporary file of their own, and the last one to finish wins.
+
+    path:   The path of the file. Its folder is made if it doesn't exist.
+    data:   A bytes-like object, or a list of them (written one after the other).
+    """
+
+    folder = os.path.dirname(path) or '.'
+    os.makedirs(folder, exist_ok = True)
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        data = [data]
+
+    f = tempfile.NamedTemporaryFile(dir = folder, prefix = os.path.basename(path) + '.', suffix = '.tmp',
+                                    delete = False)
+    try:
+        with f:
+            for part in data:
+                f.write(part)
+        os.chmod(f.name, 0o666 & ~_umask)
+        os.replace(f.name, path)
+    except BaseException:
+        os.remove(f.name)
+        raise
+
+def newFile(folder, extension):
+    """Makes a new, empty file named after the current time (to the millisecond), e.g. 20260101-120000-042.rpl.
+    The file is created exclusively, and a counter is added to the name if it is taken, so two files made at
+    the same time (e.g. by two games) never get the same name.
+
+    folder:     The folder of the file. Made if it doesn't exist.
+    extension:  The extension of the file name (without the dot).
+
+    Returns the path of the file.
+    """
+
+    os.makedirs(folder, exist_ok = True)
+    now = time.time()
+    stem = time.strftime('%Y%m%d-%H%M%S', time.localtime(now)) + '-%03d' % (int(now * 1000) % 1000)
+
+    count = 1
+    while True:
+        name = stem + ('-%d' % count if count > 1 else '') + '.' + extension
+        try:
+            open(os.path.join(folder, name), 'xb').close()
+            return os.path.join(folder, name)
+        except FileExistsError:
+            count += 1
@@ -0,0 +1,356 @@
+#Imports
+
+##External
+import math
+from collections import namedtuple
+from precode import Vector2D, intersect_rectangle_segment, intersect_rectangles, intersect_segments
+from precode import sweep_rectangles, sweep_rectangle_circle
+
+##Classes and global constants
+from shapes import *
+from spatial import GridIndex
+
+#The input to a car for a single frame. Each field is True if the corresponding control is active.
+Controls = namedtuple('Controls', ['left', 'right', 'thrust'])
+
+#Bits used when packing Controls into a single byte
+LEFT = 1
+RIGHT = 2
+THRUST = 4
+
+#All possible controls, indexed by their packed value (so that unpacking doesn't make new objects)
+UNPACKED = tuple(Controls(bool(i & LEFT), bool(i & RIGHT), bool(i & THRUST)) for i in range(8))
+
+def packControls(controls):
+    """Packs controls into a single integer (0-7) with one bit per control.
+
+    controls: A Controls tuple.
+
+    Returns the packed controls. UNPACKED[packed] gives the controls back.
+    """
+
+    return controls.left * LEFT | controls.right * RIGHT | controls.thrust * THRUST
+
+class Car(Rectangle, MovingObject):
+    """The physics of a car, without any drawing or input handling.
+
+    A car only changes when step is called with the controls for a frame, so it can be simulated
+    without a display, an event queue or a clock (and as fast as the CPU allows).
+    """
+
+    def __init__(self, pos, speed, speedlimit, width, length, room, rotation = 0, laps = 10, offroadlimit = None,
+                 swept = False):
+        """Create a car.
+
+        pos:        A vector2D object pointing to the upper left corner of the
+                    square the car occupies (whatever its rotation).
+        speed:      A Vector2D object representing the car's velocity.
+        speedlimit: The maximum magnitude allowable for the car's velocity.
+        width:      The width of the car (must be less than length).
+        length:     The length of the car (and dimension of its square).
+        room:       A rectangle that is supposed to contain the car.
+        rotation:   The direction the car is pointing in degrees. 0 means right,
+                    and positive numbers signifies clockwise rotation.
+        laps:       The number of laps in the race.
+        offroadlimit: The speed limit when the car is off-road. Same as speedlimit if not given.
+        swept:      If True, collisions are found along the car's movement (see sweep), so that fast cars
+                    can't pass through walls, obstacles or checkpoints. Otherwise they are found where the car is.
+        """
+
+        if(width >= length):
+            print("The supercar must have a height(length) greater than its width.")
+        Rectangle.__init__(self, length, length, None, pos.x, pos.y)
+
+        self._width = width
+        self._velocity = speed
+        self._maxSpeed = speedlimit
+        self._offroadSpeed = speedlimit if offroadlimit is None else offroadlimit
+        self._offroad = False       #True if the center of the car was off-road at the start of the latest frame
+        self._swept = swept
+        self._path = None           #Position before the latest movement (swept mode only)
+        self._setRoom(room)
+        self._rotation = rotation
+        self._noRotation = rotation     #To keep track of the initial rotation
+
+        self._running = False       #Wait for the player to start moving before starting the clock
+        self._laps = laps           #Laps to go
+        self._lastCP = -1           #Index of latest checkpoint
+        self._frames = 0            #Number of frames for this lap
+        self._fastestLap = 0        #Fastest lap time
+        self._latestLap = 0         #Latest lap time
+        self._totalLap = 0          #Total lap time
+
+    def getFastestLap(self):
+        """Getter for _fastestLap."""
+        return self._fastestLap
+
+    def getLatestLap(self):
+        """Getter for _latestLap."""
+        return self._latestLap
+
+    def getTotalLap(self):
+        """Getter for _totalLap."""
+        return self._totalLap
+
+    def isOffroad(self):
+        """Getter for _offroad."""
+        return self._offroad
+
+    def _setRoom(self, room):
+        """Set the car's _room attribute. Should only be called from __init__.
+
+        room: A rectangle object that represents a room the car should be contained in.
+
+        Raises a TypeError if the argument is not a Rectangle.
+        """
+
+        if not isinstance(room, Rectangle):
+            raise TypeError("Argument error. room must be an object of the Rectangle class.")
+        else:
+            self._room = room
+
+    def _crosses(self, line, path):
+        """Tests if the car touches a line, or if its center has crossed it.
+
+        line: A Line.
+        path: A tuple (x, y) with the position of the car before its latest movement, or None.
+        """
+
+        seg = line.getSegment()
+        if intersect_rectangle_segment(self._pos, self._w, self._h, seg):
+            return True
+        if path is None:
+            return False
+        cx = self._w / 2
+        cy = self._h / 2
+        return intersect_segments(path[0] + cx, path[1] + cy, self._pos.x + cx, self._pos.y + cy, seg)
+
+    def checkpoint(self, points, path = None):
+        """Handles intersection between the car and a checkpoint.
+
+        points: A list of checkpoints that the car must cross in chronological order on every lap.
+        path:   A tuple (x, y) with the position of the car before its latest movement. If given, a checkpoint
+                also counts as crossed if the car's center has passed it during the movement.
+
+        The method keeps the attributes _latestLap, _fastestLap, _totalLap and _laps updated.
+        It resets the attribute _frames when crossing the first checkpoint,
+        and updates _lastCP when crossing any checkpoint.
+        """
+
+        if self._lastCP < 0:
+            if self._crosses(points[0], path):
+                self._lastCP = 0
+                self._totalLap = self._frames
+                self._frames = 0
+        elif self._lastCP == len(points) - 1:
+            if self._crosses(points[0], path):
+                self._laps -= 1
+                self._lastCP = 0
+                self._latestLap = self._frames
+                if self._fastestLap <= 0 or self._latestLap < self._fastestLap:
+                    self._fastestLap = self._latestLap
+                self._totalLap += self._latestLap
+                self._frames = 0
+        else:
+            if self._crosses(points[self._lastCP + 1], path):
+                self._lastCP += 1
+
+        #for i in range(len(points)):
+        #    if intersect_rectangle_segment(self._pos, self._w, self._h, points[i].getSegment()):
+        #        print(str(i))
+
+    def step(self, controls, anglespeed, obstacles, checkpoints, terrain = None):
+        """Advances the car a single frame.
+
+        controls:       A Controls tuple with the input for this frame.
+        anglespeed:     Number of degrees the car turns when turning left or right.
+        obstacles:      A list of obstacles that the car can interact (collide) with, or a GridIndex of them.
+        checkpoints:    A list of lines that the car must cross in chronological order to finish a lap.
+        terrain:        A Terrain telling where the track is off-road. The car is always on the road if not given.
+
+        The clock starts the first time any of the controls is active.
+
+        Returns True if there are more laps to drive. False otherwise.
+        """
+
+        if controls.left or controls.right or controls.thrust:
+            self._running = True    #Make sure that the clock has started
+
+        if self._running:
+            #Handle interaction with other game objects (in swept mode, collisions are handled while moving)
+            path = None
+            if self._swept:
+                path = self._path
+            else:
+                self.bounce(self._room)
+                self.collide(obstacles)
+            self.checkpoint(checkpoints, path)
+            if terrain is not None:
+                self._offroad = terrain.isOffroad(self._pos.x + self._w / 2, self._pos.y + self._h / 2)
+
+            #Update direction and velocity based on the controls
+            if controls.left and controls.right:
+                pass
+            elif controls.left:
+                self._rotation -= anglespeed
+            elif controls.right:
+                self._rotation += anglespeed
+
+            if controls.thrust:
+                #Same as adding self.heading(), but without making a new vector
+                angle = self._rotation * math.pi / 180
+                self._velocity.x += math.cos(angle)
+                self._velocity.y += math.sin(angle)
+
+            #Limit the velocity and move the car
+            self.limit_velocity()
+            if self._swept:
+                self._path = (self._pos.x, self._pos.y)
+                self.sweep(obstacles)
+            else:
+                self.move()
+            self._frames += 1
+
+        if self._laps <= 0:
+            return False
+        else:
+            return True
+
+    def heading(self):
+        """Determines the direction the car is pointing.
+
+        Returns a Vector2D object representing a unit vector in that direction.
+        """
+
+        return (Vector2D(math.cos(self._rotation * math.pi / 180),
+                         math.sin(self._rotation * math.pi / 180)))
+
+    def limit_velocity(self):
+        """Limits the velocity of the car based on its _maxSpeed (or _offroadSpeed when off-road)."""
+
+        limit = self._offroadSpeed if self._offroad else self._maxSpeed
+        speed_sq = self._velocity.magnitude_squared()
+        if speed_sq > limit * limit:
+            self._velocity *= limit / math.sqrt(speed_sq)
+
+    def collide(self, obstacles):
+        """Changes the velocity of the car when hitting an obstacle.
+
+        obstacles: The list of obstacles that the car can collide with, or a GridIndex of them.
+                   With an index, only the obstacles near the car are tested.
+
+        The method handles circular and rectangular obstacles.
+        It is advised to avoid obstacles close to each other or to the borders of _room,
+        since hitting multiple objects between two updates is not taken into consideration by the method.
+        Additionally, the change in velocity is not very scientific (assumes a head-on elastic collision).
+        """
+
+        #Corners of the car relative to its position (upper left, upper right, bottom left, bottom right)
+        w = self._w
+        h = self._h
+        corners = ((0, 0), (w, 0), (0, h), (w, h))
+        reach = math.sqrt(w * w + h * h) / 2    #Distance from the car's center to its corners
+
+        if isinstance(obstacles, GridIndex):
+            #A collision moves the car back by its velocity, so the area around the car must include that
+            vx = abs(self._velocity.x)
+            vy = abs(self._velocity.y)
+            obstacles = obstacles.query(self._pos.x - vx, self._pos.y - vy, w + 2 * vx, h + 2 * vy)
+
+        for thing in obstacles:
+            if isinstance(thing, Circle):
+                #Position of the obstacle relative to the car. Squared distances are compared to avoid making vectors.
+                dx = thing._pos.x - self._pos.x
+                dy = thing._pos.y - self._pos.y
+                r = thing._radius
+
+                #Test if intersection is possible
+                if (dx - w / 2) ** 2 + (dy - h / 2) ** 2 < (r + reach) ** 2:
+                    #Check each corner for intersection
+                    for cx, cy in corners:
+                        if (dx - cx) ** 2 + (dy - cy) ** 2 < r * r:
+                            self._pos -= self._velocity
+                            self._velocity *= -1
+                            break
+            elif isinstance(thing, Rectangle):
+                if intersect_rectangles(self._pos, w, h, thing._pos, thing._w, thing._h):
+                    self._pos -= self._velocity
+                    self._velocity *= -1
+
+    def _impact(self, obstacles, dx, dy):
+        """Finds the first thing the car hits when moving (the walls of the room or an obstacle).
+
+        obstacles:  The obstacles that the car can collide with (a list or a GridIndex).
+        dx, dy:     The movement.
+
+        Returns a tuple (t, nx, ny) with the time of impact (0-1) and the normal at the point of contact,
+        or None if the car can move freely.
+        """
+
+        x = self._pos.x
+        y = self._pos.y
+        w = self._w
+        h = self._h
+        first = None
+
+        #The walls of the room (the car is supposed to be inside it)
+        room = self._room
+        if dx > 0 and x + w + dx >= room._pos.x + room._w:
+            first = (max((room._pos.x + room._w - (x + w)) / dx, 0.0), -1.0, 0.0)
+        elif dx < 0 and x + dx <= room._pos.x:
+            first = (max((room._pos.x - x) / dx, 0.0), 1.0, 0.0)
+        if dy > 0 and y + h + dy >= room._pos.y + room._h:
+            hit = (max((room._pos.y + room._h - (y + h)) / dy, 0.0), 0.0, -1.0)
+            if first is None or hit[0] < first[0]:
+                first = hit
+        elif dy < 0 and y + dy <= room._pos.y:
+            hit = (max((room._pos.y - y) / dy, 0.0), 0.0, 1.0)
+            if first is None or hit[0] < first[0]:
+                first = hit
+
+        if isinstance(obstacles, GridIndex):
+            obstacles = obstacles.query(x + min(dx, 0), y + min(dy, 0), w + abs(dx), h + abs(dy))
+
+        for thing in obstacles:
+            if isinstance(thing, Circle):
+                hit = sweep_rectangle_circle(x, y, w, h, dx, dy, thing._pos.x, thing._pos.y, thing._radius)
+            elif isinstance(thing, Rectangle):
+                hit = sweep_rectangles(x, y, w, h, dx, dy, thing._pos.x, thing._pos.y, thing._w, thing._h)
+            else:
+                continue
+            if hit is not None and (first is None or hit[0] < first[0]):
+                first = hit
+
+        return first
+
+    def sweep(self, obstacles, bounces = 3):
+        """Moves the car by its velocity, bouncing off whatever it hits on the way (continuous collision detection).
+
+        obstacles:  The obstacles that the car can collide with (a list or a GridIndex).
+        bounces:    The maximum number of bounces during the movement. The car stops at the last one.
+
+        Unlike collide and bounce, nothing is missed however fast the car moves. The car is moved to the point
+        of impact, its velocity is reflected about the normal there, and it moves on for the rest of the frame.
+        """
+
+        remaining = 1.0
+        v = self._velocity
+
+        for i in range(bounces + 1):
+            dx = v.x * remaining
+            dy = v.y * remaining
+            hit = self._impact(obstacles, dx, dy)
+            if hit is None:
+                self._pos.x += dx
+                self._pos.y += dy
+                return
+
+            t, nx, ny = hit
+            self._pos.x += dx * t
+            self._pos.y += dy * t
+            dot = v.x * nx + v.y * ny
+            if dot < 0:
+                v.x -= 2 * dot * nx
+                v.y -= 2 * dot * ny
+            remaining *= 1 - t
+
@@ -25,12 +25,14 @@ function.
 
 """
 
-import pygame
 import math
 
 
 class Vector2D(object):
     """ Implements a two dimensional vector. """
+
+    __slots__ = ('x', 'y')
+
     def __init__(self, x, y):
         self.x = x
         self.y = y
@@ -42,14 +44,26 @@ class Vector2D(object):
         """ Addition. Returns a new vector. """
         return Vector2D(self.x + b.x, self.y + b.y)
 
+    def __iadd__(self, b):
+        """ In-place addition. Changes and returns this vector. """
+        self.x += b.x
+        self.y += b.y
+        return self
+
     def __sub__(self, b):
         """ Subtraction. Returns a new vector. """
         return Vector2D(self.x - b.x, self.y - b.y)
 
+    def __isub__(self, b):
+        """ In-place subtraction. Changes and returns this vector. """
+        self.x -= b.x
+        self.y -= b.y
+        return self
+
     def __mul__(self, b):
         """ Multiplication by a scalar
         
-        Note that the scalar must be to the right.
+        The scalar can be to the right or (through __rmul__) to the left.
         
         """
         try:
@@ -59,10 +73,33 @@ class Vector2D(object):
             print("Oops! Right value must be a float")
             raise
 
+    __rmul__ = __mul__
+
+    def __imul__(self, b):
+        """ In-place multiplication by a scalar. Changes and returns this vector. """
+        try:
+            b = float(b)
+        except ValueError:
+            print("Oops! Right value must be a float")
+            raise
+        self.x *= b
+        self.y *= b
+        return self
+
     def magnitude(self):
         """ Returns the magnitude of the vector. """
         return math.sqrt(self.x ** 2 + self.y ** 2)
 
+    def magnitude_squared(self):
+        """ Returns the squared magnitude of the vector (avoids the square root). """
+        return self.x * self.x + self.y * self.y
+
+    def dist_sq_to(self, b):
+        """ Returns the squared distance between this vector and b, without making a new vector. """
+        dx = self.x - b.x
+        dy = self.y - b.y
+        return dx * dx + dy * dy
+
     def normalized(self):
         """ Returns a new vector with the same direction but magnitude 1. """
         try:
@@ -142,11 +179,10 @@ def intersect_circles(a_pos, a_radius, b_pos, b_radius):
     Vector2D pointing from circle A to circle B.
     
     """
-    # vector from A to B 
-    dp1p2 = b_pos - a_pos
-    
-    if a_radius + b_radius >= dp1p2.magnitude():
-        return dp1p2.normalized()
+    # compare squared distances, so that no vector is made unless the circles intersect
+    if (a_radius + b_radius) ** 2 >= a_pos.dist_sq_to(b_pos):
+        # vector from A to B 
+        return (b_pos - a_pos).normalized()
     else:
         return False
 
@@ -283,15 +319,289 @@ def intersect_rectangle_line(rec_pos, sx, sy, l_pos, l_len, l_angle):
             else:
                 return True
         else:
-            if(rec_pos.x >= l_pos.x + dy_top / math.tan(l.angle) or
+            if(rec_pos.x >= l_pos.x + dy_top / math.tan(l_angle) or
                rec_pos.x + sx <= l_pos.x + dy_bottom / math.tan(l_angle)):
                 return False
             else:
                 return True
 
+class Segment(object):
+    """ A line segment with precomputed geometry, for fast intersection tests.
+
+    Made once from the position, length and angle of a line (see compile_line),
+    so that the trigonometry doesn't have to be repeated for every test.
+
+    """
+
+    __slots__ = ('x0', 'y0', 'x1', 'y1', 'dx', 'dy', 'nx', 'ny', 'left', 'top', 'right', 'bottom')
+
+    def __init__(self, x0, y0, x1, y1):
+        self.x0 = x0    # start point
+        self.y0 = y0
+        self.x1 = x1    # end point
+        self.y1 = y1
+        self.dx = x1 - x0   # direction (not normalized)
+        self.dy = y1 - y0
+        length = math.sqrt(self.dx ** 2 + self.dy ** 2)
+        self.nx = -self.dy / length if length else 0.0  # unit normal
+        self.ny = self.dx / length if length else 0.0
+        self.left = min(x0, x1)     # bounding box
+        self.top = min(y0, y1)
+        self.right = max(x0, x1)
+        self.bottom = max(y0, y1)
+
+    def __repr__(self):
+        return "Segment(%s, %s, %s, %s)" % (self.x0, self.y0, self.x1, self.y1)
+
+
+def compile_line(l_pos, l_len, l_angle):
+    """ Makes a Segment from a line.
+
+    Parameters:
+    l_pos   - A Vector2D representing the position of the line's start point.
+    l_len   - Length of the line.
+    l_angle - Clockwise angle of the line relative to positive x (in radians).
+
+    Returns:
+    The Segment. Directions that are (almost) parallel to an axis are made exactly parallel,
+    so that lines at multiples of pi / 2 behave like in intersect_rectangle_line.
+
+    """
+    cos = math.cos(l_angle)
+    sin = math.sin(l_angle)
+    if abs(cos) < 1e-12:
+        cos = 0.0
+    if abs(sin) < 1e-12:
+        sin = 0.0
+    return Segment(l_pos.x, l_pos.y, l_pos.x + cos * l_len, l_pos.y + sin * l_len)
+
+
+def intersect_rectangle_segment(rec_pos, sx, sy, seg):
+    """ Determines if the rectangle intersects a line segment.
+
+    Same result as intersect_rectangle_line, but uses a precomputed Segment and works for
+    any angle (clips the segment against the rectangle, Liang-Barsky style).
+    A segment that only touches the rectangle's border does not intersect it.
+
+    Parameters:
+    rec_pos - A Vector2D representing the position of the rectangles upper,
+              left corner.
+    sx      - Width of the rectangle.
+    sy      - Height of the rectangle.
+    seg     - A Segment.
+
+    Returns:
+    True if the rectangle intersects the segment. False otherwise.
+
+    """
+    left = rec_pos.x
+    top = rec_pos.y
+    right = left + sx
+    bottom = top + sy
+
+    # Bounding boxes must overlap
+    if right <= seg.left or left >= seg.right or bottom <= seg.top or top >= seg.bottom:
+        return False
+
+    # Clip the segment's parameter range [t0, t1] against each side of the rectangle
+    t0 = 0.0
+    t1 = 1.0
+    for p, q in ((-seg.dx, seg.x0 - left), (seg.dx, right - seg.x0),
+                 (-seg.dy, seg.y0 - top), (seg.dy, bottom - seg.y0)):
+        if p == 0:
+            if q <= 0:
+                return False    # parallel to this side, and not strictly inside it
+        elif p < 0:
+            t = q / p
+            if t > t0:
+                t0 = t
+        else:
+            t = q / p
+            if t < t1:
+                t1 = t
+        if t0 >= t1:
+            return False
+    return True
+
+
+def intersect_segments(ax, ay, bx, by, seg):
+    """ Determines if the line segment from a to b crosses a Segment.
+
+    Parameters:
+    ax, ay  - Start point of the first segment.
+    bx, by  - End point of the first segment.
+    seg     - A Segment.
+
+    Returns:
+    True if the segments intersect (touching counts). False otherwise.
+
+    """
+    ex = bx - ax
+    ey = by - ay
+    denom = ex * seg.dy - ey * seg.dx
+    if denom == 0:
+        return False    # parallel
+    # Parameters of the intersection point along each segment
+    fx = seg.x0 - ax
+    fy = seg.y0 - ay
+    t = (fx * seg.dy - fy * seg.dx) / denom
+    u = (fx * ey - fy * ex) / denom
+    return 0 <= t <= 1 and 0 <= u <= 1
+
+
+def _slabs(lo_x, lo_y, hi_x, hi_y, ox, oy, dx, dy):
+    """ Finds where a point moving from (ox, oy) by (dx, dy) enters and leaves a box.
+
+    Returns:
+    A tuple (entry, exit, axis) with the times (0-1 covers the movement) and the axis (0 for x, 1 for y)
+    of the side that was entered last, or None if the point never is inside the box.
+
+    """
+    entry = -float('inf')
+    leave = float('inf')
+    axis = 0
+    for i, (o, d, lo, hi) in enumerate(((ox, dx, lo_x, hi_x), (oy, dy, lo_y, hi_y))):
+        if d == 0:
+            if o <= lo or o >= hi:
+                return None
+        else:
+            t0 = (lo - o) / d
+            t1 = (hi - o) / d
+            if t0 > t1:
+                t0, t1 = t1, t0
+            if t0 > entry:
+                entry = t0
+                axis = i
+            if t1 < leave:
+                leave = t1
+    if entry >= leave:
+        return None
+    return entry, leave, axis
+
+
+def sweep_rectangles(a_x, a_y, a_w, a_h, dx, dy, b_x, b_y, b_w, b_h):
+    """ Finds when a moving rectangle hits a resting one (swept AABB).
+
+    Parameters:
+    a_x, a_y    - The moving rectangle's upper left corner at the start of the movement.
+    a_w, a_h    - Width and height of the moving rectangle.
+    dx, dy      - The movement.
+    b_x, b_y    - The resting rectangle's upper left corner.
+    b_w, b_h    - Width and height of the resting rectangle.
+
+    Returns:
+    None if the rectangles don't meet during the movement (or overlap from the start).
+    Otherwise a tuple (t, nx, ny) with the time of impact (0-1) and the normal of the
+    side that was hit (pointing towards the moving rectangle).
+
+    """
+    # The moving rectangle's upper left corner hits the resting rectangle grown by the moving one's size
+    hit = _slabs(b_x - a_w, b_y - a_h, b_x + b_w, b_y + b_h, a_x, a_y, dx, dy)
+    if hit is None or hit[0] < 0 or hit[0] > 1:
+        return None
+    if hit[2] == 0:
+        return hit[0], (-1.0 if dx > 0 else 1.0), 0.0
+    return hit[0], 0.0, (-1.0 if dy > 0 else 1.0)
+
+
+def sweep_rectangle_circle(rec_x, rec_y, sx, sy, dx, dy, circle_x, circle_y, radius):
+    """ Finds when a moving rectangle hits a resting circle (swept AABB against a circle).
+
+    The circle is moved the opposite way against the rectangle grown by the radius (with rounded corners).
+
+    Parameters:
+    rec_x, rec_y    - The rectangle's upper left corner at the start of the movement.
+    sx, sy          - Width and height of the rectangle.
+    dx, dy          - The movement.
+    circle_x, circle_y - The circle's center.
+    radius          - The circle's radius.
+
+    Returns:
+    None if they don't meet during the movement (or overlap from the start).
+    Otherwise a tuple (t, nx, ny) with the time of impact (0-1) and the unit normal
+    at the point of contact (pointing from the circle towards the rectangle).
+
+    """
+    left = rec_x
+    top = rec_y
+    right = rec_x + sx
+    bottom = rec_y + sy
+    hit = _slabs(left - radius, top - radius, right + radius, bottom + radius, circle_x, circle_y, -dx, -dy)
+    if hit is None or hit[0] > 1:
+        return None
+    t = max(hit[0], 0.0)
+    px = circle_x - dx * t
+    py = circle_y - dy * t
+
+    # Is the circle's center next to a corner of the rectangle (rather than a side) when entering?
+    corner_x = left if px < left else (right if px > right else None)
+    corner_y = top if py < top else (bottom if py > bottom else None)
+    if corner_x is None or corner_y is None:
+        if hit[0] < 0:
+            return None     # overlapping from the start
+        if hit[2] == 0:
+            return t, (1.0 if px < left else -1.0), 0.0
+        return t, 0.0, (1.0 if py < top else -1.0)
+
+    # Moving circle center against a circle of the same radius around the corner
+    fx = circle_x - corner_x
+    fy = circle_y - corner_y
+    c = fx * fx + fy * fy - radius * radius
+    if c < 0:
+        return None     # overlapping from the start
+    a = dx * dx + dy * dy
+    b = -2 * (fx * dx + fy * dy)
+    disc = b * b - 4 * a * c
+    if a == 0 or disc < 0:
+        return None
+    t = (-b - math.sqrt(disc)) / (2 * a)
+    if t < 0 or t > 1:
+        return None
+    return t, (corner_x - (circle_x - dx * t)) / radius, (corner_y - (circle_y - dy * t)) / radius
+
+
+def intersect_oriented_rectangles(a_x, a_y, a_l, a_w, a_angle, b_x, b_y, b_l, b_w, b_angle):
+    """ Determines if two rotated rectangles intersect (separating axis test).
+
+    Parameters:
+    a_x, a_y    - Center of rectangle a.
+    a_l, a_w    - Length (along its direction) and width of rectangle a.
+    a_angle     - Direction of rectangle a (clockwise angle relative to positive x, in radians).
+    b_x, b_y, b_l, b_w, b_angle - The same for rectangle b.
+
+    Returns:
+    False if no intersection. If the rectangles intersect, returns a tuple (depth, nx, ny)
+    with the smallest distance that separates them and the direction (a unit vector
+    pointing from a towards b) to move b in to separate them.
+
+    """
+    a_cos = math.cos(a_angle)
+    a_sin = math.sin(a_angle)
+    b_cos = math.cos(b_angle)
+    b_sin = math.sin(b_angle)
+    dx = b_x - a_x
+    dy = b_y - a_y
+
+    best = None
+    # The axes are the directions of the rectangles' sides
+    for nx, ny in ((a_cos, a_sin), (-a_sin, a_cos), (b_cos, b_sin), (-b_sin, b_cos)):
+        # Half the extent of each rectangle along the axis, and the distance between their centers
+        a_r = (abs(a_l * (a_cos * nx + a_sin * ny)) + abs(a_w * (-a_sin * nx + a_cos * ny))) / 2
+        b_r = (abs(b_l * (b_cos * nx + b_sin * ny)) + abs(b_w * (-b_sin * nx + b_cos * ny))) / 2
+        d = dx * nx + dy * ny
+        depth = a_r + b_r - abs(d)
+        if depth <= 0:
+            return False    # found a separating axis
+        if best is None or depth < best[0]:
+            best = (depth, nx, ny) if d >= 0 else (depth, -nx, -ny)
+    return best
+
+
 def example_code():
     """ Example showing the use of the above code. """
-    
+
+    import pygame   # only the example draws anything, so the rest works without pygame
+
     screen_res = (640,480)
     pygame.init()
 
@@ -0,0 +1,151 @@
+"""Frame time instrumentation.
+
+The game loop is divided into stages (input, physics, drawing, waiting for the clock and so on).
+The time spent in each stage is recorded for every frame, so that rolling percentiles can be shown
+while playing, and the frame times of a whole race can be saved for later analysis.
+"""
+
+#Imports
+
+##External
+import pygame, json, csv, math
+from time import perf_counter
+from collections import deque
+from array import array
+
+TOTAL = 'frame'     #Name of the series holding the total time of each frame
+PERCENTILES = (50, 95, 99)
+
+def percentile(values, p):
+    """Finds a percentile (nearest rank) of some values.
+
+    values: A sorted sequence of numbers.
+    p:      The percentile (0-100).
+
+    Returns the percentile, or 0 if there are no values.
+    """
+
+    if not values:
+        return 0.0
+    rank = int(math.ceil(p / 100.0 * len(values)))
+    return values[min(max(rank, 1), len(values)) - 1]
+
+class FrameProfiler(object):
+    """Records the time spent in each stage of every frame.
+
+    The time between two calls to mark is counted towards the stage given to the latter,
+    so the stages of a frame add up to the whole frame.
+    """
+
+    def __init__(self, stages, window = 120):
+        """Create a profiler.
+
+        stages: The names of the stages of a frame, in the order they happen.
+        window: The number of recent frames the rolling percentiles are based on.
+        """
+
+        self._stages = tuple(stages)
+        self._series = self._stages + (TOTAL,)
+        self._index = dict((name, i) for i, name in enumerate(self._stages))
+        self._recent = [deque(maxlen = window) for name in self._series]  #Seconds per frame, latest frames only
+        self._history = [array('d') for name in self._series]             #Seconds per frame, all frames
+        self._current = [0.0] * len(self._stages)
+        self._start = None      #When the current frame started
+        self._last = None       #When the latest stage ended
+
+    def __len__(self):
+        return len(self._history[-1])
+
+    def getStages(self):
+        """Getter for _stages."""
+        return self._stages
+
+    def startFrame(self):
+        """Starts timing a new frame."""
+
+        self._current = [0.0] * len(self._stages)
+        self._start = self._last = perf_counter()
+
+    def mark(self, stage):
+        """Ends a stage of the current frame.
+
+        stage: The name of the stage (one of the stages given when the profiler was made).
+        """
+
+        now = perf_counter()
+        self._current[self._index[stage]] += now - self._last
+        self._last = now
+
+    def endFrame(self):
+        """Stores the times of the current frame. Time since the latest mark is not counted towards any stage."""
+
+        for i, seconds in enumerate(self._current + [self._last - self._start]):
+            self._recent[i].append(seconds)
+            self._history[i].append(seconds)
+
+    def percentiles(self, stage, recent = True):
+        """Finds the percentiles (see PERCENTILES) of a stage's times.
+
+        stage:  The name of the stage, or TOTAL for whole frames.
+        recent: If True, only the latest frames (the window) are used. Otherwise all the frames are used.
+
+        Returns a tuple of times in seconds.
+        """
+
+        i = self._series.index(stage)
+        values = sorted(self._recent[i] if recent else self._history[i])
+        return tuple(percentile(values, p) for p in PERCENTILES)
+
+    def render(self, font, color, bgcolor):
+        """Makes a table of the rolling percentiles of each stage (in milliseconds).
+
+        font:       The font to write with.
+        color:      The color of the text.
+        bgcolor:    The color of the table's background.
+
+        Returns a pygame Surface with the table.
+        """
+
+        rows = [('stage',) + tuple('p%d' % p for p in PERCENTILES)]
+        for name in self._series:
+            rows.append((name,) + tuple('%.2f' % (t * 1000) for t in self.percentiles(name)))
+
+        #Align the columns (the text of each cell is rendered separately)
+        cells = [[font.render(text, True, color) for text in row] for row in rows]
+        widths = [max(cell.get_width() for cell in column) + 10 for column in zip(*cells)]
+        height = font.get_linesize()
+
+        table = pygame.Surface((sum(widths) + 10, height * len(rows) + 10))
+        table.fill(bgcolor)
+        y = 5
+        for row in cells:
+            x = 5
+            for cell, width in zip(row, widths):
+                table.blit(cell, (x, y))
+                x += width
+            y += height
+
+        return table
+
+    def dump(self, path):
+        """Saves the times of all the frames so far. The format depends on the extension of the path.
+
+        path: The path of the file. If it ends with .csv, there is a row of times (in milliseconds) per frame.
+              Otherwise the file is JSON, with the percentiles of each stage and the times of every frame.
+        """
+
+        if path.endswith('.csv'):
+            with open(path, 'w', newline = '') as f:
+                writer = csv.writer(f)
+                writer.writerow(self._series)
+                for times in zip(*self._history):
+                    writer.writerow(['%.4f' % (t * 1000) for t in times])
+        else:
+            summary = dict()
+            for name in self._series:
+                summary[name] = dict(('p%d' % p, t * 1000) for p, t in
+                                     zip(PERCENTILES, self.percentiles(name, recent = False)))
+            frames = dict((name, [round(t * 1000, 4) for t in times])
+                          for name, times in zip(self._series, self._history))
+            with open(path, 'w') as f:
+                json.dump({'frames': len(self), 'unit': 'ms', 'percentiles': summary, 'times': frames}, f)
@@ -0,0 +1,181 @@
+"""Compact recording and playback of races.
+
+A replay holds the controls of every frame of a race, packed into a single byte per frame,
+after a header with the settings that affect the physics. Since the physics are deterministic,
+that is enough to reproduce the race exactly, and a race of 10 laps takes a few kilobytes.
+"""
+
+#Imports
+
+##External
+import struct, time
+
+##Classes and global constants
+from physics import UNPACKED, LEFT, RIGHT, THRUST
+from track import loadTrack, trackPath
+from training import opponentSettings
+from config import *
+
+MAGIC = b'SCRP'     #Identifies a replay file
+VERSION = 5
+
+#magic, version, track name, speed limit, off-road speed limit, swept collisions (0 or 1), rotation step, fps,
+#car width, car length, car rotation, start position (x, y), laps, the opponents' settings (see settings)
+#and number of frames
+HEADER = struct.Struct('<4sH32s20dI')
+
+def settings(track):
+    """Returns a tuple with the current settings that a replay depends on.
+
+    track: The Track the race is driven on.
+    """
+
+    x, y, rotation = track.getStart()
+    race = (track.getName(), float(SPEEDLIMIT), float(OFFROAD_SPEEDLIMIT), float(SWEPT_COLLISION), float(ROTATION_STEP),
+            float(FPS), float(WIDTH), float(LENGTH), float(rotation), float(x), float(y), float(LAPS))
+
+    #The opponents only affect the race if the cars can collide
+    opponents = (0.0,) * 9
+    if CAR_COLLISIONS and OPPONENTS:
+        pilot = opponentSettings(track)
+        deadband = ROTATION_STEP / 2.0 if pilot['deadband'] is None else pilot['deadband']
+        cornerspeed = 0.0 if pilot['cornerspeed'] is None else pilot['cornerspeed']     #0 for no limit
+        opponents = (float(OPPONENTS), float(GRID_LANES), float(GRID_SPACING), float(AI_CELL), float(AI_CLEARANCE),
+                     float(AI_LOOKAHEAD), float(pilot['thrustangle']), float(deadband), float(cornerspeed))
+
+    return race + opponents
+
+class Recorder(object):
+    """Records the controls of a race, one byte per frame.
+
+    The bytes are written into a preallocated buffer (which doubles in size when full),
+    so recording a frame only stores a byte (nothing is appended, and no objects are kept per frame).
+    """
+
+    def __init__(self, track, capacity = FPS * 60 * 10):
+        """Create a recorder.
+
+        track:      The Track the race is driven on (its name must be at most 32 bytes when encoded).
+        capacity:   The number of frames to make room for in advance.
+        """
+
+        self._settings = settings(track)
+        self._buffer = bytearray(capacity)
+        self._frames = 0
+
+    def __len__(self):
+        return self._frames
+
+    def record(self, controls):
+        """Records the controls of a frame.
+
+        controls: A Controls tuple.
+        """
+
+        if self._frames == len(self._buffer):
+            self._buffer.extend(bytes(len(self._buffer)))
+        self._buffer[self._frames] = controls.left * LEFT | controls.right * RIGHT | controls.thrust * THRUST
+        self._frames += 1
+
+    def getInputs(self):
+        """Returns the recorded frames as bytes (one packed control byte per frame)."""
+        return bytes(self._buffer[:self._frames])
+
+    def save(self, path):
+        """Writes the replay to a file.
+
+        path: The path of the file.
+        """
+
+        track = self._settings[0].encode('utf-8')
+        with open(path, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, VERSION, track, *(self._settings[1:] + (self._frames,))))
+            f.write(memoryview(self._buffer)[:self._frames])
+
+class Replay(object):
+    """A recorded race, loaded from a file."""
+
+    def __init__(self, path, track = None):
+        """Load a replay.
+
+        path:   The path of the file.
+        track:  The Track the replay is checked against. The track named in the replay is loaded if not given.
+
+        Raises a ValueError if the file isn't a replay, or was recorded with different settings
+        than the current ones (it would not reproduce the race).
+        """
+
+        with open(path, 'rb') as f:
+            data = f.read()
+
+        if len(data) < HEADER.size:
+            raise ValueError("The file is too short to be a replay.")
+        fields = HEADER.unpack_from(data)
+        if fields[0] != MAGIC or fields[1] != VERSION:
+            raise ValueError("The file is not a supported replay.")
+
+        self._track = fields[2].rstrip(b'\0').decode('utf-8')
+        frames = fields[-1]
+        if track is None:
+            track = loadTrack(trackPath(self._track))
+        if settings(track) != (self._track,) + fields[3:-1]:
+            raise ValueError("The replay was recorded with different settings.")
+
+        self._inputs = data[HEADER.size:HEADER.size + frames]
+        if len(self._inputs) != frames:
+            raise ValueError("The replay is truncated.")
+
+    def __len__(self):
+        return len(self._inputs)
+
+    def getTrack(self):
+        """Getter for _track."""
+        return self._track
+
+    def getInputs(self):
+        """Getter for _inputs (bytes with one packed control byte per frame)."""
+        return self._inputs
+
+    def controls(self):
+        """Returns an iterator over the Controls tuple of each frame."""
+
+        return (UNPACKED[b] for b in self._inputs)
+
+    def play(self, car, obstacles, checkpoints, terrain = None, realtime = False):
+        """Drives a car through the replay.
+
+        car:            The car to drive (e.g. made by evaluate.makeCar).
+        obstacles:      The obstacles of the track (a list or a GridIndex, e.g. from Track.getObstacleIndex).
+        checkpoints:    The checkpoints of the track.
+        terrain:        The Terrain of the track (see Track.getTerrain).
+        realtime:       If True, the frames are played at FPS frames per second.
+                        Otherwise they are played as fast as possible.
+
+        Returns True if the car has more laps to drive at the end of the replay. False otherwise.
+        """
+
+        running = True
+        delay = 1.0 / FPS
+        deadline = time.perf_counter()
+
+        for controls in self.controls():
+            running = car.step(controls, ROTATION_STEP, obstacles, checkpoints, terrain)
+            if not running:
+                break
+            if realtime:
+                deadline += delay
+                wait = deadline - time.perf_counter()
+                if wait > 0:
+                    time.sleep(wait)
+
+        return running
+
+if __name__ == '__main__':
+    #python replay.py <replay file> prints the lap times of a replay (played as fast as possible)
+    import sys
+    from evaluate import evaluate, LapTimes
+    from library import framesToSec
+
+    times = evaluate(Replay(sys.argv[1]).getInputs())
+    for name, frames in zip(LapTimes._fields, times):
+        print("%-8s %6d frames (%.2f s)" % (name + ':', frames, framesToSec(frames, FPS)))
@@ -0,0 +1,165 @@
+"""Distance sensors for the cars, cast over an occupancy grid.
+
+The obstacles (and, optionally, the grass) of a track are rasterized once into a grid of blocked cells
+when the grid is first asked for, and cached with the compiled track. A sensor reading is then found by marching
+along a ray and looking up the cells it passes, instead of intersecting the ray with every circle, rectangle and
+wall. The rays of all the cars are marched at once with numpy, so a single call gives every reading of a frame.
+
+This module requires NumPy. The rest of the game only imports it when the sensors are used (see Track.getOccupancy).
+"""
+
+#Imports
+
+##External
+import math
+import numpy as np
+
+##Classes and global constants
+from shapes import *
+
+class Occupancy(object):
+    """A grid telling which cells of a track are blocked. Everything outside the grid counts as blocked."""
+
+    def __init__(self, cellsize, blocked):
+        """Create an occupancy grid (see makeOccupancy).
+
+        cellsize:   The width and height of a cell, in pixels.
+        blocked:    A numpy array of booleans with a row of cells for every row of the grid.
+        """
+
+        self._cellsize = cellsize
+        self._blocked = blocked
+
+    def getCellSize(self):
+        """Getter for _cellsize."""
+        return self._cellsize
+
+    def getBlocked(self):
+        """Getter for _blocked."""
+        return self._blocked
+
+    def isBlocked(self, x, y):
+        """Looks up a point of the track.
+
+        x, y: The coordinates of the point.
+
+        Returns True if the point is in a blocked cell (or outside the grid). False otherwise.
+        """
+
+        rows, cols = self._blocked.shape
+        col = int(x // self._cellsize)
+        row = int(y // self._cellsize)
+        if col < 0 or row < 0 or col >= cols or row >= rows:
+            return True
+        return bool(self._blocked[row, col])
+
+    def cast(self, xs, ys, angles, reach, step = None):
+        """Measures the free distance along a number of rays from each of a number of points.
+
+        xs, ys: Sequences with the coordinates of M points (e.g. the centers of the cars).
+        angles: The directions of the rays in degrees (0 means right, clockwise is positive). Either N angles
+                shared by all the points, or an M x N array with the angles of each point's rays.
+        reach:  The longest distance measured. Rays that don't hit anything within it give reach.
+        step:   The distance between the points looked up along a ray. Half a cell if not given.
+                The distances are accurate to within a step.
+
+        Returns an M x N numpy array with the distance to the first blocked cell along each ray
+        (0 for rays starting in a blocked cell).
+        """
+
+        if step is None:
+            step = self._cellsize / 2.0
+        xs = np.asarray(xs, dtype = float)
+        ys = np.asarray(ys, dtype = float)
+        angles = np.asarray(angles, dtype = float)
+        if angles.ndim == 1:
+            angles = np.broadcast_to(angles, (len(xs), len(angles)))
+        radians = np.radians(angles)
+
+        #Every point looked up along every ray: M x N x K
+        t = np.arange(0.0, reach + step, step)
+        t[-1] = reach
+        px = xs[:, None, None] + np.cos(radians)[:, :, None] * t
+        py = ys[:, None, None] + np.sin(radians)[:, :, None] * t
+
+        rows, cols = self._blocked.shape
+        col = np.floor(px / self._cellsize).astype(np.intp)
+        row = np.floor(py / self._cellsize).astype(np.intp)
+        outside = (col < 0) | (row < 0) | (col >= cols) | (row >= rows)
+        hit = outside | self._blocked[np.clip(row, 0, rows - 1), np.clip(col, 0, cols - 1)]
+
+        #The first hit along each ray (argmax gives the first True, or 0 if there is none)
+        first = hit.argmax(axis = 2)
+        return np.where(hit.any(axis = 2), t[first], reach)
+
+    def sense(self, cars, angles, reach, step = None):
+        """Measures the readings of the sensors of a number of cars (see cast).
+
+        cars:   A list of cars (physics.Car or subclasses). The rays start at their centers.
+        angles: The directions of the sensors in degrees, relative to the direction of the cars.
+        reach:  The longest distance measured.
+        step:   The distance between the points looked up along a ray. Half a cell if not given.
+
+        Returns an array with a row of readings for each car, and a column for each sensor.
+        """
+
+        xs = [car._pos.x + car._w / 2 for car in cars]
+        ys = [car._pos.y + car._h / 2 for car in cars]
+        rotations = np.array([car._rotation for car in cars], dtype = float)
+        return self.cast(xs, ys, rotations[:, None] + np.asarray(angles, dtype = float), reach, step)
+
+def makeOccupancy(size, obstacles, cellsize, terrain = None):
+    """Rasterizes the obstacles of a track into an occupancy grid.
+
+    size:       A tuple with the width and height of the track.
+    obstacles:  A list of the track's obstacles (Circles and Rectangles).
+    cellsize:   The width and height of a cell, in pixels.
+    terrain:    The track's Terrain. If given, the grass is blocked too.
+
+    Returns an Occupancy. A cell is blocked if any part of it is covered by an obstacle, or if most of it is grass.
+    """
+
+    w, h = size
+    cols = int(math.ceil(w / float(cellsize)))
+    rows = int(math.ceil(h / float(cellsize)))
+
+    if terrain is None:
+        blocked = np.zeros((rows, cols), dtype = bool)
+    else:
+        #Pad the bitmap to whole cells (with grass), and block the cells that are mostly grass
+        pixels = np.ones((rows * cellsize, cols * cellsize), dtype = bool)
+        pixels[:h, :w] = np.frombuffer(terrain.getBytes(), dtype = np.uint8).reshape(h, w) != 0
+        blocked = pixels.reshape(rows, cellsize, cols, cellsize).mean(axis = (1, 3)) >= 0.5
+
+    #The edges of the cells
+    lefts = np.arange(cols) * float(cellsize)
+    tops = np.arange(rows) * float(cellsize)
+
+    for thing in obstacles:
+        if isinstance(thing, Circle):
+            #Distance from the center to the nearest point of each cell
+            dx = np.maximum(np.maximum(lefts - thing._pos.x, thing._pos.x - (lefts + cellsize)), 0)
+            dy = np.maximum(np.maximum(tops - thing._pos.y, thing._pos.y - (tops + cellsize)), 0)
+            blocked |= dy[:, None] ** 2 + dx[None, :] ** 2 < thing._radius ** 2
+        elif isinstance(thing, Rectangle):
+            x0 = max(int(thing._pos.x // cellsize), 0)
+            y0 = max(int(thing._pos.y // cellsize), 0)
+            x1 = int(math.ceil((thing._pos.x + thing._w) / float(cellsize)))
+            y1 = int(math.ceil((thing._pos.y + thing._h) / float(cellsize)))
+            blocked[y0:y1, x0:x1] = True
+
+    return Occupancy(cellsize, blocked)
+
+def occupancyFromBytes(cellsize, rows, cols, data):
+    """Makes an Occupancy grid from the bytes of its blocked cells (e.g. read from the track cache).
+
+    cellsize:   The width and height of a cell, in pixels.
+    rows, cols: The size of the grid.
+    data:       One byte per cell, row by row (as given by the tobytes of Occupancy.getBlocked). Nonzero is blocked.
+
+    Returns the Occupancy. Raises a ValueError if data doesn't fit the grid.
+    """
+
+    if len(data) != rows * cols:
+        raise ValueError("The occupancy data doesn't fit the grid.")
+    return Occupancy(cellsize, np.frombuffer(data, dtype = np.uint8).reshape(rows, cols) != 0)
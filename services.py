@@ -0,0 +1,277 @@
+"""Services running beside the game loop, for the work that mustn't hold up a frame (files, network).
+
+When the game loop runs on asyncio (see ASYNC_LOOP), every service is a task of its own. The game hands
+the services its events (e.g. a completed lap) without waiting, and each service works through its queue
+of events while the game loop waits for its next frame.
+
+Run from terminal by typing: python services.py [port]
+to start a Receiver on the local machine, printing whatever the game uploads to it.
+"""
+
+#Imports
+
+##External
+import abc, asyncio, json, os, struct, sys
+from collections import namedtuple
+
+##Classes and global constants
+from config import *
+
+#A lap has been completed.
+#track:     The name of the track.
+#number:    The number of the lap (1 is the first).
+#frames:    The lap time (in ticks).
+#fastest:   The fastest lap time so far.
+#total:     The total time so far.
+Lap = namedtuple('Lap', ['track', 'number', 'frames', 'fastest', 'total'])
+
+#A race is over (or has been quit).
+#track:     The name of the track.
+#replay:    The path of the race's replay file, or None if it wasn't saved.
+#laps:      The number of laps completed.
+#fastest:   The fastest lap time.
+#total:     The total time of the completed laps.
+Finish = namedtuple('Finish', ['track', 'replay', 'laps', 'fastest', 'total'])
+
+#Messages sent by the Uploader: kind and length of the payload, followed by the payload
+MESSAGE = struct.Struct('>4sI')
+LAP = b'LAP '       #The payload is a Lap as JSON
+REPLAY = b'RPL '    #The payload is a replay file
+
+class Service(abc.ABC):
+    """Base class for the services. Handles the game's events one at a time, in the order they happened."""
+
+    def __init__(self):
+        self._queue = None
+        self._task = None
+        self._errors = []       #Events that couldn't be handled, with the exceptions they caused
+
+    def getErrors(self):
+        """Getter for _errors."""
+        return self._errors
+
+    def start(self):
+        """Starts the service's task. Must be called from a running event loop."""
+
+        self._queue = asyncio.Queue()
+        self._task = asyncio.ensure_future(self._run())
+
+    def notify(self, event):
+        """Hands an event to the service, without waiting for it to be handled. Ignored if the service isn't running.
+
+        event: The event (e.g. a Lap).
+        """
+
+        if self._queue is not None:
+            self._queue.put_nowait(event)
+
+    async def stop(self, timeout = None):
+        """Lets the service handle the events it has got so far, and stops it.
+
+        timeout: The longest time (in seconds) to wait. The service is cancelled if it hasn't finished by then.
+        """
+
+        if self._task is None:
+            return
+        self._queue.put_nowait(None)
+        try:
+            await asyncio.wait_for(self._task, timeout)
+        except asyncio.TimeoutError:
+            pass
+        self._queue = None
+        self._task = None
+
+    async def _run(self):
+        """The service's task. A failing event is kept in _errors, and doesn't stop the service."""
+
+        while True:
+            event = await self._queue.get()
+            if event is None:
+                break
+            try:
+                await self.handle(event)
+            except Exception as error:
+                self._errors.append((event, error))
+
+    @abc.abstractmethod
+    async def handle(self, event):
+        """Handles an event. Events the service doesn't care about are to be ignored. Must be implemented by the
+        subclasses.
+
+        event: The event.
+        """
+
+class LapLog(Service):
+    """Appends every completed lap to a file, as a line of JSON."""
+
+    def __init__(self, path):
+        """Create a lap log.
+
+        path: The path of the file.
+        """
+
+        Service.__init__(self)
+        self._path = path
+
+    def _write(self, line):
+        """Appends a line to the file (blocks, so it is run on a worker thread)."""
+
+        folder = os.path.dirname(self._path)
+        if folder and not os.path.isdir(folder):
+            os.makedirs(folder)
+        with open(self._path, 'a') as f:
+            f.write(line + '\n')
+
+    async def handle(self, event):
+        if isinstance(event, Lap):
+            line = json.dumps(event._asdict(), sort_keys = True)
+            await asyncio.get_running_loop().run_in_executor(None, self._write, line)
+
+class Uploader(Service):
+    """Sends the completed laps and the replay of the race to a server (see Receiver).
+
+    The connection is made when there is something to send, and made again if it is lost.
+    """
+
+    def __init__(self, host, port, retries = 3):
+        """Create an uploader.
+
+        host, port: The address of the server.
+        retries:    The number of times sending a message is retried before giving up on it.
+        """
+
+        Service.__init__(self)
+        self._host = host
+        self._port = port
+        self._retries = retries
+        self._writer = None
+
+    async def _send(self, kind, payload):
+        """Sends a message, connecting (again) if needed.
+
+        kind:       The kind of the message (e.g. LAP).
+        payload:    The bytes of the message.
+        """
+
+        for attempt in range(self._retries + 1):
+            try:
+                if self._writer is None:
+                    reader, self._writer = await asyncio.open_connection(self._host, self._port)
+                self._writer.write(MESSAGE.pack(kind, len(payload)) + payload)
+                await self._writer.drain()
+                return
+            except (OSError, ConnectionError):
+                self._close()
+                if attempt == self._retries:
+                    raise
+                await asyncio.sleep(0.1 * 2 ** attempt)
+
+    def _close(self):
+        """Drops the connection (if any)."""
+
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+    def _read(self, path):
+        """Reads a whole file (blocks, so it is run on a worker thread)."""
+
+        with open(path, 'rb') as f:
+            return f.read()
+
+    async def handle(self, event):
+        if isinstance(event, Lap):
+            await self._send(LAP, json.dumps(event._asdict(), sort_keys = True).encode('utf-8'))
+        elif isinstance(event, Finish) and event.replay is not None:
+            data = await asyncio.get_running_loop().run_in_executor(None, self._read, event.replay)
+            await self._send(REPLAY, data)
+
+    async def stop(self, timeout = None):
+        await Service.stop(self, timeout)
+        if self._writer is not None:
+            writer = self._writer
+            self._close()
+            try:
+                await writer.wait_closed()
+            except (OSError, ConnectionError):
+                pass
+
+class Receiver(object):
+    """A server receiving what an Uploader sends, e.g. as a local stand-in for the real one.
+    Keeps the messages it has received.
+    """
+
+    def __init__(self, callback = None):
+        """Create a receiver.
+
+        callback: A function called with the kind and the payload of every message received (optional).
+        """
+
+        self._callback = callback
+        self._server = None
+        self._messages = []     #Tuples (kind, payload)
+
+    def getMessages(self):
+        """Getter for _messages."""
+        return self._messages
+
+    async def start(self, host = '127.0.0.1', port = 0):
+        """Starts listening. Must be called from a running event loop.
+
+        host, port: The address to listen at. Port 0 picks a free port.
+
+        Returns the port.
+        """
+
+        self._server = await asyncio.start_server(self._receive, host, port)
+        return self._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        """Stops listening."""
+
+        self._server.close()
+        await self._server.wait_closed()
+
+    async def _receive(self, reader, writer):
+        """Reads the messages of a connection until it is closed."""
+
+        try:
+            while True:
+                kind, length = MESSAGE.unpack(await reader.readexactly(MESSAGE.size))
+                payload = await reader.readexactly(length)
+                self._messages.append((kind, payload))
+                if self._callback is not None:
+                    self._callback(kind, payload)
+        except asyncio.IncompleteReadError:
+            pass
+        finally:
+            writer.close()
+
+def makeServices():
+    """Returns a list of the services enabled in config (see LAP_LOG and UPLOAD_HOST)."""
+
+    services = []
+    if LAP_LOG:
+        services.append(LapLog(LAP_LOG))
+    if UPLOAD_HOST:
+        services.append(Uploader(UPLOAD_HOST, UPLOAD_PORT, UPLOAD_RETRIES))
+    return services
+
+async def _serve(port):
+    """Runs a Receiver printing what it receives, until interrupted."""
+
+    def show(kind, payload):
+        if kind == LAP:
+            print(payload.decode('utf-8'))
+        else:
+            print("%s %d bytes" % (kind.decode('ascii').strip(), len(payload)))
+
+    receiver = Receiver(show)
+    print("Listening at port %d" % await receiver.start('127.0.0.1', port))
+    await asyncio.Event().wait()
+
+if __name__ == '__main__':
+    try:
+        asyncio.run(_serve(int(sys.argv[1]) if len(sys.argv) > 1 else UPLOAD_PORT))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,96 @@
+"""Running the physics on a thread of their own.
+
+The simulation thread advances the race at a fixed rate. After every tick it publishes an immutable
+Snapshot with everything needed to draw the race: the state of every car before and after the tick
+(so the drawing can interpolate between them), the lap times and so on. Publishing is a single
+assignment of a reference, so the drawing thread always gets a whole snapshot without taking any locks,
+and a slow frame never holds up the physics. The player's controls are handed over the same way.
+"""
+
+#Imports
+
+##External
+import threading
+from time import perf_counter
+from collections import namedtuple
+
+#What the drawing thread sees of the race after a tick.
+#time:      When the tick was due (perf_counter). The cars are interpolated from previous to current after that.
+#previous:  A tuple (x, y, rotation) for each car, before the tick.
+#current:   A tuple (x, y, rotation) for each car, after the tick.
+#frame:     The frame of the player's lap (0 before the first lap starts).
+#times:     A tuple with the player's laps to go, and fastest, latest and total lap times.
+#running:   False once the race is over.
+Snapshot = namedtuple('Snapshot', ['time', 'previous', 'current', 'frame', 'times', 'running'])
+
+class Simulation(object):
+    """Runs a race on a thread, a tick at a time, and publishes a Snapshot after every tick."""
+
+    def __init__(self, step, capture, controls, rate, maxticks = 5):
+        """Create a simulation. The first snapshot is captured at once, so there is always one to draw.
+
+        step:       A function advancing the race a single tick. It is given the latest controls,
+                    and returns True if the race goes on. Only called on the simulation thread.
+        capture:    A function returning a Snapshot of the race. It is given the time the tick was due,
+                    and whether the race goes on (the result of step).
+        controls:   The controls until the first call to setControls.
+        rate:       The number of ticks per second.
+        maxticks:   If the simulation falls more than this many ticks behind (e.g. if the process was suspended),
+                    it skips ahead instead of running them all at once.
+        """
+
+        self._step = step
+        self._capture = capture
+        self._controls = controls
+        self._rate = rate
+        self._maxticks = maxticks
+        self._snapshot = capture(perf_counter(), True)
+        self._stopping = threading.Event()
+        self._thread = threading.Thread(target = self._run, name = 'simulation')
+        self._thread.daemon = True      #Never keeps the game from quitting
+
+    def getSnapshot(self):
+        """Returns the latest Snapshot. Safe to call from any thread."""
+        return self._snapshot
+
+    def setControls(self, controls):
+        """Hands the player's latest controls to the simulation. Safe to call from any thread.
+
+        controls: A Controls tuple, used for every tick until the next call.
+        """
+
+        self._controls = controls
+
+    def start(self):
+        """Starts the simulation thread."""
+        self._thread.start()
+
+    def stop(self):
+        """Stops the simulation thread (after its current tick), and waits for it to finish."""
+
+        self._stopping.set()
+        if self._thread.is_alive() and self._thread is not threading.current_thread():
+            self._thread.join()
+
+    def _run(self):
+        """The simulation thread. Runs a tick whenever one is due, until the race is over or the simulation stopped."""
+
+        tick = 1.0 / self._rate
+        due = perf_counter() + tick
+
+        while True:
+            delay = due - perf_counter()
+            if delay > 0:
+                if self._stopping.wait(delay):
+                    break
+            elif self._stopping.is_set():
+                break
+
+            running = self._step(self._controls)
+            self._snapshot = self._capture(due, running)
+            if not running:
+                break
+
+            due += tick
+            if perf_counter() - due > self._maxticks * tick:
+                due = perf_counter()
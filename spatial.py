@@ -0,0 +1,106 @@
+#Imports
+
+##Classes and global constants
+from shapes import *
+
+class GridIndex(object):
+    """A uniform grid over a list of obstacles, used to find the obstacles near a given area.
+
+    Each cell of the grid holds the obstacles whose bounding boxes overlap it, so finding the obstacles
+    that might touch an area only requires looking at the cells the area overlaps.
+    The index is rebuilt if an obstacle is changed through one of its setters.
+    """
+
+    def __init__(self, obstacles, cellsize):
+        """Create an index.
+
+        obstacles:  A list of obstacles. Circles and Rectangles (including subclasses) are supported.
+        cellsize:   The width and height of a cell. Works best when similar to the size of the cars.
+
+        Raises a TypeError if an obstacle is neither a Circle nor a Rectangle.
+        """
+
+        self._obstacles = obstacles
+        self._cellsize = cellsize
+        self._cells = None          #Indices (into _obstacles) of the obstacles in each cell
+        self._cellObstacles = None  #The obstacles in each cell
+
+        for thing in obstacles:
+            self._bounds(thing)     #Check the type early
+            thing.addObserver(self._invalidate)
+
+    def __iter__(self):
+        return iter(self._obstacles)
+
+    def __len__(self):
+        return len(self._obstacles)
+
+    def _bounds(self, thing):
+        """Finds the bounding box of an obstacle.
+
+        thing: A Circle or a Rectangle.
+
+        Returns a tuple (left, top, right, bottom).
+        """
+
+        if isinstance(thing, Circle):
+            return (thing._pos.x - thing._radius, thing._pos.y - thing._radius,
+                    thing._pos.x + thing._radius, thing._pos.y + thing._radius)
+        elif isinstance(thing, Rectangle):
+            return (thing._pos.x, thing._pos.y, thing._pos.x + thing._w, thing._pos.y + thing._h)
+        else:
+            raise TypeError("The obstacles must be objects of class Rectangle, class Circle or a subclass of these.")
+
+    def _invalidate(self, drawable):
+        """Observer for the obstacles. Makes sure the grid is rebuilt before it is used again.
+
+        drawable: The obstacle that has been changed.
+        """
+
+        self._cells = None
+
+    def _build(self):
+        """Sorts the obstacles into the cells of the grid."""
+
+        self._cells = dict()
+        size = self._cellsize
+
+        for i, thing in enumerate(self._obstacles):
+            left, top, right, bottom = self._bounds(thing)
+            for cx in range(int(left // size), int(right // size) + 1):
+                for cy in range(int(top // size), int(bottom // size) + 1):
+                    self._cells.setdefault((cx, cy), []).append(i)
+
+        #The obstacles of each cell are in the same order as in the list, since they were added in that order
+        self._cellObstacles = dict()
+        for key in self._cells:
+            self._cellObstacles[key] = [self._obstacles[i] for i in self._cells[key]]
+
+    def query(self, x, y, w, h):
+        """Finds the obstacles that might overlap an area.
+
+        x, y: The upper left corner of the area.
+        w, h: The width and height of the area.
+
+        Returns a list of the obstacles in the cells the area overlaps, in the same order as the original list.
+        The list may be shared with the index, so it should not be changed.
+        """
+
+        if self._cells is None:
+            self._build()
+
+        size = self._cellsize
+        x0 = int(x // size)
+        x1 = int((x + w) // size)
+        y0 = int(y // size)
+        y1 = int((y + h) // size)
+
+        if x0 == x1 and y0 == y1:
+            return self._cellObstacles.get((x0, y0), ())
+
+        found = set()
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1):
+                found.update(self._cells.get((cx, cy), ()))
+
+        return [self._obstacles[i] for i in sorted(found)]
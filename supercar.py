@@ -2,20 +2,20 @@
 
 ##External
 import pygame, math
-from precode import Vector2D, intersect_rectangle_line
 
 ##General methods
 from library import *
 
 ##Classes and global constants
+from physics import Car, Controls
 from drawable import *
 from drawconf import *
 
-class Supercar(Rectangle, MovingObject):
+class Supercar(Car):
     """A supercar (moving sprite on a layer)."""
 
     def __init__(self, pos, speed, speedlimit, color, width, length, room, keys, rotation = 0,
-                 wcolor = BLACK, bgcolor = TRANSPARENT):
+                 wcolor = BLACK, bgcolor = TRANSPARENT, laps = 10, offroadlimit = None, swept = False):
         """Create a supercar.
 
         pos:        A vector2D object pointing to the upper left corner of the
@@ -32,59 +32,24 @@ class Supercar(Rectangle, MovingObject):
                     and positive numbers signifies clockwise rotation.
         wcolor:     The color of the car's wheels.
         bgcolor:    Background color of the surface the car is drawn onto.
+        laps:       The number of laps in the race.
+        offroadlimit: The speed limit when the car is off-road. Same as speedlimit if not given.
+        swept:      If True, collisions are found along the car's movement (see Car.sweep).
         """
 
-        if(width >= length):
-            print("The supercar must have a height(length) greater than its width.")
-        Rectangle.__init__(self, length, length, color, pos.x, pos.y)
+        Car.__init__(self, pos, speed, speedlimit, width, length, room, rotation, laps, offroadlimit, swept)
 
-        self._width = width
-        self._velocity = speed
-        self._maxSpeed = speedlimit
-        self._setRoom(room)
-        self._rotation = rotation
-        self._noRotation = rotation     #To keep track of the initial rotation
+        self._color = color
         self._wcolor = wcolor
         self._bgcolor = bgcolor
         
         self._layer = self._makeLayer()
+        self._drawn = None          #The part of the screen the car was drawn to last time
+        self._previous = (pos.x, pos.y, rotation)   #Position and rotation before the latest step
         self._keys = keys        
         self._thrust = False
         self._leftTurn = False
         self._rightTurn = False
-        
-        self._running = False       #Wait for the player to start moving before starting the clock
-        self._laps = 10             #Laps to go
-        self._lastCP = -1           #Index of latest checkpoint
-        self._frames = 0            #Number of frames for this lap
-        self._fastestLap = 0        #Fastest lap time
-        self._latestLap = 0         #Latest lap time
-        self._totalLap = 0          #Total lap time
-
-    def getFastestLap(self):
-        """Getter for _fastestLap."""
-        return self._fastestLap
-
-    def getLatestLap(self):
-        """Getter for _latestLap."""
-        return self._latestLap
-
-    def getTotalLap(self):
-        """Getter for _totalLap."""
-        return self._totalLap
-
-    def _setRoom(self, room):
-        """Set the car's _room attribute. Should only be called from __init__.
-
-        room: A rectangle object that represents a room the car should be contained in.
-
-        Raises a TypeError if the argument is not a Rectangle.
-        """
-        
-        if not isinstance(room, Rectangle):
-            raise TypeError("Argument error. room must be an object of the Rectangle class.")
-        else:
-            self._room = room
 
     def _makeLayer(self):
         """Generates a surface with the supercar drawn onto it.
@@ -123,71 +88,62 @@ class Supercar(Rectangle, MovingObject):
 
         pygame.draw.rect(layer, self._color, (border, offset, self._w - 2 * border, self._h - 2 * offset))
 
-    def draw(self, layer):
+    def getDrawnRect(self):
+        """Getter for _drawn."""
+        return self._drawn
+
+    def step(self, controls, anglespeed, obstacles, checkpoints, terrain = None):
+        """Advances the car a single frame (see Car.step). Keeps the previous position and rotation for drawing."""
+
+        self._previous = (self._pos.x, self._pos.y, self._rotation)
+        return Car.step(self, controls, anglespeed, obstacles, checkpoints, terrain)
+
+    def draw(self, layer, alpha = 1.0):
         """Draws the car (actually draws the car's layer onto another layer).
 
         layer: Layer to draw the car onto.
+        alpha: How far the car has come from its previous state (before the latest step) to its current one.
+               0 draws it as it was before the step, 1 as it is now, and anything in between is interpolated.
+
+        Returns a list of pygame Rects for the parts of the layer that have changed since the car was last drawn
+        (where the car was drawn previously and where it is drawn now).
         """
 
-        carlayer = rotate_center(self._layer, self._noRotation - self._rotation)
-        layer.blit(carlayer, (self._pos.x, self._pos.y))
+        return self.drawState(layer, self._previous, (self._pos.x, self._pos.y, self._rotation), alpha)
 
-    def checkpoint(self, points):
-        """Handles intersection between the car and a checkpoint.
+    def drawState(self, layer, previous, current, alpha = 1.0):
+        """Draws the car in a given state, rather than its own (e.g. from a simulation.Snapshot).
 
-        points: A list of checkpoints that the car must cross in chronological order on every lap.
+        layer:      Layer to draw the car onto.
+        previous:   A tuple (x, y, rotation) with the state of the car before its latest step.
+        current:    A tuple (x, y, rotation) with the state of the car after its latest step.
+        alpha:      How far the car has come from previous to current (see draw).
 
-        The method keeps the attributes _latestLap, _fastestLap, _totalLap and _laps updated.
-        It resets the attribute _frames when crossing the first checkpoint,
-        and updates _lastCP when crossing any checkpoint.
+        Returns a list of pygame Rects for the parts of the layer that have changed since the car was last drawn.
         """
 
-        if self._lastCP < 0:
-            if intersect_rectangle_line(self._pos, self._w, self._h,
-                                        points[0]._pos, points[0]._length, points[0]._angle):
-                self._lastCP = 0
-                self._totalLap = self._frames
-                self._frames = 0
-        elif self._lastCP == len(points) - 1:
-            if intersect_rectangle_line(self._pos, self._w, self._h,
-                                        points[0]._pos, points[0]._length, points[0]._angle):
-                self._laps -= 1
-                self._lastCP = 0
-                self._latestLap = self._frames
-                if self._fastestLap <= 0 or self._latestLap < self._fastestLap:
-                    self._fastestLap = self._latestLap
-                self._totalLap += self._latestLap
-                self._frames = 0
-        else:
-            if intersect_rectangle_line(self._pos, self._w, self._h,
-                                        points[self._lastCP + 1]._pos, points[self._lastCP + 1]._length,
-                                        points[self._lastCP + 1]._angle):
-                self._lastCP += 1
-
-        #for i in range(len(points)):
-        #    if intersect_rectangle_line(self._pos, self._w, self._h,
-        #                                points[i]._pos, points[i]._length, points[i]._angle):
-        #        print(str(i))
-
-    def update(self, anglespeed, obstacles, checkpoints):
-        """Updates the car's attributes based on user input and other objects.
-
-        anglespeed:     Number of degrees the car turns when getting appropriate user input.
-        obstacles:      A list of obstacles that the car can interact (collide) with.
-        checkpoints:    A list of lines that the car must cross in chronological order to finish a lap.
-        
-        Returns True if there are more laps to drive. False otherwise.
-        """
+        x, y, rotation = previous
+        x += (current[0] - x) * alpha
+        y += (current[1] - y) * alpha
+        rotation += (current[2] - rotation) * alpha
 
-        for event in pygame.event.get():
-            #Check if the user has terminated the game
-            if event.type == pygame.QUIT:
-                pygame.quit()
-                sys.exit()
+        carlayer = rotate_center(self._layer, self._noRotation - rotation)
+        rects = [self._drawn] if self._drawn else []
+        self._drawn = layer.blit(carlayer, (x, y))
+        rects.append(self._drawn)
 
-            #Handle key events
+        return rects
+
+    def readControls(self, events):
+        """Updates the state of the player's controls based on key events.
+
+        events: A list of pygame events (e.g. from pygame.event.get).
+
+        Returns a Controls tuple with the controls that are currently active.
+        """
+
+        for event in events:
             if event.type == pygame.KEYDOWN:
-                self._running = True    #Make sure that the clock has started
                 if pygame.key.get_pressed()[self._keys[0][2]]:
                     self._leftTurn = True
                 if pygame.key.get_pressed()[self._keys[1][2]]:
@@ -202,74 +158,4 @@ class Supercar(Rectangle, MovingObject):
                 if not pygame.key.get_pressed()[self._keys[2][2]]:
                     self._thrust = False
 
-        if self._running:
-            #Handle interaction with other game objects
-            self.bounce(self._room)
-            self.collide(obstacles)
-            self.checkpoint(checkpoints)
-
-            #Update direction and velocity based on user input
-            if self._leftTurn and self._rightTurn:
-                pass
-            elif self._leftTurn:
-                self._rotation -= anglespeed
-            elif self._rightTurn:
-                self._rotation += anglespeed
-
-            if self._thrust == True:
-                self._velocity += self.heading()
-
-            #Limit the velocity and move the car
-            self.limit_velocity()
-            self.move()
-            self._frames += 1
-
-        if self._laps <= 0:
-            return False
-        else:
-            return True
-
-    def heading(self):
-        """Determines the direction the car is pointing.
-
-        Returns a Vector2D object representing a unit vector in that direction.
-        """
-
-        return (Vector2D(math.cos(self._rotation * math.pi / 180),
-                         math.sin(self._rotation * math.pi / 180)))
-
-    def limit_velocity(self):
-        """Limits the velocity of the supercar based on its _maxSpeed."""
-
-        if self._velocity.magnitude() > self._maxSpeed:
-            self._velocity = self._velocity.normalized() * self._maxSpeed
-
-    def collide(self, obstacles):
-        """Changes the velocity of the supercar when hitting an obstacle.
-
-        obstacles: The list of obstacles that the car can collide with.
-
-        The method only handles circular obstacles at the moment.
-        It is advised to avoid obstacles close to each other or to the borders of _room,
-        since hitting multiple objects between two updates is not taken into consideration by the method.
-        Additionally, the change in velocity is not very scientific (assumes a head-on elastic collision).
-        """
-
-        for thing in obstacles:
-            if isinstance(thing, Circle):
-                #Test if intersection is possible
-                delta = Vector2D(self._w / 2, self._h / 2)
-                dist = thing._pos - (self._pos + delta)
-                if dist.magnitude() < thing._radius + delta.magnitude():
-                    #Check each corner for intersection
-                    ul = thing._pos - self._pos
-                    ur = thing._pos - (self._pos + Vector2D(self._w, 0))
-                    bl = thing._pos - (self._pos + Vector2D(0, self._h))
-                    br = thing._pos - (self._pos + Vector2D(self._w, self._h))
-                    corners = (ul, ur, bl, br)
-
-                    for pos in corners:
-                        if pos.magnitude() < thing._radius:
-                            self._pos = self._pos - self._velocity
-                            self._velocity *= -1
-                            break
+        return Controls(self._leftTurn, self._rightTurn, self._thrust)
@@ -0,0 +1,74 @@
+"""What a track's surface is made of, looked up per pixel.
+
+The ground of a track is rendered once, and every pixel is classified as road or off-road
+by its color. Finding out whether a car is off-road is then a single lookup in a byte string,
+whatever the number and shapes of the ground's drawables.
+"""
+
+#Imports
+
+##External
+import pygame
+
+##Classes and global constants
+from drawconf import *
+
+class Terrain(object):
+    """A bitmap telling which pixels of a track are off-road (one byte per pixel, row by row)."""
+
+    def __init__(self, size, offroad):
+        """Create a terrain.
+
+        size:       A tuple with the width and height of the track.
+        offroad:    A bytes object with one byte per pixel (row by row). Nonzero means off-road.
+        """
+
+        self._w, self._h = size
+        self._offroad = offroad
+
+    def getSize(self):
+        """Returns a tuple with the width and height of the terrain."""
+        return (self._w, self._h)
+
+    def getBytes(self):
+        """Getter for _offroad."""
+        return self._offroad
+
+    def isOffroad(self, x, y):
+        """Looks up a point of the track. Points outside the track are off-road.
+
+        x, y: The coordinates of the point.
+
+        Returns True if the point is off-road. False otherwise.
+        """
+
+        x = int(x)
+        y = int(y)
+        if x < 0 or y < 0 or x >= self._w or y >= self._h:
+            return True
+        return self._offroad[y * self._w + x] != 0
+
+def makeTerrain(ground, size, road, bgcolor):
+    """Classifies every pixel of a track's ground as road or off-road.
+
+    ground:     A list of the drawables making up the ground.
+    size:       A tuple with the width and height of the track.
+    road:       A list of the colors that count as road (e.g. asphalt and markings).
+    bgcolor:    The color of the areas not covered by any drawable.
+
+    Returns a Terrain. Pixels with any other color than those in road are off-road.
+    """
+
+    surface = pygame.Surface(size)
+    surface.fill(bgcolor)
+    for thing in ground:
+        thing.draw(surface)
+
+    mask = pygame.mask.Mask(size)
+    for color in road:
+        mask.draw(pygame.mask.from_threshold(surface, color, (1, 1, 1, 255)), (0, 0))
+    mask.invert()
+
+    #One byte per pixel (the red channel of a surface with the off-road pixels set to 1)
+    bitmap = mask.to_surface(setcolor = (1, 1, 1, 255), unsetcolor = (0, 0, 0, 255))
+    return Terrain(size, pygame.image.tobytes(bitmap, 'RGB')[::3])
@@ -0,0 +1,10 @@
+"""Shared setup of the tests. Run from the top folder by typing: python -m pytest -q"""
+
+#Imports
+
+##External
+import os, sys
+
+#The game's modules are in the folder above, and nothing is shown on screen
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
@@ -0,0 +1,63 @@
+"""Tests of the opponents' Guide and Pilot."""
+
+#Imports
+
+##Classes and global constants
+from ai import *
+from terrain import Terrain
+from physics import Controls
+
+CELL = 10
+
+def _guide(obstacles = ()):
+    """Makes the Guide of a 100 x 100 track that is all road, with a racing line along the second row of cells
+    (not smoothed).
+    """
+
+    checkpoints = [Line(10, 15, CELL, 1, 0, (0, 0, 0)), Line(80, 15, CELL, 1, 0, (0, 0, 0))]
+    return makeGuide(Terrain((100, 100), bytes(100 * 100)), list(obstacles), checkpoints, CELL, 0, CELL, 0)
+
+def test_distances_are_steps_to_the_line():
+    guide = _guide()
+    assert guide.getShape() == (10, 10)
+
+    #The line covers the columns 1 to 8, and diagonal steps count as one
+    for row in range(10):
+        for col in range(10):
+            steps = max(abs(row - 1), 1 if col in (0, 9) else 0)
+            assert guide.distanceAt(col * CELL + 5, row * CELL + 5) == steps * CELL
+    assert guide.distanceAt(-1, 5) is None and guide.distanceAt(5, 100) is None
+
+def test_unreachable_cells_have_no_distance():
+    #A wall across the track cuts off the rows below it
+    guide = _guide([Rectangle(100, CELL, (0, 0, 0), 0, 5 * CELL)])
+    assert guide.distanceAt(55, 45) == 3 * CELL
+    for y in (55, 65, 95):
+        assert guide.distanceAt(55, y) is None
+        assert guide.headingAt(55, y) is None
+    assert max(guide.getDistances()) == UNREACHABLE
+
+class _Track(object):
+    """Stands in for a Track whose Guide is remade (see Track.getGuide)."""
+
+    def __init__(self, guide):
+        self.guide = guide
+
+    def getGuide(self):
+        return self.guide
+
+class _Car(object):
+    def __init__(self, x, y):
+        self._pos = Vector2D(x, y)
+        self._w = self._h = 0
+        self._rotation = 0
+        self._velocity = Vector2D(0, 0)
+
+def test_pilots_follow_the_current_guide():
+    track = _Track(_guide())
+    pilot = Pilot(track, 5)
+    assert pilot.controls(_Car(55, 75)) != Controls(False, False, True)
+
+    #Once the track is changed, the pilot uses the new Guide, which can't reach the line from there
+    track.guide = _guide([Rectangle(100, CELL, (0, 0, 0), 0, 5 * CELL)])
+    assert pilot.controls(_Car(55, 75)) == Controls(False, False, True)
@@ -0,0 +1,50 @@
+"""Tests of the vectorized physics (fleet.py) against physics.Car."""
+
+#Imports
+
+##External
+import random, pytest
+from precode import Vector2D
+
+np = pytest.importorskip('numpy')
+
+##Classes and global constants
+from fleet import Fleet
+from physics import Car, Controls
+from track import loadTrack, trackPath
+from benchmark import drive
+from drawable import Rectangle
+from config import *
+
+CARS = 20
+FRAMES = 1500
+
+def test_fleet_matches_cars():
+    track = loadTrack(trackPath(TRACK), None)
+    obstacles = track.getObstacleIndex()
+    checkpoints = track.getCheckpoints()
+    terrain = track.getTerrain()
+    x, y, rotation = track.getStart()
+
+    #Every car drives around the track, with more and more of its controls flipped (so they finish different laps)
+    rng = random.Random(8)
+    base = drive(track)[:FRAMES]
+    inputs = [[Controls(*[not value if rng.random() < 0.03 * (i % 5) else value for value in controls])
+               for controls in base] for i in range(CARS)]
+
+    cars = [Car(Vector2D(x, y), Vector2D(0, 0), SPEEDLIMIT, WIDTH, LENGTH, Rectangle(RES_X, RES_Y, TRANSPARENT),
+                rotation, LAPS, OFFROAD_SPEEDLIMIT) for i in range(CARS)]
+    fleet = Fleet([(x, y)] * CARS, SPEEDLIMIT, WIDTH, LENGTH, Rectangle(RES_X, RES_Y, TRANSPARENT), rotation, LAPS,
+                  OFFROAD_SPEEDLIMIT)
+
+    for frame in range(FRAMES):
+        controls = [car[frame] for car in inputs]
+        for car, control in zip(cars, controls):
+            car.step(control, ROTATION_STEP, obstacles, checkpoints, terrain)
+        fleet.step(np.array([c.left for c in controls]), np.array([c.right for c in controls]),
+                   np.array([c.thrust for c in controls]), ROTATION_STEP, obstacles, checkpoints, terrain)
+
+    assert (fleet.getPositions() == np.array([(car._pos.x, car._pos.y) for car in cars])).all()
+    assert fleet.getLaps().tolist() == [car._laps for car in cars]
+    assert fleet.getTotalLap().tolist() == [car.getTotalLap() for car in cars]
+    assert len(set(car._laps for car in cars)) > 1
@@ -0,0 +1,52 @@
+"""Tests of the ghost files."""
+
+#Imports
+
+##External
+import os, pygame
+from precode import Vector2D
+
+##Classes and global constants
+from ghost import *
+from supercar import Supercar
+from drawable import Rectangle
+from config import *
+
+def _car():
+    """Returns a car to give the ghosts their appearance (needs a display for its sprite)."""
+
+    pygame.display.init()
+    pygame.display.set_mode((1, 1))
+    return Supercar(Vector2D(0, 0), Vector2D(0, 0), SPEEDLIMIT, RED, WIDTH, LENGTH,
+                    Rectangle(RES_X, RES_Y, TRANSPARENT), (), bgcolor = WHITE)
+
+def test_best_ghosts_match_the_track_exactly(tmp_path):
+    for name in ('oval-000200-20260101-120000.ghost', 'oval-000100-20260101-120000.ghost',
+                 'oval-2-000050-20260101-120000.ghost', 'oval-000300-20260101-120000.ghost.tmp'):
+        (tmp_path / name).write_bytes(b'')
+
+    paths = bestGhosts(str(tmp_path), 'oval', 5)
+    assert [os.path.basename(path) for path in paths] == ['oval-000100-20260101-120000.ghost',
+                                                          'oval-000200-20260101-120000.ghost']
+    assert [os.path.basename(path) for path in bestGhosts(str(tmp_path), 'oval-2', 5)] == \
+           ['oval-2-000050-20260101-120000.ghost']
+
+def test_unreadable_ghosts_are_skipped(tmp_path):
+    recorder = GhostRecorder(4)
+    for frame in range(1, 11):
+        recorder.record(frame, frame * 2.0, frame * 3.0, frame * 10)
+    good = str(tmp_path / 'good.ghost')
+    recorder.save(good, 10)
+    assert os.listdir(str(tmp_path)) == ['good.ghost']
+
+    bad = []
+    for name, data in (('empty', b''), ('short', MAGIC), ('magic', b'XXXX' + bytes(20)),
+                       ('cut', HEADER.pack(MAGIC, VERSION, 10) + bytes(STATE.size))):
+        bad.append(str(tmp_path / (name + '.ghost')))
+        with open(bad[-1], 'wb') as f:
+            f.write(data)
+
+    ghosts = loadGhosts(bad + [good, str(tmp_path / 'missing.ghost')], _car())
+    assert len(ghosts) == 1 and len(ghosts[0]) == 10
+    assert ghosts[0].getState(3) == (6.0, 9.0, 30)
+    ghosts[0].close()
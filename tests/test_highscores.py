@@ -0,0 +1,89 @@
+"""Tests of the leaderboard (highscores.py)."""
+
+#Imports
+
+##External
+import threading, time
+
+##Classes and global constants
+import replay
+from highscores import *
+from track import loadTrack, trackPath
+
+def _entry(fastest, track = 'oval', config = 'a', laps = 2):
+    """Returns a race with the given fastest lap."""
+    return Entry(track, config, fastest, fastest, fastest * laps, laps, time.time())
+
+def test_races_are_stored_in_batches():
+    scores = Highscores(':memory:', batch = 3, delay = 0.2)
+    for i in range(7):
+        scores.add(_entry(100 + i))
+    scores.flush()
+    assert scores.count('oval', 'a') == 7
+    assert scores.getWrites() == 3      #3 + 3 + 1 races
+    scores.close()
+
+def test_cache_is_cleared_after_a_write():
+    scores = Highscores(':memory:', delay = 0)
+    assert scores.top('oval', 'a', 5) == []     #Cached
+    entry = _entry(120)
+    scores.add(entry)
+    scores.flush()
+
+    #The race is no longer pending, so it can only come from the database
+    assert scores._pending == []
+    assert scores.top('oval', 'a', 5) == [entry]
+    scores.add(_entry(110))
+    scores.flush()
+    assert [race.fastest for race in scores.top('oval', 'a', 5)] == [110, 120]
+    scores.close()
+
+def test_configurations_are_ranked_apart(monkeypatch):
+    track = loadTrack(trackPath('oval'), None)
+    key = configKey(track)
+    assert configKey(track) == key
+    monkeypatch.setattr(replay, 'SPEEDLIMIT', replay.SPEEDLIMIT + 1)
+    other = configKey(track)
+    assert other != key
+
+    scores = Highscores(':memory:', delay = 0)
+    scores.add(_entry(100, config = other))
+    scores.add(_entry(200, config = key))
+    scores.flush()
+    assert [race.fastest for race in scores.top('oval', key, 5)] == [200]
+    assert [race.fastest for race in scores.top('oval', other, 5)] == [100]
+    scores.close()
+
+def test_close_stores_the_queued_races(tmp_path):
+    path = str(tmp_path / 'scores.db')
+    scores = Highscores(path, delay = 10)
+    for i in range(4):
+        scores.add(_entry(100 + i))
+    scores.close()      #Doesn't wait for the delay
+
+    scores = Highscores(path)
+    assert scores.count('oval', 'a') == 4
+    assert scores.top('oval', 'a', 2, 'total')[0].total == 200
+    scores.close()
+
+def test_failed_write_doesnt_stop_the_writer():
+    scores = Highscores(':memory:', delay = 0)
+    with scores._lock:
+        scores._db.execute("DROP TABLE races")
+    entry = _entry(100)
+    scores.add(entry)
+
+    #flush must return even though the race couldn't be stored
+    flushing = threading.Thread(target = scores.flush)
+    flushing.start()
+    flushing.join(5)
+    assert not flushing.is_alive()
+    assert len(scores.getErrors()) == 1
+    assert scores._pending == [entry]   #Still shown on the leaderboard
+
+    with scores._lock:
+        scores._db.executescript(SCHEMA)
+    scores.add(_entry(90))
+    scores.flush()
+    assert scores.count('oval', 'a') == 1
+    scores.close()
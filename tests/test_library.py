@@ -0,0 +1,26 @@
+"""Tests of the general methods (library.py)."""
+
+#Imports
+
+##External
+import os, pytest
+
+##General methods
+from library import *
+
+def test_new_files_get_new_names(tmp_path):
+    paths = [newFile(str(tmp_path / 'replays'), 'rpl') for i in range(20)]
+    assert len(set(paths)) == 20
+    assert all(os.path.isfile(path) and path.endswith('.rpl') for path in paths)
+
+def test_atomic_writes_replace_the_whole_file(tmp_path):
+    path = str(tmp_path / 'cache' / 'file.bin')
+    atomicWrite(path, b'old')
+    atomicWrite(path, [b'new', bytearray(b' and '), memoryview(b'more')])
+    assert open(path, 'rb').read() == b'new and more'
+
+    #A failed write leaves the old file, and no temporary file
+    with pytest.raises(TypeError):
+        atomicWrite(path, [b'half', None])
+    assert open(path, 'rb').read() == b'new and more'
+    assert os.listdir(str(tmp_path / 'cache')) == ['file.bin']
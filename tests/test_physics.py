@@ -0,0 +1,79 @@
+"""Tests of the car physics (physics.py)."""
+
+#Imports
+
+##External
+import random
+from precode import Vector2D
+
+##Classes and global constants
+from physics import Car, Controls
+from track import loadTrack, trackPath
+from benchmark import drive
+from drawable import Rectangle, Circle, Line
+from config import *
+
+THRUST = Controls(False, False, True)
+
+def _car(x, y, speedlimit, swept, rotation = 0, speed = 0):
+    """Returns a car that has started its race, in a room the size of the window."""
+
+    car = Car(Vector2D(x, y), Vector2D(speed, 0), speedlimit, WIDTH, LENGTH, Rectangle(RES_X, RES_Y, TRANSPARENT),
+              rotation, LAPS, None, swept)
+    car._running = True
+    return car
+
+def _overlaps(car, thing):
+    """Tests if a car's square overlaps an obstacle by more than rounding errors."""
+
+    if isinstance(thing, Circle):
+        x = min(max(thing._pos.x, car._pos.x), car._pos.x + car._w)
+        y = min(max(thing._pos.y, car._pos.y), car._pos.y + car._h)
+        return (x - thing._pos.x) ** 2 + (y - thing._pos.y) ** 2 < thing._radius ** 2 - 1e-6
+    return (car._pos.x < thing._pos.x + thing._w - 1e-6 and thing._pos.x < car._pos.x + car._w - 1e-6 and
+            car._pos.y < thing._pos.y + thing._h - 1e-6 and thing._pos.y < car._pos.y + car._h - 1e-6)
+
+def test_fast_car_hits_thin_wall():
+    #A car 20 pixels in front of a wall 10 pixels thick gets past it in a single frame, unless the collisions are swept
+    wall = Rectangle(10, RES_Y, BLACK, 300, 0)
+    finish = [Line(RES_X - 50, 0, 10, 1, 0, WHITE)]     #Out of the car's way
+    speed = LENGTH + 40
+    for swept in (False, True):
+        car = _car(wall._pos.x - LENGTH - 20, 100, speed, swept, 0, speed)
+        passed = False
+        for frame in range(10):
+            car.step(THRUST, ROTATION_STEP, [wall], finish)
+            passed = passed or car._pos.x >= wall._pos.x + wall._w
+            assert not swept or (car._pos.x + car._w <= wall._pos.x + 1e-6 and not _overlaps(car, wall))
+        assert passed != swept
+
+def test_swept_car_never_overlaps():
+    track = loadTrack(trackPath(TRACK), None)
+    obstacles = track.getObstacles()
+    rng = random.Random(5)
+    x, y, rotation = track.getStart()
+    car = _car(x, y, 80, True, rotation)
+
+    for frame in range(2000):
+        controls = Controls(rng.random() < 0.3, rng.random() < 0.1, rng.random() < 0.9)
+        car.step(controls, ROTATION_STEP, track.getObstacleIndex(), track.getCheckpoints())
+        assert not any(_overlaps(car, thing) for thing in obstacles)
+        assert -1e-6 <= car._pos.x <= RES_X - car._w + 1e-6 and -1e-6 <= car._pos.y <= RES_Y - car._h + 1e-6
+
+def test_swept_matches_discrete_at_normal_speeds():
+    #Below the speeds where a car can pass through anything, both ways of colliding drive the same race
+    track = loadTrack(trackPath(TRACK), None)
+    inputs = drive(track)
+    results = []
+    for swept in (False, True):
+        x, y, rotation = track.getStart()
+        car = Car(Vector2D(x, y), Vector2D(0, 0), SPEEDLIMIT, WIDTH, LENGTH, Rectangle(RES_X, RES_Y, TRANSPARENT),
+                  rotation, LAPS, OFFROAD_SPEEDLIMIT, swept)
+        for controls in inputs:
+            if not car.step(controls, ROTATION_STEP, track.getObstacleIndex(), track.getCheckpoints(),
+                            track.getTerrain()):
+                break
+        results.append((car._laps, car.getFastestLap(), car.getTotalLap(), car._pos.x, car._pos.y))
+
+    assert results[0] == results[1]
+    assert results[0][0] == 0
@@ -0,0 +1,40 @@
+"""Tests of the geometry in precode.py."""
+
+#Imports
+
+##External
+import math, random, pytest
+from precode import *
+
+#Lines at every multiple of pi / 2 (the special cases of intersect_rectangle_line) and at other angles
+ANGLES = (0, math.pi / 2, math.pi, 3 * math.pi / 2, 0.3, 1.2, 2.0, 2.9, 3.5, 4.4, 5.0, 6.0)
+
+def test_segment_matches_line():
+    rng = random.Random(2)
+    for angle in ANGLES:
+        for i in range(2000):
+            l_pos = Vector2D(rng.randint(0, 100), rng.randint(0, 100))
+            l_len = rng.uniform(5, 80)
+            rec_pos = Vector2D(rng.uniform(-50, 150), rng.uniform(-50, 150))
+            sx = rng.uniform(5, 60)
+            sy = rng.uniform(5, 60)
+            if rng.random() < 0.2:
+                rec_pos.x = l_pos.x     #The line starts on the rectangle's border
+            old = bool(intersect_rectangle_line(rec_pos, sx, sy, l_pos, l_len, angle))
+            assert intersect_rectangle_segment(rec_pos, sx, sy, compile_line(l_pos, l_len, angle)) == old
+
+def test_batched_segments_match():
+    np = pytest.importorskip('numpy')
+    from fleet import segmentArrays, intersect_rectangles_segments
+
+    rng = random.Random(3)
+    segments = [compile_line(Vector2D(rng.randint(0, 100), rng.randint(0, 100)), rng.uniform(5, 80), angle)
+                for angle in ANGLES for i in range(10)]
+    xs = [rng.uniform(-50, 150) for i in range(500)]
+    ys = [rng.uniform(-50, 150) for i in range(500)]
+    hits = intersect_rectangles_segments(xs, ys, 20, 40, *segmentArrays(segments))
+
+    assert hits.any() and not hits.all()
+    for i in range(len(xs)):
+        assert hits[i].tolist() == [intersect_rectangle_segment(Vector2D(xs[i], ys[i]), 20, 40, seg)
+                                    for seg in segments]
@@ -0,0 +1,41 @@
+"""Tests of the replay files."""
+
+#Imports
+
+##External
+import os
+
+##Classes and global constants
+from replay import Recorder, Replay, HEADER
+from evaluate import evaluate, makeCar, LapTimes
+from track import loadTrack, trackPath
+from ai import Pilot
+from library import newFile
+from config import *
+
+def test_replays_reproduce_the_lap_times(tmp_path):
+    track = loadTrack(trackPath(TRACK), None)
+    obstacles = track.getObstacleIndex()
+    checkpoints = track.getCheckpoints()
+    terrain = track.getTerrain()
+
+    #Record a race driven by a pilot, as the game records the player
+    car = makeCar(track)
+    pilot = Pilot(track, ROTATION_STEP, AI_THRUST_ANGLE, AI_DEADBAND, AI_CORNER_SPEED)
+    recorder = Recorder(track)
+    for frame in range(FPS * 60 * 5):
+        controls = pilot.controls(car)
+        recorder.record(controls)
+        if not car.step(controls, ROTATION_STEP, obstacles, checkpoints, terrain):
+            break
+    assert car._laps == 0
+    recorded = LapTimes(car.getLatestLap(), car.getFastestLap(), car.getTotalLap())
+
+    #A byte per frame after the header
+    path = newFile(str(tmp_path), 'rpl')
+    recorder.save(path)
+    assert os.path.getsize(path) == HEADER.size + frame + 1
+
+    replay = Replay(path, track)
+    assert len(replay) == frame + 1
+    assert evaluate(replay.getInputs(), track, 0) == recorded
@@ -0,0 +1,90 @@
+"""Tests of the services, against a Receiver on the local machine."""
+
+#Imports
+
+##External
+import asyncio, json, pytest
+
+##Classes and global constants
+import services
+from services import *
+
+EVENT = Lap('oval', 1, 1200, 1200, 1210)
+
+def test_services_must_handle_events():
+    with pytest.raises(TypeError):
+        Service()
+
+def test_services_log_and_upload_laps(tmp_path, monkeypatch):
+    async def race():
+        receiver = Receiver()
+        port = await receiver.start()
+        monkeypatch.setattr(services, 'LAP_LOG', str(tmp_path / 'laps' / 'laps.jsonl'))
+        monkeypatch.setattr(services, 'UPLOAD_HOST', '127.0.0.1')
+        monkeypatch.setattr(services, 'UPLOAD_PORT', port)
+
+        running = makeServices()
+        assert [type(service) for service in running] == [LapLog, Uploader]
+        for service in running:
+            service.start()
+            service.notify(EVENT)
+        for service in running:
+            await service.stop(5)
+            assert service.getErrors() == []
+        await receiver.stop()
+        return receiver.getMessages()
+
+    messages = asyncio.run(race())
+    assert [json.loads(line) for line in (tmp_path / 'laps' / 'laps.jsonl').read_text().splitlines()] == [EVENT._asdict()]
+    assert [(kind, json.loads(payload)) for kind, payload in messages] == [(LAP, EVENT._asdict())]
+
+def test_uploader_retries_until_the_receiver_is_up(monkeypatch):
+    delays = []
+    sleep = asyncio.sleep
+
+    async def race():
+        #Find a free port, with nothing listening at it until the uploader has been refused once
+        receiver = Receiver()
+        port = await receiver.start()
+        await receiver.stop()
+
+        async def wait(delay):
+            delays.append(delay)
+            if len(delays) == 1:
+                await receiver.start('127.0.0.1', port)
+            await sleep(0)
+        monkeypatch.setattr(asyncio, 'sleep', wait)
+
+        uploader = Uploader('127.0.0.1', port, 3)
+        uploader.start()
+        uploader.notify(EVENT)
+        await uploader.stop(5)
+        await receiver.stop()
+        return uploader.getErrors(), receiver.getMessages()
+
+    errors, messages = asyncio.run(race())
+    assert errors == []
+    assert delays == [0.1]
+    assert [(kind, json.loads(payload)) for kind, payload in messages] == [(LAP, EVENT._asdict())]
+
+def test_uploader_gives_up_with_growing_delays(monkeypatch):
+    delays = []
+
+    async def wait(delay):
+        delays.append(delay)
+
+    async def race():
+        receiver = Receiver()
+        port = await receiver.start()
+        await receiver.stop()
+        monkeypatch.setattr(asyncio, 'sleep', wait)
+
+        uploader = Uploader('127.0.0.1', port, 3)
+        uploader.start()
+        uploader.notify(EVENT)
+        await uploader.stop(5)
+        return uploader.getErrors()
+
+    errors = asyncio.run(race())
+    assert len(errors) == 1 and errors[0][0] == EVENT and isinstance(errors[0][1], OSError)
+    assert delays == [0.1, 0.2, 0.4]
@@ -0,0 +1,20 @@
+"""Tests of the geometry of the shapes."""
+
+#Imports
+
+##External
+import pytest
+
+##Classes and global constants
+from shapes import *
+
+def test_rectangles_collide_with_rectangles_and_circles():
+    rect = Rectangle(10, 10, (0, 0, 0), 0, 0)
+    assert rect.objectCollision(Rectangle(10, 10, (0, 0, 0), 5, 5))
+    assert not rect.objectCollision(Rectangle(10, 10, (0, 0, 0), 20, 0))
+    assert rect.objectCollision(Circle(14, 5, 5, (0, 0, 0)))
+    assert not rect.objectCollision(Circle(16, 5, 5, (0, 0, 0)))
+
+def test_rectangles_only_collide_with_shapes():
+    with pytest.raises(TypeError):
+        Rectangle(10, 10, (0, 0, 0)).objectCollision(Line(0, 0, 10, 1, 0, (0, 0, 0)))
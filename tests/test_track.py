@@ -0,0 +1,80 @@
+"""Tests of the compiled tracks and their cache."""
+
+#Imports
+
+##External
+from precode import Vector2D
+
+##Classes and global constants
+from track import loadTrack, trackPath
+from config import *
+
+def test_cached_index_follows_obstacles(tmp_path):
+    #The first load compiles the track, the second one reads it from the cache
+    loadTrack(trackPath(TRACK), str(tmp_path))
+    track = loadTrack(trackPath(TRACK), str(tmp_path))
+    index = track.getObstacleIndex()
+    thing = track.getObstacles()[0]
+    x, y = thing._pos.x, thing._pos.y
+    assert thing in index.query(x, y, 1, 1)
+
+    #Move the obstacle far away: the index must forget where it was
+    thing.setPos(Vector2D(x + 10 * OBSTACLE_CELL, y + 10 * OBSTACLE_CELL))
+    assert thing not in index.query(x, y, 1, 1)
+    assert thing in index.query(x + 10 * OBSTACLE_CELL, y + 10 * OBSTACLE_CELL, 1, 1)
+
+def test_cache_follows_the_settings(tmp_path, monkeypatch):
+    import track
+    loadTrack(trackPath(TRACK), str(tmp_path))
+    for name, value in (('OBSTACLE_CELL', OBSTACLE_CELL * 2), ('CAR_ROTATION', CAR_ROTATION + 90), ('RES_X', RES_X + 1)):
+        monkeypatch.setattr(track, name, value)
+        loadTrack(trackPath(TRACK), str(tmp_path))
+    assert len(list(tmp_path.iterdir())) == 4
+    assert loadTrack(trackPath(TRACK), str(tmp_path)).getObstacleIndex()._cellsize == OBSTACLE_CELL * 2
+
+def test_occupancy_is_made_when_used(tmp_path):
+    track = loadTrack(trackPath(TRACK), str(tmp_path))
+    assert track._occupancy is None
+
+    #Once made, the grid is added to the cache when it is updated
+    occupancy = track.getOccupancy()
+    track.updateCache()
+    cached = loadTrack(trackPath(TRACK), str(tmp_path))
+    assert (cached.getOccupancy().getBlocked() == occupancy.getBlocked()).all()
+
+def test_cache_holds_the_compiled_track(tmp_path):
+    import pygame
+    compiled = loadTrack(trackPath(TRACK), None)
+    loadTrack(trackPath(TRACK), str(tmp_path))
+    cached = loadTrack(trackPath(TRACK), str(tmp_path))
+    assert cached.getTerrain().getBytes() == compiled.getTerrain().getBytes()
+    assert cached.getGuide().getHeadings() == compiled.getGuide().getHeadings()
+    assert cached.getGuide().getDistances() == compiled.getGuide().getDistances()
+    assert cached.getGuide().getLine() == compiled.getGuide().getLine()
+
+    #The surface is added once the track has been drawn, and isn't written while drawing
+    pygame.display.init()
+    pygame.display.set_mode((1, 1))
+    path, = tmp_path.iterdir()
+    written = path.read_bytes()
+    surface = pygame.image.tobytes(cached.getSurface(), 'RGB')
+    assert path.read_bytes() == written
+    cached.updateCache()
+    assert loadTrack(trackPath(TRACK), str(tmp_path))._pixels == surface
+
+def test_foreign_cache_files_are_replaced(tmp_path):
+    import pickle
+    loadTrack(trackPath(TRACK), str(tmp_path))
+    path, = tmp_path.iterdir()
+
+    #A pickle is never loaded, so the object below can't run anything
+    class Trap(object):
+        def __reduce__(self):
+            return (tmp_path.joinpath('trapped').write_text, ('yes',))
+
+    for data in (pickle.dumps(Trap()), b'', path.read_bytes()[:-1], path.read_bytes() + b'x'):
+        path.write_bytes(data)
+        track = loadTrack(trackPath(TRACK), str(tmp_path))
+        assert track.getTerrain() is not None
+        assert not tmp_path.joinpath('trapped').exists()
+        assert path.read_bytes() != data
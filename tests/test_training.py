@@ -0,0 +1,28 @@
+"""Tests of the training of the opponents' settings."""
+
+#Imports
+
+##Classes and global constants
+from training import *
+
+def test_default_genome_drives_like_the_game():
+    track = loadTrack(trackPath(TRACK), None)
+    assert pilotSettings(DEFAULT_GENOME)['cornerspeed'] is None
+
+    #The first candidate of a run must score exactly what the opponents in the game do
+    pilot = Pilot(track, ROTATION_STEP, AI_THRUST_ANGLE, AI_DEADBAND, AI_CORNER_SPEED)
+    assert fitness(DEFAULT_GENOME, track) == drive(pilot, track)
+
+def test_opponents_use_the_trained_settings(tmp_path, monkeypatch):
+    import training
+    track = loadTrack(trackPath(TRACK), None)
+    monkeypatch.setattr(training, 'TRAIN_DIR', str(tmp_path))
+    monkeypatch.setattr(training, '_opponents', dict())
+    assert opponentSettings(track) == {'thrustangle': AI_THRUST_ANGLE, 'deadband': AI_DEADBAND,
+                                       'cornerspeed': AI_CORNER_SPEED}
+
+    best = {'thrustangle': 60.0, 'deadband': 2.5, 'cornerspeed': None}
+    saveCheckpoint(checkpointPath(track), {'best': {'score': 600, 'settings': best}})
+    monkeypatch.setattr(training, '_opponents', dict())
+    assert opponentSettings(track) == best
+    assert makePilot(track)._thrustangle == 60.0
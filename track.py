@@ -0,0 +1,431 @@
+#Imports
+
+##External
+import pygame, math, json, hashlib, os, struct
+from array import array
+
+##Classes and global constants
+from drawable import *
+from spatial import GridIndex
+from terrain import Terrain, makeTerrain
+from ai import Guide, makeGuide
+import drawconf
+from drawconf import *
+from config import *
+
+class Track(object):
+    """A race track: the static ground, obstacles and checkpoints, and where the race starts.
+
+    None of the track's drawables move, so they are rendered once onto a single surface
+    that is blitted every frame. The surface is rebuilt if a drawable is changed through one of its setters.
+    The track also keeps a GridIndex of its obstacles, its checkpoints' precompiled segments,
+    a Terrain telling which parts of the ground are road, a Guide for the computer controlled cars,
+    and (once the sensors have asked for it) an Occupancy grid for the cars' distance sensors.
+    """
+
+    def __init__(self, name, ground, obstacles, checkpoints, size, start, bgcolor = LGRAY, road = (BLACK, WHITE),
+                 terrain = None, guide = None):
+        """Create a track.
+
+        name:           The name of the track.
+        ground:         A list of drawables making up the ground (asphalt, markings, grass).
+        obstacles:      A list of drawables representing obstacles.
+        checkpoints:    A list of lines that the cars must cross in chronological order.
+        size:           A tuple with the width and height of the track.
+        start:          A tuple (x, y, rotation) with the position and rotation of a car at the start of a race.
+        bgcolor:        The color of the areas not covered by any drawable.
+        road:           The colors of the ground that count as road. Anything else is off-road.
+        terrain:        The track's Terrain, if it has been made already (e.g. read from the cache).
+        guide:          The track's Guide, if it has been made already.
+        """
+
+        self._name = name
+        self._ground = ground
+        self._obstacles = obstacles
+        self._checkpoints = checkpoints
+        self._size = tuple(size)
+        self._start = tuple(start)
+        self._bgcolor = tuple(bgcolor)
+        self._road = [tuple(color) for color in road]
+        self._index = GridIndex(obstacles, OBSTACLE_CELL)
+        self._surface = None
+        self._pixels = None         #The surface as bytes (when loaded from the cache)
+        self._dirty = True          #The surface must be (re)built before it is drawn
+        self._modified = False      #True if a drawable has been changed since the track was made
+        self._cachePath = None      #Where the compiled track is cached (see loadTrack)
+        self._uncached = False      #True if the surface or the Occupancy grid has been made since the cache was written
+
+        for line in checkpoints:
+            line.getSegment()       #Precompile the checkpoints
+        self._terrain = makeTerrain(ground, self._size, self._road, self._bgcolor) if terrain is None else terrain
+        self._guide = guide
+        self.getGuide()             #Made in advance, so that it is cached with the track
+        self._occupancy = None      #Made when first used, as it needs numpy (see getOccupancy)
+        self._occupancyBytes = None #The Occupancy grid as a tuple (rows, cols, bytes), when read from the cache
+
+        self._observe()
+
+    def _observe(self):
+        """Registers the track as an observer of its drawables."""
+
+        for thing in self._layers():
+            thing.addObserver(self._invalidate)
+
+    def _layers(self):
+        """Returns all the track's drawables in the order they are supposed to be drawn."""
+
+        return self._ground + self._obstacles + self._checkpoints
+
+    def _invalidate(self, drawable):
+        """Observer for the track's drawables. Makes sure the surface is rebuilt before it is drawn again.
+
+        drawable: The drawable that has been changed.
+        """
+
+        self._dirty = True
+        self._modified = True
+        self._pixels = None
+        if drawable in self._ground:
+            self._terrain = None
+        self._guide = None
+        self._occupancy = None
+        self._occupancyBytes = None
+
+    def _bake(self):
+        """Renders all the track's drawables onto the track's surface."""
+
+        if self._pixels is not None:
+            #Loaded from the cache, so the surface only has to be converted
+            self._surface = pygame.image.frombytes(self._pixels, self._size, 'RGB').convert()
+            self._pixels = None
+            self._dirty = False
+            return
+
+        if self._surface is None:
+            self._surface = pygame.Surface(self._size).convert()
+
+        self._surface.fill(self._bgcolor)
+        for thing in self._layers():
+            thing.draw(self._surface)
+
+        self._dirty = False
+        self._uncached = not self._modified
+
+    def saveCache(self, path):
+        """Saves the compiled parts of the track to a file: the Terrain, the Guide, and the surface and
+        the Occupancy grid if they have been made. The file holds no code (see CACHE_HEADER), so reading it
+        can't run anything.
+
+        path: The path of the file.
+        """
+
+        guide = self.getGuide()
+        cols, rows = guide.getShape()
+        terrain = self.getTerrain()
+        parts = [('terrain', terrain.getBytes()),
+                 ('headings', guide.getHeadings().tobytes()),
+                 ('distances', guide.getDistances().tobytes())]
+        info = {'size': terrain.getSize(),
+                'guide': {'cellsize': guide.getCellSize(), 'cols': cols, 'rows': rows, 'line': guide.getLine()}}
+
+        if self._surface is not None and not self._dirty:
+            parts.append(('pixels', pygame.image.tobytes(self._surface, 'RGB')))
+        elif self._pixels is not None:
+            parts.append(('pixels', self._pixels))
+
+        if self._occupancy is not None:
+            blocked = self._occupancy.getBlocked()
+            info['occupancy'] = {'cellsize': self._occupancy.getCellSize(), 'rows': blocked.shape[0],
+                                 'cols': blocked.shape[1]}
+            parts.append(('occupancy', blocked.tobytes()))
+        elif self._occupancyBytes is not None:
+            info['occupancy'] = {'cellsize': SENSOR_CELL, 'rows': self._occupancyBytes[0],
+                                 'cols': self._occupancyBytes[1]}
+            parts.append(('occupancy', self._occupancyBytes[2]))
+
+        info['parts'] = [(name, len(data)) for name, data in parts]
+        description = json.dumps(info).encode('utf-8')
+
+        atomicWrite(path, [CACHE_HEADER.pack(CACHE_MAGIC, CACHE_VERSION, len(description)), description] +
+                          [data for name, data in parts])
+        self._uncached = False
+
+    def updateCache(self):
+        """Writes the cache file again if the surface or the Occupancy grid has been made since it was written,
+        so that they are read from the cache next time. Does nothing if the track has no cache file, or a drawable
+        has been changed. Writes the whole track, so it is meant to be called before a race, not while racing.
+        """
+
+        if self._cachePath is not None and self._uncached and not self._modified:
+            self.saveCache(self._cachePath)
+
+    def isDirty(self):
+        """Returns True if the track's surface needs to be rebuilt before being drawn."""
+        return self._dirty
+
+    def getSurface(self):
+        """Returns the surface with the track drawn onto it. Rebuilds it if necessary."""
+
+        if self._dirty:
+            self._bake()
+        return self._surface
+
+    def draw(self, layer, area = None):
+        """Draws the track.
+
+        layer:  The surface being drawn to.
+        area:   A pygame Rect. If given, only this part of the track is drawn (e.g. to restore the background
+                behind something that has moved). The whole track is drawn otherwise.
+
+        Returns a pygame Rect representing the part of the layer that was drawn to.
+        """
+
+        if area is None:
+            return layer.blit(self.getSurface(), (0, 0))
+        else:
+            return layer.blit(self.getSurface(), area.topleft, area)
+
+    def getName(self):
+        """Getter for _name."""
+        return self._name
+
+    def getSize(self):
+        """Getter for _size."""
+        return self._size
+
+    def getStart(self):
+        """Getter for _start."""
+        return self._start
+
+    def getGround(self):
+        """Getter for _ground."""
+        return self._ground
+
+    def getObstacles(self):
+        """Getter for _obstacles."""
+        return self._obstacles
+
+    def getObstacleIndex(self):
+        """Getter for _index."""
+        return self._index
+
+    def getCheckpoints(self):
+        """Getter for _checkpoints."""
+        return self._checkpoints
+
+    def getTerrain(self):
+        """Returns the track's Terrain. Remakes it if the ground has changed."""
+
+        if self._terrain is None:
+            self._terrain = makeTerrain(self._ground, self._size, self._road, self._bgcolor)
+        return self._terrain
+
+    def getGuide(self):
+        """Returns the track's Guide (see ai.makeGuide). Remakes it if a drawable has changed."""
+
+        if self._guide is None:
+            self._guide = makeGuide(self.getTerrain(), self._obstacles, self._checkpoints, AI_CELL, AI_CLEARANCE,
+                                    AI_LOOKAHEAD)
+        return self._guide
+
+    def getOccupancy(self):
+        """Returns the track's Occupancy grid (see sensors.makeOccupancy). Makes it the first time it is asked for
+        (it is written to the cache by updateCache), and remakes it if a drawable has changed. Requires numpy.
+        """
+
+        if self._occupancy is None:
+            #Only the sensors need numpy, so it is imported when they are used
+            from sensors import makeOccupancy, occupancyFromBytes
+            if self._occupancyBytes is not None:
+                self._occupancy = occupancyFromBytes(SENSOR_CELL, *self._occupancyBytes)
+            else:
+                terrain = self.getTerrain() if SENSOR_OFFROAD else None
+                self._occupancy = makeOccupancy(self._size, self._obstacles, SENSOR_CELL, terrain)
+                self._uncached = not self._modified
+        return self._occupancy
+
+    def getGrid(self, count, lanes = GRID_LANES, spacing = GRID_SPACING):
+        """Finds starting positions for a number of cars, in rows behind the start (the first is the start itself).
+
+        count:      The number of positions.
+        lanes:      The number of cars side by side in each row.
+        spacing:    The distance between the cars (sideways and between the rows).
+
+        Returns a list of tuples (x, y, rotation).
+        """
+
+        x, y, rotation = self._start
+        angle = math.radians(rotation)
+        ax = math.cos(angle)    #Forward
+        ay = math.sin(angle)
+        order = [0] + [sign * ((i + 1) // 2) for i, sign in zip(range(1, lanes), [-1, 1] * lanes)]   #Middle lane first
+
+        grid = []
+        for i in range(count):
+            row, lane = divmod(i, lanes)
+            side = order[lane] * spacing
+            back = row * spacing
+            grid.append((x - ax * back - ay * side, y - ay * back + ax * side, rotation))
+        return grid
+
+#Track files
+
+CACHE_MAGIC = b'SCTC'
+CACHE_VERSION = 6   #Must be changed whenever the compiled form of a track changes
+
+#A cache file starts with the magic, the version and the length of a JSON description of the parts that follow
+#(their names and lengths, and the shapes of the grids). The parts are raw bytes and arrays, never code
+CACHE_HEADER = struct.Struct('<4sHI')
+
+def trackPath(name):
+    """Returns the path of the file for the track with the given name."""
+    return os.path.join(TRACK_DIR, name + '.json')
+
+def _color(value):
+    """Converts a color from a track file. It can be the name of a color in drawconf, or a list of components."""
+
+    if isinstance(value, str):
+        return getattr(drawconf, value)
+    return tuple(value)
+
+def _drawable(item):
+    """Makes a drawable from its description in a track file.
+
+    item: A dictionary with a 'shape' (circle, rectangle, arc or line), a 'color', and the arguments for the shape.
+          Angles are given in degrees.
+
+    Raises a ValueError if the shape is unknown.
+    """
+
+    shape = item['shape']
+    color = _color(item['color'])
+
+    if shape == 'circle':
+        return Circle(item['x'], item['y'], item['radius'], color)
+    elif shape == 'rectangle':
+        return Rectangle(item['width'], item['height'], color, item['x'], item['y'])
+    elif shape == 'arc':
+        return Arc(item['x'], item['y'], item['length'], item['width'],
+                   math.radians(item['angle']), math.radians(item['span']), color)
+    elif shape == 'line':
+        return Line(item['x'], item['y'], item['length'], item['width'], math.radians(item['angle']), color)
+    else:
+        raise ValueError("Unknown shape in track file: " + str(shape))
+
+def compileTrack(data, terrain = None, guide = None):
+    """Makes a track from the contents of a track file.
+
+    data:       The bytes of a track file (JSON).
+    terrain:    The track's Terrain, if it has been made already. Made from the ground if None.
+    guide:      The track's Guide, if it has been made already. Made if None.
+
+    Returns the Track.
+    """
+
+    spec = json.loads(data.decode('utf-8'))
+    start = spec['start']
+    if len(start) < 3:
+        start = (start[0], start[1], CAR_ROTATION)
+
+    return Track(spec['name'],
+                 [_drawable(item) for item in spec['ground']],
+                 [_drawable(item) for item in spec['obstacles']],
+                 [_drawable(item) for item in spec['checkpoints']],
+                 spec.get('size', (RES_X, RES_Y)), start, _color(spec.get('background', 'LGRAY')),
+                 [_color(color) for color in spec.get('road', ('BLACK', 'WHITE'))], terrain, guide)
+
+def _readCache(path, data):
+    """Reads a compiled track from the cache (see Track.saveCache).
+
+    path:   The path of the cache file.
+    data:   The bytes of the track file, which the drawables are made from.
+
+    Returns the Track. Raises a ValueError if the file isn't a cache file of this version or is incomplete,
+    and an OSError if it can't be read.
+    """
+
+    with open(path, 'rb') as f:
+        blob = f.read()
+
+    try:
+        magic, version, length = CACHE_HEADER.unpack_from(blob)
+    except struct.error:
+        raise ValueError("The cache file is too short.")
+    if magic != CACHE_MAGIC or version != CACHE_VERSION:
+        raise ValueError("Not a track cache file of this version.")
+
+    try:
+        start = CACHE_HEADER.size + length
+        info = json.loads(blob[CACHE_HEADER.size:start].decode('utf-8'))
+        parts = dict()
+        for name, size in info['parts']:
+            parts[name] = blob[start:start + size]
+            start += size
+        if start != len(blob):
+            raise ValueError("The cache file doesn't match its description.")
+
+        spec = info['guide']
+        cols, rows = spec['cols'], spec['rows']
+        headings = array('h', parts['headings'])
+        distances = array('H', parts['distances'])
+        if len(headings) != cols * rows or len(distances) != cols * rows:
+            raise ValueError("The guide doesn't fit its grid.")
+        guide = Guide(spec['cellsize'], cols, rows, [tuple(point) for point in spec['line']], headings, distances)
+
+        terrain = Terrain(tuple(info['size']), parts['terrain'])
+        if len(parts['terrain']) != terrain.getSize()[0] * terrain.getSize()[1]:
+            raise ValueError("The terrain doesn't fit its size.")
+        occupancy = info.get('occupancy')
+    except (KeyError, TypeError, UnicodeDecodeError) as error:
+        raise ValueError("The cache file is damaged: " + str(error))
+
+    track = compileTrack(data, terrain, guide)
+    width, height = track.getSize()
+    if 'pixels' in parts:
+        if len(parts['pixels']) != width * height * 3:
+            raise ValueError("The surface doesn't fit the track.")
+        track._pixels = parts['pixels']
+    if occupancy is not None:
+        if len(parts.get('occupancy', b'')) != occupancy['rows'] * occupancy['cols']:
+            raise ValueError("The Occupancy grid doesn't fit its shape.")
+        track._occupancyBytes = (occupancy['rows'], occupancy['cols'], parts['occupancy'])
+    return track
+
+def loadTrack(path, cache = TRACK_CACHE):
+    """Loads a track file. The compiled track is cached, so the file is only compiled the first time it is loaded
+    (or after it has been changed).
+
+    path:   The path of the track file.
+    cache:  The folder holding the compiled tracks (keyed by a hash of the file and the settings the compiled
+            track depends on). No cache is used if None.
+
+    Returns the Track.
+    """
+
+    with open(path, 'rb') as f:
+        data = f.read()
+
+    if cache is None:
+        return compileTrack(data)
+
+    #The compiled track also depends on the settings it is made with: the default size and rotation, the colors,
+    #the cells of the GridIndex, the settings of the opponents' Guide and those of the sensors' Occupancy grid
+    colors = sorted((name, value) for name, value in vars(drawconf).items() if name.isupper())
+    version = repr((CACHE_VERSION, RES_X, RES_Y, CAR_ROTATION, colors, OBSTACLE_CELL, AI_CELL, AI_CLEARANCE,
+                    AI_LOOKAHEAD, SENSOR_CELL, SENSOR_OFFROAD))
+    key = hashlib.sha1(data + version.encode('ascii')).hexdigest()
+    cached = os.path.join(cache, key + '.track')
+
+    if os.path.isfile(cached):
+        try:
+            track = _readCache(cached, data)
+        except (ValueError, OSError):
+            track = None    #An unreadable cache file is simply replaced
+        if track is not None:
+            track._cachePath = cached       #The surface and the Occupancy grid are added by updateCache
+            return track
+
+    track = compileTrack(data)
+    track.saveCache(cached)
+    track._cachePath = cached
+    return track
@@ -0,0 +1,137 @@
+"""Collisions between cars.
+
+The cars are kept sorted by the left edge of their bounding boxes. Since the cars only move
+a few pixels per frame, the order barely changes, and an insertion sort puts it right again
+in close to linear time. Sweeping through the sorted cars then only pairs up the cars whose
+boxes overlap along x (sort and sweep), and only those pairs are tested as rotated rectangles.
+"""
+
+#Imports
+
+##External
+import math
+from precode import intersect_oriented_rectangles
+
+class Traffic(object):
+    """Handles the collisions between a number of cars (physics.Car or subclasses)."""
+
+    def __init__(self, cars):
+        """Create the collision handling for some cars.
+
+        cars: A list of cars. All of them must have the same size.
+        """
+
+        self._cars = list(cars)
+        self._order = list(range(len(self._cars)))     #Indices of the cars, sorted by the left edge of their boxes
+        self._pairs = 0             #Number of pairs tested as rotated rectangles in the latest update
+
+    def getCars(self):
+        """Getter for _cars."""
+        return self._cars
+
+    def getPairs(self):
+        """Getter for _pairs."""
+        return self._pairs
+
+    def _sort(self, lefts):
+        """Sorts _order by the cars' left edges, using insertion sort (fast when the order is nearly right).
+
+        lefts: A list with the left edge of each car's box.
+        """
+
+        order = self._order
+        for i in range(1, len(order)):
+            car = order[i]
+            left = lefts[car]
+            j = i - 1
+            while j >= 0 and lefts[order[j]] > left:
+                order[j + 1] = order[j]
+                j -= 1
+            order[j + 1] = car
+
+    def candidates(self):
+        """Finds the pairs of cars whose bounding boxes overlap (the broad phase).
+
+        The boxes are centered on the cars and wide enough to hold them whatever their rotation.
+
+        Returns a list of tuples with the indices of two cars.
+        """
+
+        cars = self._cars
+        if not cars:
+            return []
+        reach = math.sqrt(cars[0]._h ** 2 + cars[0]._width ** 2) / 2   #Half the diagonal of the car's body
+        xs = [car._pos.x + car._w / 2 for car in cars]
+        ys = [car._pos.y + car._h / 2 for car in cars]
+        self._sort([x - reach for x in xs])
+
+        pairs = []
+        active = []     #Cars whose boxes may still overlap the boxes of the following cars along x
+        for i in self._order:
+            left = xs[i] - reach
+            active = [j for j in active if xs[j] + reach > left]
+            for j in active:
+                if abs(ys[i] - ys[j]) < 2 * reach:
+                    pairs.append((j, i) if j < i else (i, j))
+            active.append(i)
+
+        return pairs
+
+    def update(self):
+        """Finds and handles the collisions between the cars. Should be called once per frame, after the cars have moved.
+
+        Colliding cars are pushed apart, and exchange the parts of their velocities along the direction of impact
+        (like an elastic collision between equal masses). Cars that aren't moving under their own power
+        (before the start, or after the finish) are immovable, and the other car bounces off them.
+
+        Returns the number of collisions.
+        """
+
+        cars = self._cars
+        pairs = self.candidates()
+        self._pairs = len(pairs)
+        collisions = 0
+
+        for i, j in pairs:
+            a = cars[i]
+            b = cars[j]
+            hit = intersect_oriented_rectangles(a._pos.x + a._w / 2, a._pos.y + a._h / 2, a._h, a._width,
+                                                a._rotation * math.pi / 180,
+                                                b._pos.x + b._w / 2, b._pos.y + b._h / 2, b._h, b._width,
+                                                b._rotation * math.pi / 180)
+            if not hit:
+                continue
+            collisions += 1
+            depth, nx, ny = hit
+
+            a_moves = a._running and a._laps > 0
+            b_moves = b._running and b._laps > 0
+            if not a_moves and not b_moves:
+                continue
+
+            #Push the cars apart (only the movable ones)
+            share = 0.5 if a_moves and b_moves else 1.0
+            if a_moves:
+                a._pos.x -= nx * depth * share
+                a._pos.y -= ny * depth * share
+            if b_moves:
+                b._pos.x += nx * depth * share
+                b._pos.y += ny * depth * share
+
+            #Exchange (or reflect) the velocities along the normal if the cars are approaching each other
+            va = a._velocity.x * nx + a._velocity.y * ny if a_moves else 0.0
+            vb = b._velocity.x * nx + b._velocity.y * ny if b_moves else 0.0
+            if va - vb > 0:
+                if a_moves and b_moves:
+                    a._velocity.x += (vb - va) * nx
+                    a._velocity.y += (vb - va) * ny
+                    b._velocity.x += (va - vb) * nx
+                    b._velocity.y += (va - vb) * ny
+                elif a_moves:
+                    a._velocity.x -= 2 * va * nx
+                    a._velocity.y -= 2 * va * ny
+                else:
+                    b._velocity.x -= 2 * vb * nx
+                    b._velocity.y -= 2 * vb * ny
+
+        return collisions
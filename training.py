@@ -0,0 +1,256 @@
+"""Evolving the settings of the computer controlled drivers.
+
+Run from terminal by typing: python training.py
+
+Every candidate is a set of Pilot settings (see GENES). It is scored by driving a car with those settings
+around the track without rendering anything, and the fewer frames it needs for its laps, the better.
+The best candidates of each generation are kept, and the rest of the next generation is bred from
+the better half by crossover and mutation.
+
+The candidates are scored on a pool of worker processes. Each worker loads the compiled track once
+when it starts (see _startWorker), so only the settings are sent with every task.
+Every generation is saved to TRAIN_DIR, and a run can be resumed from the latest one.
+"""
+
+#Imports
+
+##External
+import argparse, json, os, random, sys
+from concurrent.futures import ProcessPoolExecutor
+from precode import Vector2D
+
+##Classes and global constants
+from physics import Car
+from ai import Pilot
+from track import loadTrack, trackPath
+from drawable import *
+from config import *
+
+#The settings being evolved: name (a parameter of Pilot), lowest value and highest value.
+#No car goes faster than the speed limit, so a corner speed at the limit means no limit (see pilotSettings).
+GENES = (('thrustangle', 10.0, 180.0),
+         ('deadband', 0.0, 3.0 * ROTATION_STEP),
+         ('cornerspeed', 1.0, float(SPEEDLIMIT)))
+
+#The settings of the opponents in config (without a deadband, Pilot uses half a rotation step)
+DEFAULT_GENOME = [float(AI_THRUST_ANGLE), ROTATION_STEP / 2.0 if AI_DEADBAND is None else float(AI_DEADBAND),
+                  float(SPEEDLIMIT) if AI_CORNER_SPEED is None else min(float(AI_CORNER_SPEED), SPEEDLIMIT)]
+
+#The track of a worker process, loaded once (see _startWorker)
+_track = None
+
+#The settings of the opponents on each track, keyed by the name of the track (see opponentSettings)
+_opponents = dict()
+
+def pilotSettings(genome):
+    """Returns a dictionary with the Pilot parameters of a candidate (a list with a value for each of GENES)."""
+
+    settings = dict((name, value) for (name, low, high), value in zip(GENES, genome))
+    if settings['cornerspeed'] >= SPEEDLIMIT:
+        settings['cornerspeed'] = None
+    return settings
+
+def fitness(genome, track, laps = TRAIN_LAPS, frames = TRAIN_FRAMES):
+    """Scores a candidate by letting it drive a car from the start of a track (see drive).
+
+    genome: A list with a value for each of GENES.
+    track:  The Track to drive on.
+    laps:   The number of laps to drive.
+    frames: The most frames the car is given to finish.
+    """
+
+    return drive(Pilot(track, ROTATION_STEP, **pilotSettings(genome)), track, laps, frames)
+
+def drive(pilot, track, laps = TRAIN_LAPS, frames = TRAIN_FRAMES):
+    """Lets a Pilot drive a car from the start of a track, without rendering anything.
+
+    pilot:  The Pilot driving the car.
+    track:  The Track to drive on.
+    laps:   The number of laps to drive.
+    frames: The most frames the car is given to finish.
+
+    Returns the number of frames the car needed. Cars that don't finish get more than frames,
+    depending on how many checkpoints they had left.
+    """
+
+    obstacles = track.getObstacleIndex()
+    checkpoints = track.getCheckpoints()
+    terrain = track.getTerrain()
+    x, y, rotation = track.getStart()
+    car = Car(Vector2D(x, y), Vector2D(0, 0), SPEEDLIMIT, WIDTH, LENGTH, Rectangle(RES_X, RES_Y, TRANSPARENT),
+              rotation, laps, OFFROAD_SPEEDLIMIT, SWEPT_COLLISION)
+
+    for frame in range(frames):
+        if not car.step(pilot.controls(car), ROTATION_STEP, obstacles, checkpoints, terrain):
+            return frame + 1
+
+    #The start counts as a checkpoint of its own, as the first lap only starts there
+    remaining = (car._laps * len(checkpoints) - car._lastCP) / float(laps * len(checkpoints) + 1)
+    return frames * (1 + remaining)
+
+def _startWorker(path):
+    """Loads the track once for a worker process (and makes its Guide, unless it was compiled with the track)."""
+
+    global _track
+    _track = loadTrack(path)
+    _track.getGuide()
+
+def _score(genome):
+    """Scores a candidate on the track of the worker process (see fitness)."""
+
+    return fitness(genome, _track)
+
+def randomGenome(rng):
+    """Returns a candidate with random settings.
+
+    rng: The random.Random to draw from.
+    """
+
+    return [rng.uniform(low, high) for name, low, high in GENES]
+
+def breed(population, scores, rng, elite = TRAIN_ELITE, mutation = TRAIN_MUTATION):
+    """Makes the next generation.
+
+    population: A list of candidates.
+    scores:     The score of each candidate (lower is better).
+    rng:        The random.Random to draw from.
+    elite:      The number of the best candidates kept as they are.
+    mutation:   The chance of each setting of a new candidate being changed.
+
+    Returns a list of candidates as long as population.
+    """
+
+    ranked = [genome for score, genome in sorted(zip(scores, population), key = lambda pair: pair[0])]
+    parents = ranked[:max(2, len(ranked) // 2)]
+    children = [list(genome) for genome in ranked[:elite]]
+
+    while len(children) < len(population):
+        a, b = rng.sample(parents, 2)
+        child = [rng.choice(pair) for pair in zip(a, b)]
+        for i, (name, low, high) in enumerate(GENES):
+            if rng.random() < mutation:
+                child[i] = min(max(child[i] + rng.gauss(0, (high - low) / 10), low), high)
+        children.append(child)
+
+    return children
+
+def opponentSettings(track):
+    """Finds the Pilot settings of the opponents on a track: the best ones saved by train if AI_TRAINED is set
+    and the track has been trained, those in config otherwise. The saved settings are only read once per track.
+
+    track: The Track.
+
+    Returns a dictionary with the parameters thrustangle, deadband and cornerspeed of Pilot.
+    """
+
+    if track.getName() not in _opponents:
+        settings = {'thrustangle': AI_THRUST_ANGLE, 'deadband': AI_DEADBAND, 'cornerspeed': AI_CORNER_SPEED}
+        state = loadCheckpoint(checkpointPath(track)) if AI_TRAINED else None
+        if state is not None and state.get('best') and set(state['best']['settings']) == set(settings):
+            settings = state['best']['settings']
+        _opponents[track.getName()] = settings
+    return dict(_opponents[track.getName()])
+
+def makePilot(track):
+    """Returns a Pilot for the opponents on a track (see opponentSettings)."""
+
+    return Pilot(track, ROTATION_STEP, **opponentSettings(track))
+
+def checkpointPath(track):
+    """Returns the path of the file holding the latest generation of a track."""
+
+    return os.path.join(TRAIN_DIR, track.getName() + '.json')
+
+def saveCheckpoint(path, state):
+    """Saves a generation (replacing the file only once it is written, so an interrupted run never leaves half a file).
+
+    path:   The path of the file.
+    state:  A dictionary (see train).
+    """
+
+    atomicWrite(path, json.dumps(state, indent = 2).encode('utf-8'))
+
+def loadCheckpoint(path):
+    """Loads a generation saved by saveCheckpoint.
+
+    Returns the dictionary, or None if there is no (readable) file.
+    """
+
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (IOError, ValueError):
+        return None
+
+def train(path, generations = TRAIN_GENERATIONS, size = TRAIN_POPULATION, workers = None, seed = 0, resume = False):
+    """Evolves the settings of the Pilot for a track, saving every generation.
+
+    path:           The path of the track file.
+    generations:    The number of generations to run (on top of those resumed from).
+    size:           The number of candidates per generation.
+    workers:        The number of worker processes. Uses one per CPU if not given.
+    seed:           The seed of the random numbers. A resumed run continues with the seed it was started with.
+    resume:         If True, continues from the latest saved generation of the track (if there is one).
+
+    Returns the latest state: a dictionary with the track's name, the names of the GENES, the seed,
+    the number of generations so far, the population and its scores, the best candidate so far and
+    the best score of every generation.
+    """
+
+    track = loadTrack(path)
+    saved = checkpointPath(track)
+    state = loadCheckpoint(saved) if resume else None
+    if state is not None and state['genes'] != [name for name, low, high in GENES]:
+        state = None
+    if state is None:
+        #The settings the game uses now are one of the first candidates, so the training can only improve on them
+        rng = random.Random(seed)
+        population = [DEFAULT_GENOME] + [randomGenome(rng) for i in range(size - 1)]
+        state = {'track': track.getName(), 'genes': [name for name, low, high in GENES], 'seed': seed,
+                 'generation': 0, 'population': population, 'scores': None, 'best': None, 'history': []}
+
+    with ProcessPoolExecutor(workers, initializer = _startWorker, initargs = (path,)) as executor:
+        for i in range(generations):
+            population = state['population']
+            if state['scores'] is not None:
+                #Each generation gets its own random numbers, so a resumed run breeds the same as an uninterrupted one
+                rng = random.Random(state['seed'] * 1000003 + state['generation'])
+                population = breed(population, state['scores'], rng)
+            scores = list(executor.map(_score, population, chunksize = max(1, len(population) // 32)))
+
+            best = min(range(len(scores)), key = scores.__getitem__)
+            if state['best'] is None or scores[best] < state['best']['score']:
+                state['best'] = {'score': scores[best], 'settings': pilotSettings(population[best])}
+            state['generation'] += 1
+            state['population'] = population
+            state['scores'] = scores
+            state['history'].append(scores[best])
+            saveCheckpoint(saved, state)
+            print("Generation %d: best %.0f, median %.0f frames" % (state['generation'], scores[best],
+                                                                   sorted(scores)[len(scores) // 2]))
+
+    return state
+
+def main(argv = None):
+    """Trains the Pilot settings for a track and prints the best ones."""
+
+    parser = argparse.ArgumentParser(description = "Evolves the settings of the computer controlled drivers.")
+    parser.add_argument('track', nargs = '?', default = TRACK, help = "name of the track (default: %(default)s)")
+    parser.add_argument('--generations', type = int, default = TRAIN_GENERATIONS,
+                        help = "generations to run (default: %(default)s)")
+    parser.add_argument('--population', type = int, default = TRAIN_POPULATION,
+                        help = "candidates per generation (default: %(default)s)")
+    parser.add_argument('--workers', type = int, default = None, help = "worker processes (default: one per CPU)")
+    parser.add_argument('--seed', type = int, default = 0, help = "seed of the random numbers (default: %(default)s)")
+    parser.add_argument('--resume', action = 'store_true', help = "continue from the latest saved generation")
+    args = parser.parse_args(argv)
+
+    state = train(trackPath(args.track), args.generations, args.population, args.workers, args.seed, args.resume)
+    print("Best after %d generations (%.0f frames for %d laps):" % (state['generation'], state['best']['score'],
+                                                                   TRAIN_LAPS))
+    for name, value in sorted(state['best']['settings'].items()):
+        print("  %s = %s" % (name, "no limit" if value is None else "%.2f" % value))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())